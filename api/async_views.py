@@ -0,0 +1,65 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.views import APIView
+
+from recipes import events
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with async handlers. Authentication, permissions and throttling
+    may query the database, so they run in the thread of sync code,
+    handlers are awaited and wrap their own database access
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                # Inherited sync handlers, like options and http_method_not_allowed
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+    pass
+
+
+def event_stream_response(request, topics):
+    """
+    Streaming response of server-sent events of the topics, sent to clients
+    as they come instead of being buffered by proxies. WSGI servers get
+    a blocking stream, they would buffer an async one to its end
+    """
+    if isinstance(request._request, ASGIRequest):
+        stream = events.stream(topics)
+    else:
+        stream = events.stream_blocking(topics)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
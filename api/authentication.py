@@ -0,0 +1,133 @@
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Claim with the digest of the other user claims
+CLAIMS_DIGEST = "claims_digest"
+# Seconds digests of users' current claims are cached for, which bounds how long
+# changed claims are trusted while the shared cache is unavailable
+CLAIMS_CACHE_TIMEOUT = 300
+
+
+def user_claims_key(user_id):
+    return f"jwt-claims-{user_id}"
+
+
+def claims_digest(username, is_staff, is_superuser, email_confirmed):
+    claims = json.dumps([username, is_staff, is_superuser, email_confirmed])
+    return hashlib.sha256(claims.encode()).hexdigest()[:16]
+
+
+def add_user_claims(token, user):
+    """
+    Embed the user data needed by read-only requests in the token,
+    so they can be authenticated without database queries. The user
+    is expected to be fresh from the database
+    """
+    token["username"] = user.username
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    # Users created outside of the registration (e.g. superusers) have no profile
+    profile = getattr(user, "profile", None)
+    token["email_confirmed"] = bool(profile and profile.email_confirmed)
+    token[CLAIMS_DIGEST] = claims_digest(
+        user.username, user.is_staff, user.is_superuser, token["email_confirmed"]
+    )
+    if user.is_active:
+        cache.add(user_claims_key(user.pk), token[CLAIMS_DIGEST], CLAIMS_CACHE_TIMEOUT)
+    return token
+
+
+def current_claims_digest(user_id):
+    """
+    Digest of the claims the user has now, read from the database with one
+    query on a cache miss, empty for deleted or deactivated users
+    """
+    key = user_claims_key(user_id)
+    digest = cache.get(key)
+    if digest is None:
+        claims = (
+            get_user_model()
+            .objects.filter(pk=user_id, is_active=True)
+            .values_list(
+                "username", "is_staff", "is_superuser", "profile__email_confirmed"
+            )
+            .first()
+        )
+        digest = "" if claims is None else claims_digest(*claims[:3], bool(claims[3]))
+        # Filling the cache doesn't invalidate local tiers of other processes
+        cache.add(key, digest, CLAIMS_CACHE_TIMEOUT)
+    return digest
+
+
+def revoke_user_claims(user_id):
+    """
+    Forget the user's current claims, so tokens are checked against the
+    database again. Forgotten once more on commit, as requests may cache
+    the claims committed before meanwhile
+    """
+    key = user_claims_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    Lightweight user built only from the claims of the access token
+    """
+
+    @cached_property
+    def id(self):
+        # Tokens store the id as a string, convert it so it compares
+        # equal to primary keys of database users
+        user_id_field = get_user_model()._meta.get_field(api_settings.USER_ID_FIELD)
+        return user_id_field.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email_confirmed(self):
+        return self.token.get("email_confirmed", False)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which resolves the user from token claims for safe methods,
+    and falls back to the database user for writes, tokens without claims,
+    or claims which differ from the current ones of the user
+    """
+
+    # Methods of requests whose user is resolved from claims
+    claims_methods = permissions.SAFE_METHODS
+
+    def authenticate(self, request):
+        self.use_claims = request.method in self.claims_methods
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if self.use_claims and self.has_valid_claims(validated_token):
+            return ClaimsTokenUser(validated_token)
+        return super().get_user(validated_token)
+
+    def has_valid_claims(self, validated_token):
+        digest = validated_token.get(CLAIMS_DIGEST)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if digest is None or user_id is None:
+            return False
+        return digest == current_claims_digest(user_id)
+
+
+class AnyMethodClaimsJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    Claims JWT authentication resolving the user from claims for any method,
+    for views which write nothing whatever the method
+    """
+
+    claims_methods = ("GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE")
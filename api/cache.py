@@ -0,0 +1,334 @@
+"""
+Two-tier cache backend, a bounded LRU in every process in front of
+a shared cache like memcached.
+
+Writes go through to the shared cache. Sets, deletes and clears bump a version
+key in the shared cache, and every process checks it at most once per
+VERSION_CHECK_INTERVAL, dropping its local tier when another process changed
+a value. Atomic operations (add, incr, decr) only run in the shared cache
+and don't bump the version, as throttles make them on every request, so other
+processes may see them LOCAL_TIMEOUT seconds late. Values computed on a miss
+should be cached with add for the same reason, a set on every miss would keep
+dropping the local tiers of all processes.
+
+When the shared cache is unavailable, the local tier serves alone and
+the shared cache is retried after RETRY_INTERVAL seconds.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "tiered-cache-version"
+# Values of keys known to be missing from the shared cache
+MISSING = object()
+# Returned by calls to the shared cache while it's unavailable
+UNAVAILABLE = object()
+
+
+def remote_errors():
+    errors = (OSError,)
+    try:
+        from pymemcache.exceptions import MemcacheError
+    except ImportError:
+        return errors
+    return errors + (MemcacheError,)
+
+
+class LocalTier:
+    """
+    Pickled values with their expiry times, least recently used evicted
+    first once there are too many of them or they take too many bytes
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+    def get(self, key, now):
+        """
+        Pickled value of the key, MISSING if it's known to be missing,
+        or KeyError if the key isn't in the tier
+        """
+        pickled, expires_at = self.entries[key]
+        if expires_at is not None and expires_at <= now:
+            self.delete(key)
+            raise KeyError(key)
+        self.entries.move_to_end(key)
+        return pickled
+
+    def get_expiry(self, key):
+        return self.entries[key][1]
+
+    def set(self, key, pickled, expires_at):
+        self.delete(key)
+        size = len(pickled) if pickled is not MISSING else 0
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (pickled, expires_at)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.bytes -= len(evicted) if evicted is not MISSING else 0
+
+    def delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[0] is not MISSING:
+            self.bytes -= len(entry[0])
+        return entry is not None
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend configured with the LOCATION of the shared cache and OPTIONS:
+
+    - REMOTE_BACKEND, backend of the shared cache, PyMemcacheCache by default
+    - REMOTE_OPTIONS, its OPTIONS
+    - LOCAL_MAX_ENTRIES and LOCAL_MAX_BYTES, bounds of the local tier
+    - LOCAL_TIMEOUT, seconds values are kept in the local tier at most
+    - VERSION_CHECK_INTERVAL, seconds between checks of the version key
+    - RETRY_INTERVAL, seconds the shared cache isn't called after an error
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        remote_backend = import_string(
+            options.get(
+                "REMOTE_BACKEND", "django.core.cache.backends.memcached.PyMemcacheCache"
+            )
+        )
+        remote_params = {
+            key: params[key]
+            for key in ("TIMEOUT", "KEY_PREFIX", "VERSION", "KEY_FUNCTION")
+            if key in params
+        }
+        remote_params["OPTIONS"] = options.get("REMOTE_OPTIONS", {})
+        self.remote = remote_backend(server, remote_params)
+        self.remote_errors = remote_errors()
+
+        self.local = LocalTier(
+            options.get("LOCAL_MAX_ENTRIES", 10_000),
+            options.get("LOCAL_MAX_BYTES", 16 * 2**20),
+        )
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 10)
+        self.version_check_interval = options.get("VERSION_CHECK_INTERVAL", 1)
+        self.retry_interval = options.get("RETRY_INTERVAL", 5)
+
+        self.lock = threading.RLock()
+        self.seen_version = None
+        self.next_version_check = 0
+        self.remote_down_until = 0
+        self.counters = dict.fromkeys(
+            ("local_hits", "remote_hits", "misses", "remote_errors", "invalidations"), 0
+        )
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        """
+        Hit and miss counters of this process, and the size of its local tier
+        """
+        with self.lock:
+            return {
+                **self.counters,
+                "local_entries": len(self.local.entries),
+                "local_bytes": self.local.bytes,
+                "remote_available": time.monotonic() >= self.remote_down_until,
+            }
+
+    def call_remote(self, method, *args, **kwargs):
+        """
+        Call the method of the shared cache, or return UNAVAILABLE
+        if it failed recently or fails now
+        """
+        if time.monotonic() < self.remote_down_until:
+            return UNAVAILABLE
+        try:
+            return getattr(self.remote, method)(*args, **kwargs)
+        except self.remote_errors as e:
+            logger.warning("Shared cache unavailable, using the local tier: %s", e)
+            self.count("remote_errors")
+            self.remote_down_until = time.monotonic() + self.retry_interval
+            return UNAVAILABLE
+
+    def check_version(self):
+        """
+        Drop the local tier if another process changed the shared cache
+        """
+        now = time.monotonic()
+        if now < self.next_version_check:
+            return
+        self.next_version_check = now + self.version_check_interval
+
+        version = self.call_remote("get", VERSION_KEY, 0)
+        if version is UNAVAILABLE:
+            return
+        with self.lock:
+            if version != self.seen_version:
+                if self.seen_version is not None:
+                    self.counters["invalidations"] += 1
+                self.local.clear()
+                self.seen_version = version
+
+    def bump_version(self):
+        self.call_remote("add", VERSION_KEY, 0, None)
+        try:
+            version = self.call_remote("incr", VERSION_KEY)
+        except ValueError:
+            # Evicted between add and incr
+            return
+        if version is not UNAVAILABLE:
+            with self.lock:
+                # Own changes don't make this process drop its local tier
+                if self.seen_version is not None and version == self.seen_version + 1:
+                    self.seen_version = version
+
+    def local_expiry(self, timeout):
+        """
+        Time the value may be kept locally until, None for ever
+        """
+        expires_at = self.get_backend_timeout(timeout)
+        if time.monotonic() < self.remote_down_until:
+            # The local tier is the only one
+            return expires_at
+        capped = time.time() + self.local_timeout
+        return capped if expires_at is None else min(expires_at, capped)
+
+    def set_local(self, key, value, timeout):
+        expires_at = self.local_expiry(timeout)
+        if expires_at is not None and expires_at <= time.time():
+            self.local.delete(key)
+            return
+        if value is not MISSING:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.local.set(key, value, expires_at)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.check_version()
+        with self.lock:
+            try:
+                pickled = self.local.get(local_key, time.time())
+            except KeyError:
+                pass
+            else:
+                if pickled is MISSING:
+                    self.counters["misses"] += 1
+                    return default
+                self.counters["local_hits"] += 1
+                return pickle.loads(pickled)
+
+        value = self.call_remote("get", key, MISSING, version=version)
+        if value is UNAVAILABLE:
+            self.count("misses")
+            return default
+        with self.lock:
+            # Misses are remembered too, most lookups (e.g. revoked claims) miss
+            self.set_local(local_key, value, DEFAULT_TIMEOUT)
+            if value is MISSING:
+                self.counters["misses"] += 1
+                return default
+            self.counters["remote_hits"] += 1
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.call_remote("set", key, value, timeout, version=version)
+        with self.lock:
+            self.set_local(local_key, value, timeout)
+        self.bump_version()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.call_remote("add", key, value, timeout, version=version)
+        with self.lock:
+            if added is UNAVAILABLE:
+                try:
+                    if self.local.get(local_key, time.time()) is not MISSING:
+                        return False
+                except KeyError:
+                    pass
+                self.set_local(local_key, value, timeout)
+                return True
+            if added:
+                self.set_local(local_key, value, timeout)
+            else:
+                # The value of the shared cache is read on the next get
+                self.local.delete(local_key)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.call_remote("incr", key, delta, version=version)
+        with self.lock:
+            if value is not UNAVAILABLE:
+                self.local.delete(local_key)
+                return value
+
+            try:
+                pickled = self.local.get(local_key, time.time())
+            except KeyError:
+                pickled = MISSING
+            if pickled is MISSING:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(pickled) + delta
+            expires_at = self.local.get_expiry(local_key)
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            self.local.set(local_key, pickled, expires_at)
+            return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        touched = self.call_remote("touch", key, timeout, version=version)
+        with self.lock:
+            try:
+                pickled = self.local.get(local_key, time.time())
+            except KeyError:
+                pickled = MISSING
+            if pickled is not MISSING:
+                self.local.set(local_key, pickled, self.local_expiry(timeout))
+        if touched is UNAVAILABLE:
+            return pickled is not MISSING
+        self.bump_version()
+        return touched
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self.call_remote("delete", key, version=version)
+        with self.lock:
+            deleted_locally = self.local.delete(local_key)
+        if deleted is UNAVAILABLE:
+            return deleted_locally
+        self.bump_version()
+        return deleted
+
+    def has_key(self, key, version=None):
+        sentinel = object()
+        return self.get(key, sentinel, version=version) is not sentinel
+
+    def clear(self):
+        self.call_remote("clear")
+        with self.lock:
+            self.local.clear()
+        self.bump_version()
+
+    def close(self, **kwargs):
+        self.remote.close(**kwargs)
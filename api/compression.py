@@ -0,0 +1,83 @@
+"""
+Content encodings of responses, brotli when the optional brotli package
+is installed and gzip otherwise, chosen by the client's Accept-Encoding.
+
+Gzip headers get random bytes like Django's GZipMiddleware does, so the
+length of responses doesn't give away secrets in them to BREACH attacks.
+Brotli has no such header, responses which may contain secrets are
+compressed with gzip.
+"""
+import functools
+
+from django.conf import settings
+from django.utils.text import compress_string
+
+# Content types worth compressing, other ones (e.g. images) are compressed already
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/msgpack",
+    "application/javascript",
+    "application/vnd.oai.openapi",
+    "image/svg+xml",
+)
+
+
+@functools.cache
+def brotli_module():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings():
+    """
+    Encodings in the order of preference, the smallest first
+    """
+    return ("br", "gzip") if brotli_module() is not None else ("gzip",)
+
+
+def accepted_encodings(header):
+    """
+    Encodings of the Accept-Encoding header with their quality values
+    """
+    accepted = {}
+    for part in header.split(","):
+        name, _, parameters = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header, encodings=None):
+    """
+    Preferred encoding the client accepts, None to send the content as it is
+    """
+    accepted = accepted_encodings(header)
+    for encoding in encodings or available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type):
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(content, encoding):
+    options = settings.COMPRESSION
+    if encoding == "br":
+        return brotli_module().compress(content, quality=options["BROTLI_QUALITY"])
+    return compress_string(content, max_random_bytes=options["GZIP_MAX_RANDOM_BYTES"])
@@ -1,5 +1,18 @@
+import time
+import random
+import cProfile
+import threading
+from pathlib import Path
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
+from . import compression, profiling
+
 
 class DRFTokenCookieMiddleware(MiddlewareMixin):
     """
@@ -11,3 +24,124 @@ class DRFTokenCookieMiddleware(MiddlewareMixin):
             access_token = request.COOKIES.get("accessToken", None)
             if access_token:
                 request.META["HTTP_AUTHORIZATION"] = f"Bearer {access_token}"
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses of at least COMPRESSION["MIN_SIZE"] bytes with
+    the best encoding the client accepts. Streaming responses, like
+    server-sent events, are sent as they are so events aren't held back
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < settings.COMPRESSION["MIN_SIZE"]
+            or not compression.is_compressible(response.get("Content-Type", ""))
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = compression.choose_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""),
+            ("gzip",) if self.may_contain_secrets(request, response) else None,
+        )
+        if encoding is None:
+            return response
+
+        content = compression.compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # The compressed bytes differ from the ones a strong ETag was made of
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        return response
+
+    def may_contain_secrets(self, request, response):
+        """
+        Whether the response has a CSRF token (e.g. in forms of the browsable
+        API) or sets cookies, only gzip hides its length with random bytes
+        """
+        return bool(request.META.get("CSRF_COOKIE_NEEDS_UPDATE") or response.cookies)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in instrumentation enabled with PROFILING["ENABLED"].
+
+    Every request's wall, SQL, serializer and outbound HTTP time is added
+    to per view histograms, and a SAMPLE_RATE fraction of requests is
+    profiled with cProfile and a stack sampler, writing .prof and
+    collapsed stack (.collapsed) files to OUTPUT_DIR
+    """
+
+    # Only one cProfile profiler can run at a time
+    cprofile_lock = threading.Lock()
+
+    def __init__(self, get_response):
+        config = getattr(settings, "PROFILING", {})
+        if not config.get("ENABLED"):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.sample_rate = config.get("SAMPLE_RATE", 0.01)
+        self.output_dir = Path(config.get("OUTPUT_DIR", "profiles"))
+        self.stack_interval = config.get("STACK_SAMPLE_INTERVAL", 0.001)
+        profiling.install_instrumentation()
+
+    def __call__(self, request):
+        timings = profiling.RequestTimings()
+        token = profiling.current_timings.set(timings)
+        sampled = random.random() < self.sample_rate
+
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(timings.sql_wrapper)
+                    )
+                start = time.perf_counter()
+                if sampled:
+                    response = self.profile(request)
+                else:
+                    response = self.get_response(request)
+                timings.wall_ms = (time.perf_counter() - start) * 1000
+        finally:
+            profiling.current_timings.reset(token)
+
+        profiling.histograms.observe(self.view_name(request), timings)
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "<unresolved>"
+        return match.view_name or match._func_path
+
+    def profile(self, request):
+        sampler = profiling.StackSampler(threading.get_ident(), self.stack_interval)
+        profiler = cProfile.Profile()
+        use_cprofile = self.cprofile_lock.acquire(blocking=False)
+
+        sampler.start()
+        if use_cprofile:
+            profiler.enable()
+        try:
+            return self.get_response(request)
+        finally:
+            if use_cprofile:
+                profiler.disable()
+                self.cprofile_lock.release()
+            sampler.stop()
+
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{self.view_name(request)}-{time.time_ns()}".replace(":", "_")
+            if use_cprofile:
+                profiler.dump_stats(self.output_dir / f"{name}.prof")
+            sampler.write(self.output_dir / f"{name}.collapsed")
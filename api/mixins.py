@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework.generics import get_object_or_404
 
+from api.recipes.exceptions import PreconditionFailed
+from recipes.models import VersionConflict
+
 
 class MultipleFieldLookupMixin:
     """
@@ -26,3 +30,58 @@ class MultipleFieldQuerysetMixin:
             if self.kwargs.get(field, None):
                 filter_args[field] = self.kwargs[field]
         return self.queryset.filter(**filter_args)
+
+
+class OptimisticConcurrencyMixin:
+    """
+    Version checked writes of objects of Versioned models. Objects are sent
+    with their version as the ETag, updates and deletes fail with 412 if the
+    object changed since the version given in If-Match, or since the request
+    read it, instead of overwriting the change or waiting for row locks
+    """
+    unsafe_methods = ("POST", "PUT", "PATCH", "DELETE")
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.request.method in self.unsafe_methods:
+            self.check_if_match(obj)
+        self.versioned_object = obj
+        return obj
+
+    def check_if_match(self, obj):
+        header = self.request.headers.get("If-Match")
+        if header is None or header.strip() == "*":
+            return
+        # Weak ETags of compressed responses match as well
+        versions = {
+            tag.strip().removeprefix("W/").strip('"') for tag in header.split(",")
+        }
+        if str(obj.version) not in versions:
+            raise PreconditionFailed()
+
+    def claim_version(self, obj):
+        """
+        Check in the current transaction that the object is still at the version
+        read by the request
+        """
+        try:
+            obj.claim_version()
+        except VersionConflict:
+            raise PreconditionFailed()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            self.claim_version(serializer.instance)
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            self.claim_version(instance)
+            super().perform_destroy(instance)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        obj = getattr(self, "versioned_object", None)
+        if obj is not None and request.method != "DELETE" and response.status_code < 300:
+            response["ETag"] = f'"{obj.version}"'
+        return response
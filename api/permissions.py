@@ -16,6 +16,17 @@ class IsAccountOwner(permissions.BasePermission):
         return obj == request.user
 
 
+class IsUsernameOwner(permissions.BasePermission):
+    """
+    Only allow the user whose username is in the url, without loading any object
+    """
+
+    message = "You must be owner of this account."
+
+    def has_permission(self, request, view):
+        return view.kwargs.get("username") == request.user.username
+
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Object-level permission to only allow owners of an object to edit it.
@@ -69,4 +80,9 @@ class HasEmailConfirmed(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.profile.email_confirmed
+
+        # Token users carry the flag as a claim, database users have it in profile
+        email_confirmed = getattr(request.user, "email_confirmed", None)
+        if email_confirmed is None:
+            email_confirmed = request.user.profile.email_confirmed
+        return email_confirmed
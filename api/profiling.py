@@ -0,0 +1,217 @@
+import sys
+import time
+import bisect
+import functools
+import threading
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+
+# Upper bounds of histogram buckets in milliseconds
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+TIMINGS = ("wall_ms", "sql_ms", "serializer_ms", "http_ms")
+
+# Timings of the request being handled in the current thread or task
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Time spent by the request in total and in its parts
+    """
+
+    def __init__(self):
+        self.wall_ms = 0
+        self.sql_ms = 0
+        self.queries = 0
+        self.serializer_ms = 0
+        self.http_ms = 0
+        self.http_requests = 0
+        # Nested serializers are timed as a part of the outermost one
+        self.serializer_depth = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+
+
+def time_serializer(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        timings = current_timings.get()
+        if timings is None:
+            return method(*args, **kwargs)
+
+        timings.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings.serializer_depth -= 1
+            if not timings.serializer_depth:
+                timings.serializer_ms += (time.perf_counter() - start) * 1000
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def time_http(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        timings = current_timings.get()
+        if timings is None:
+            return method(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings.http_ms += (time.perf_counter() - start) * 1000
+            timings.http_requests += 1
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def time_async_http(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        timings = current_timings.get()
+        if timings is None:
+            return await method(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            timings.http_ms += (time.perf_counter() - start) * 1000
+            timings.http_requests += 1
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_instrumentation():
+    """
+    Wrap serialization, validation and outbound HTTP of requests and httpx
+    once per process, wrappers only measure while the profiling middleware
+    handles a request
+    """
+    import requests
+    from rest_framework import serializers
+
+    targets = (
+        (serializers.Serializer, "to_representation", time_serializer),
+        (serializers.Serializer, "run_validation", time_serializer),
+        (serializers.ListSerializer, "to_representation", time_serializer),
+        (serializers.ListSerializer, "run_validation", time_serializer),
+        (requests.Session, "send", time_http),
+    )
+    try:
+        import httpx
+    except ImportError:
+        # Only used by async views
+        pass
+    else:
+        targets += ((httpx.AsyncClient, "send", time_async_http),)
+    for cls, name, decorator in targets:
+        method = cls.__dict__[name]
+        if not getattr(method, "profiled", False):
+            setattr(cls, name, decorator(method))
+
+
+class StackSampler(threading.Thread):
+    """
+    Periodically sample the stack of another thread and count
+    the collapsed stacks, the format read by flamegraph tools
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, "w") as file:
+            for stack, count in self.stacks.items():
+                file.write(f"{stack} {count}\n")
+
+
+class ViewHistograms:
+    """
+    Per view histograms of request timings, aggregated in this process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(self.empty)
+
+    @staticmethod
+    def empty():
+        view = {"count": 0, "queries": 0, "http_requests": 0}
+        for timing in TIMINGS:
+            view[timing] = {"sum": 0, "buckets": [0] * len(BUCKETS_MS)}
+        return view
+
+    def observe(self, view_name, timings):
+        with self.lock:
+            view = self.views[view_name]
+            view["count"] += 1
+            view["queries"] += timings.queries
+            view["http_requests"] += timings.http_requests
+            for timing in TIMINGS:
+                value = getattr(timings, timing)
+                histogram = view[timing]
+                histogram["sum"] += value
+                histogram["buckets"][bisect.bisect_left(BUCKETS_MS, value)] += 1
+
+    def snapshot(self):
+        """
+        Copy of the histograms with cumulative buckets keyed by their upper bound
+        """
+        with self.lock:
+            result = {}
+            for view_name, view in self.views.items():
+                result[view_name] = {
+                    "count": view["count"],
+                    "queries": view["queries"],
+                    "http_requests": view["http_requests"],
+                }
+                for timing in TIMINGS:
+                    cumulative, buckets = 0, {}
+                    for bound, count in zip(BUCKETS_MS, view[timing]["buckets"]):
+                        cumulative += count
+                        buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+                    result[view_name][timing] = {
+                        "sum": view[timing]["sum"],
+                        "buckets": buckets,
+                    }
+            return result
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+histograms = ViewHistograms()
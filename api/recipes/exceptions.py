@@ -0,0 +1,10 @@
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    status_code = 412
+    default_detail = (
+        "The object was changed since the version given in If-Match, "
+        "get it again and retry the change."
+    )
+    default_code = "version_conflict"
@@ -0,0 +1,29 @@
+from django.db.models import Q
+from django_filters import rest_framework as filters
+
+from recipes import models
+
+
+class RecipeFilter(filters.FilterSet):
+    ingredients__name = filters.CharFilter(
+        method='filter_ingredient_name',
+        label="Ingredient name, any spelling or alias of the ingredient matches",
+    )
+
+    class Meta:
+        model = models.Recipe
+        fields = ('tags', 'author__username')
+
+    def filter_ingredient_name(self, queryset, name, value):
+        """
+        Match the name through its canonical ingredient,
+        so recipes are filtered by integer keys
+        """
+        key = models.normalize_ingredient_name(value)
+        canonical = models.CanonicalIngredient.objects.filter(
+            Q(key=key) | Q(aliases__key=key)
+        ).values('pk')
+        recipes = models.Ingredient.objects.filter(canonical__in=canonical).values(
+            'recipe_id'
+        )
+        return queryset.filter(pk__in=recipes)
@@ -1,4 +1,4 @@
-import requests
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import (
     MinValueValidator,
     MaxValueValidator,
@@ -6,11 +6,21 @@ from django.core.validators import (
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
-from recipes import models
+from recipes import models, trending
 from api.relations import CustomMultiLookupHyperlink
+from .vegan import is_vegan
 from utils import generate_unique_identifier
 
 
+# Number of recipes a shopping list can be made of at most
+SHOPPING_LIST_MAX_RECIPES = 100
+# Number of recipes deleted at most in one request
+BULK_DELETE_MAX_RECIPES = 1000
+# Number of changes listed by the change feed by default and at most
+CHANGES_LIMIT = 100
+CHANGES_MAX_LIMIT = 500
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = serializers.HyperlinkedRelatedField(
         view_name='user-detail', lookup_field='username', read_only=True
@@ -56,13 +66,16 @@ class RecipeSerializer(serializers.ModelSerializer):
             'author',
             'title',
             'body',
+            'servings',
             'views',
+            'favourite_count',
             'image_listing',
             'ingredient_listing',
             'step_listing',
             'tags',
             'created',
             'modified',
+            'version',
             'id',
         )
 
@@ -94,6 +107,108 @@ class RecipeSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class TrendingRecipeSerializer(RecipeSerializer):
+    trending_score = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('trending_score',)
+
+    def get_trending_score(self, recipe) -> float:
+        """
+        Score decayed until now, the stored one only ranks recipes
+        """
+        return round(trending.current_score(recipe.trending_score), 3)
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    recipe = RecipeSerializer(source='similar')
+
+    class Meta:
+        model = models.SimilarRecipe
+        fields = ('recipe', 'score')
+
+
+class ServingsSerializer(serializers.Serializer):
+    servings = serializers.IntegerField(required=False, min_value=1, max_value=100)
+
+
+class ScaledIngredientSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    quantity = serializers.FloatField(allow_null=True)
+    unit = serializers.CharField(allow_null=True)
+    additional_informations = serializers.CharField(allow_null=True)
+
+
+class ScaledRecipeSerializer(serializers.Serializer):
+    servings = serializers.IntegerField()
+    ingredients = ScaledIngredientSerializer(many=True)
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    recipes = CustomMultiLookupHyperlink(
+        view_name='recipe-detail',
+        lookup_kwarg_fields=('slug', 'id'),
+        many=True,
+        queryset=models.Recipe.objects.all(),
+    )
+    # Servings needed of each recipe, their own servings by default
+    servings = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=100), required=False
+    )
+
+    def validate_recipes(self, recipes):
+        if len(recipes) > SHOPPING_LIST_MAX_RECIPES:
+            raise ValidationError(
+                f"Ensure this field has no more than {SHOPPING_LIST_MAX_RECIPES} recipes."
+            )
+        return recipes
+
+    def validate(self, data):
+        if 'servings' in data and len(data['servings']) != len(data['recipes']):
+            raise ValidationError(
+                {'servings': ["Ensure there are servings for every recipe."]}
+            )
+        return data
+
+    def get_servings(self):
+        """
+        Map recipes to their needed servings, summed if listed more than once
+        """
+        recipes = self.validated_data['recipes']
+        servings = self.validated_data.get('servings')
+        if servings is None:
+            servings = [recipe.servings for recipe in recipes]
+
+        needed = {}
+        for recipe, count in zip(recipes, servings):
+            needed[recipe] = needed.get(recipe, 0) + count
+        return needed
+
+
+class BulkDeleteRecipesSerializer(serializers.Serializer):
+    recipes = CustomMultiLookupHyperlink(
+        view_name='recipe-detail',
+        lookup_kwarg_fields=('slug', 'id'),
+        many=True,
+        queryset=models.Recipe.objects.all(),
+        write_only=True,
+    )
+    deleted = serializers.IntegerField(read_only=True)
+
+    def validate_recipes(self, recipes):
+        if len(recipes) > BULK_DELETE_MAX_RECIPES:
+            raise ValidationError(
+                f"Ensure this field has no more than {BULK_DELETE_MAX_RECIPES} recipes."
+            )
+        return recipes
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    quantity = serializers.FloatField(allow_null=True)
+    unit = serializers.CharField(allow_null=True)
+
+
 class RecipeChildSerializer(serializers.ModelSerializer):
     """
     Serializer for related models to recipe with ManyToOne relationship
@@ -121,7 +236,11 @@ class RecipeChildSerializer(serializers.ModelSerializer):
         recipe = self.get_recipe()
         validated_data['recipe'] = recipe
 
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as e:
+            # Orders are assigned and validated by the model, e.g. up to MAX_ORDER
+            raise serializers.ValidationError({'order': e.messages})
 
 
 class ImageSerializer(RecipeChildSerializer):
@@ -135,7 +254,7 @@ class ImageSerializer(RecipeChildSerializer):
 
     class Meta:
         model = models.Image
-        fields = ('url', 'recipe', 'image_url', 'order')
+        fields = ('url', 'recipe', 'image_url', 'order', 'version')
 
     def validate(self, data):
         """
@@ -173,20 +292,33 @@ class IngredientSerializer(RecipeChildSerializer):
         model = models.Ingredient
         fields = ('url', 'recipe', 'name', 'quantity', 'unit', 'additional_informations')
 
-    def validate_name(self, value):
+    def validate(self, data):
         """
-        Validate if the ingredient is vegan using is-vegan API
+        Validate if the ingredient is vegan, unless an async view checks it
+        after the validation without blocking on is-vegan API
         """
-        ingredient_arg = value.replace(' ', '').lower()
-        response = requests.get(
-            f'https://is-vegan.netlify.app/.netlify/functions/api?ingredients={ingredient_arg}'
-        )
-        if not response.json()['isVeganSafe']:
-            raise ValidationError(
-                detail="This ingredient is not vegan!", code='not_vegan_ingredient'
+        if 'name' in data and not self.context.get('defer_vegan_check'):
+            canonical = models.CanonicalIngredient.resolve(data['name'])
+            data['canonical'] = self.check_vegan(canonical, data['name'])
+        return data
+
+    def check_vegan(self, canonical, name, verdict=None):
+        """
+        Return the canonical ingredient if it's vegan, using the verdict stored
+        with it, the given one, or is-vegan API for ingredients not checked yet
+        """
+        if canonical.vegan is None:
+            canonical.vegan = is_vegan(name) if verdict is None else verdict
+            models.CanonicalIngredient.objects.filter(pk=canonical.pk).update(
+                vegan=canonical.vegan
             )
 
-        return value
+        if not canonical.vegan:
+            raise ValidationError(
+                detail={'name': ["This ingredient is not vegan!"]},
+                code='not_vegan_ingredient',
+            )
+        return canonical
 
 
 class StepSerializer(RecipeChildSerializer):
@@ -199,12 +331,53 @@ class StepSerializer(RecipeChildSerializer):
 
     class Meta:
         model = models.Step
-        fields = ('url', 'recipe', 'instruction', 'order')
+        fields = ('url', 'recipe', 'instruction', 'order', 'version')
+
+
+class RecipeChangeSerializer(RecipeSerializer):
+    """
+    Recipe with its child rows, so clients sync it in one request
+    """
+
+    images = ImageSerializer(many=True, read_only=True)
+    ingredients = IngredientSerializer(many=True, read_only=True)
+    steps = StepSerializer(many=True, read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'sequence',
+            'images',
+            'ingredients',
+            'steps',
+        )
+
+
+class DeletedRecipeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.DeletedRecipe
+        fields = ('id', 'sequence', 'deleted')
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(
+        min_value=0, default=0, help_text="Number of the last change seen"
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=CHANGES_MAX_LIMIT, default=CHANGES_LIMIT
+    )
+
+
+class ChangeFeedSerializer(serializers.Serializer):
+    changed = RecipeChangeSerializer(many=True)
+    deleted = DeletedRecipeSerializer(many=True)
+    # Passed as since to get the next changes
+    cursor = serializers.IntegerField()
+    next = serializers.URLField(allow_null=True)
 
 
 class StepOrderSerializer(serializers.Serializer):
     order = serializers.IntegerField(
-        validators=[MinValueValidator(1), MaxValueValidator(20)]
+        validators=[MinValueValidator(1), MaxValueValidator(models.Step.MAX_ORDER)]
     )
 
 
@@ -215,4 +388,10 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Tag
-        fields = ('url', 'name')
+        fields = ('url', 'name', 'recipe_count')
+
+
+class TagFacetSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -14,6 +15,12 @@ genericview_detail_methods = {
     'delete': 'destroy',
 }
 
+# Async serving mode routes I/O-bound endpoints to async views
+if settings.ASYNC_VIEWS:
+    ingredient_list_view = views.AsyncIngredientListView.as_view()
+else:
+    ingredient_list_view = views.IngredientViewSet.as_view(genericview_list_methods)
+
 urlpatterns = [
     # RECIPE
     path(
@@ -21,11 +28,58 @@ urlpatterns = [
         views.RecipeViewSet.as_view(genericview_list_methods),
         name='recipe-list',
     ),
+    path(
+        'facets/',
+        views.RecipeViewSet.as_view({'get': 'facets'}),
+        name='recipe-facets',
+    ),
+    path(
+        'trending/',
+        views.RecipeViewSet.as_view({'get': 'trending'}),
+        name='recipe-trending',
+    ),
+    path(
+        'changes/',
+        views.RecipeViewSet.as_view(
+            {'get': 'changes'}, **views.RecipeViewSet.changes.kwargs
+        ),
+        name='recipe-changes',
+    ),
+    path(
+        'shopping-list/',
+        # Pass the permissions of the action, as the router would
+        views.RecipeViewSet.as_view(
+            {'post': 'shopping_list'}, **views.RecipeViewSet.shopping_list.kwargs
+        ),
+        name='recipe-shopping-list',
+    ),
+    path(
+        'bulk-delete/',
+        views.RecipeViewSet.as_view(
+            {'post': 'bulk_delete'}, **views.RecipeViewSet.bulk_delete.kwargs
+        ),
+        name='recipe-bulk-delete',
+    ),
     path(
         '<slug:slug>-<uuid:id>/',
         views.RecipeViewSet.as_view(genericview_detail_methods),
         name='recipe-detail',
     ),
+    path(
+        '<slug:slug>-<uuid:id>/similar/',
+        views.RecipeViewSet.as_view({'get': 'similar'}),
+        name='recipe-similar',
+    ),
+    path(
+        '<slug:slug>-<uuid:id>/events/',
+        views.RecipeEventsView.as_view(),
+        name='recipe-events',
+    ),
+    path(
+        '<slug:slug>-<uuid:id>/scaled/',
+        views.RecipeViewSet.as_view({'get': 'scaled'}),
+        name='recipe-scaled',
+    ),
     # IMAGE
     path(
         f'<slug:recipe__slug>-<uuid:recipe__id>/images/',
@@ -40,7 +94,7 @@ urlpatterns = [
     # INGREDIENT
     path(
         f'<slug:recipe__slug>-<uuid:recipe__id>/ingredients/',
-        views.IngredientViewSet.as_view(genericview_list_methods),
+        ingredient_list_view,
         name='ingredient-list',
     ),
     path(
@@ -59,9 +113,10 @@ urlpatterns = [
         views.StepViewSet.as_view(genericview_detail_methods),
         name='step-detail',
     ),
-        path(
+    path(
         f'<slug:recipe__slug>-<uuid:recipe__id>/steps/<uuid:pk>/change-order/',
-        views.StepViewSet.as_view({'post':'change_order'}),
+        views.StepViewSet.as_view({'post': 'change_order'}),
+        name='step-change-order',
     ),
 ]
 
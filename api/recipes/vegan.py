@@ -0,0 +1,50 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+
+
+# Async HTTP clients by event loop, creating a client for every check
+# would build a new SSL context and connection pool each time
+async_clients = weakref.WeakKeyDictionary()
+
+
+def normalize_ingredient(name):
+    """
+    Form of the ingredient name expected by the is-vegan API
+    """
+    return name.replace(' ', '').lower()
+
+
+def vegan_api_params(name):
+    return {'ingredients': normalize_ingredient(name)}
+
+
+def is_vegan(name):
+    """
+    Check whether the ingredient is vegan using is-vegan API
+    """
+    import requests
+
+    response = requests.get(settings.VEGAN_API_URL, params=vegan_api_params(name))
+    return response.json()['isVeganSafe']
+
+
+async def is_vegan_async(name):
+    """
+    Check whether the ingredient is vegan using is-vegan API
+    without blocking the event loop
+    """
+    response = await get_async_client().get(
+        settings.VEGAN_API_URL, params=vegan_api_params(name)
+    )
+    return response.json()['isVeganSafe']
+
+
+def get_async_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    if loop not in async_clients:
+        async_clients[loop] = httpx.AsyncClient()
+    return async_clients[loop]
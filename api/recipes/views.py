@@ -1,19 +1,52 @@
-from django.db.models import F
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Count
 from django.core.exceptions import ValidationError
 
-from rest_framework import viewsets, filters, status
+from asgiref.sync import sync_to_async
+
+from rest_framework import viewsets, filters, status, mixins
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticatedOrReadOnly,
+    IsAdminUser,
+)
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from . import serializers
-from recipes import models
+from .exceptions import PreconditionFailed
+from .filters import RecipeFilter
+from recipes import changes, deletion, events, models, trending, units
 from api import permissions as custom_permissions
-from api.mixins import MultipleFieldLookupMixin, MultipleFieldQuerysetMixin
+from api.mixins import (
+    MultipleFieldLookupMixin,
+    MultipleFieldQuerysetMixin,
+    OptimisticConcurrencyMixin,
+)
+from api.async_views import AsyncGenericAPIView, event_stream_response
+from .vegan import is_vegan_async
+
+
+# Number of trending recipes listed by default and at most
+TRENDING_LIMIT = 20
+TRENDING_MAX_LIMIT = 100
+
+# Documents the optimistic concurrency of OptimisticConcurrencyMixin
+IF_MATCH = OpenApiParameter(
+    'If-Match',
+    str,
+    OpenApiParameter.HEADER,
+    description="ETag of the version the change is based on, "
+    "if the object changed since then it fails with 412",
+)
 
 
 @extend_schema(
@@ -26,15 +59,21 @@ from api.mixins import MultipleFieldLookupMixin, MultipleFieldQuerysetMixin
 )
 @extend_schema(
     description="Update the recipe (must be the author of the recipe)",
-    methods=["PATCH"],
+    methods=["PUT", "PATCH"],
+    parameters=[IF_MATCH],
 )
 @extend_schema(
     description="Delete the recipe (must be the author of the recipe)",
     methods=["DELETE"],
+    parameters=[IF_MATCH],
 )
-class RecipeViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
+class RecipeViewSet(
+    OptimisticConcurrencyMixin, MultipleFieldLookupMixin, viewsets.ModelViewSet
+):
     serializer_class = serializers.RecipeSerializer
-    queryset = models.Recipe.objects.all()
+    # Author is needed for the hyperlink and the ownership check,
+    # so fetch it with the recipe instead of lazily per object
+    queryset = models.Recipe.objects.select_related('author').prefetch_related('tags')
     multiple_lookup_fields = ('slug', 'id')
     permission_classes = (
         IsAuthenticatedOrReadOnly,
@@ -46,25 +85,227 @@ class RecipeViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
         filters.OrderingFilter,
         DjangoFilterBackend,
     )
-    filterset_fields = ('tags', 'author__username', 'ingredients__name')
+    filterset_class = RecipeFilter
     search_fields = ('=author__username', 'title', 'ingredients__name', 'tags__name')
-    ordering_fields = ('created', 'modified', 'views')
+    ordering_fields = ('created', 'modified', 'views', 'favourite_count')
 
     def retrieve(self, request, *args, **kwargs):
-        # Increment the view count if the recipe belongs to a different author
         recipe = self.get_object()
-        if recipe.author != request.user:
+
+        # Increment the view count if the recipe belongs to a different author,
+        # compare ids so the author doesn't have to be loaded
+        if not request.user.is_authenticated or recipe.author_id != request.user.pk:
             # Use atomic update with F() expression to ensure thread safety
-            models.Recipe.objects.filter(**kwargs).update(views=F('views') + 1)
+            models.Recipe.objects.filter(pk=recipe.pk).update(
+                views=F('views') + 1,
+                trending_score=trending.add_event_expression(
+                    settings.TRENDING['VIEW_WEIGHT']
+                ),
+            )
+            # Reflect the increment on the fetched instance instead of reloading it
+            recipe.views += 1
 
-        return super().retrieve(self, request)
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Count recipes per tag for the recipes matching the same search "
+        "and filters as the recipe listing",
+        parameters=[OpenApiParameter('search', str)],
+        responses=serializers.TagFacetSerializer(many=True),
+    )
+    @action(detail=False)
+    def facets(self, request, *args, **kwargs):
+        filter_params = {api_settings.SEARCH_PARAM, *self.filterset_class.base_filters}
+        if filter_params.isdisjoint(request.query_params):
+            # Browsing all recipes, use precomputed counts
+            tags = (
+                models.Tag.objects.filter(recipe_count__gt=0)
+                .values('slug', 'name', count=F('recipe_count'))
+                .order_by('-count', 'name')
+            )
+        else:
+            # Count only matching recipes, in one grouped query
+            recipes = self.filter_queryset(self.get_queryset()).order_by().values('pk')
+            tags = (
+                models.Tag.objects.filter(recipes__in=recipes)
+                .values('slug', 'name')
+                .annotate(count=Count('recipes', distinct=True))
+                .order_by('-count', 'name')
+            )
+
+        serializer = serializers.TagFacetSerializer(tags, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="List recipes trending now, ranked by views and favourites "
+        "which count less the older they are",
+        parameters=[OpenApiParameter('limit', int)],
+        responses=serializers.TrendingRecipeSerializer(many=True),
+    )
+    @action(detail=False)
+    def trending(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', TRENDING_LIMIT))
+        except ValueError:
+            limit = TRENDING_LIMIT
+        limit = min(max(limit, 1), TRENDING_MAX_LIMIT)
+
+        # Walks the score index, only the top recipes are read
+        recipes = (
+            self.get_queryset()
+            .filter(trending_score__isnull=False)
+            .order_by('-trending_score')[:limit]
+        )
+        serializer = serializers.TrendingRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="List recipes created or changed, with their images, ingredients "
+        "and steps, and recipes deleted after the given change, in the order "
+        "of changes, so offline clients download only what they miss",
+        parameters=[serializers.ChangesQuerySerializer],
+        responses=serializers.ChangeFeedSerializer,
+    )
+    @action(detail=False, filter_backends=())
+    def changes(self, request, *args, **kwargs):
+        query = serializers.ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        recipes = self.get_queryset().prefetch_related('images', 'ingredients', 'steps')
+        changed, deleted, cursor, has_more = changes.changes_since(
+            recipes, query.validated_data['since'], query.validated_data['limit']
+        )
+
+        next_url = None
+        if has_more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'since', cursor
+            )
+        serializer = serializers.ChangeFeedSerializer(
+            {
+                'changed': changed,
+                'deleted': deleted,
+                'cursor': cursor,
+                'next': next_url,
+            },
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="List recipes with the most similar ingredients and tags",
+        responses=serializers.SimilarRecipeSerializer(many=True),
+    )
+    @action(detail=True)
+    def similar(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        neighbours = (
+            models.SimilarRecipe.objects.filter(recipe=recipe)
+            .select_related('similar__author')
+            .prefetch_related('similar__tags')
+            .order_by('-score')[: settings.SIMILAR_RECIPES['NEIGHBOURS']]
+        )
+        serializer = serializers.SimilarRecipeSerializer(
+            neighbours, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Get ingredients of the recipe with quantities scaled "
+        "to the number of servings, the recipe servings by default",
+        parameters=[serializers.ServingsSerializer],
+        responses=serializers.ScaledRecipeSerializer,
+    )
+    @action(detail=True)
+    def scaled(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        query = serializers.ServingsSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        servings = query.validated_data.get('servings', recipe.servings)
+
+        ingredients = list(
+            recipe.ingredients.values(
+                'name', 'quantity', 'unit', 'additional_informations'
+            )
+        )
+        quantities = units.scale(
+            [ingredient['quantity'] for ingredient in ingredients],
+            servings / recipe.servings,
+        )
+        for ingredient, quantity in zip(ingredients, quantities):
+            ingredient['quantity'] = quantity
+        serializer = serializers.ScaledRecipeSerializer(
+            {'servings': servings, 'ingredients': ingredients}
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Sum up quantities of ingredients needed to cook the recipes, "
+        "scaled to their servings and converted to common units",
+        request=serializers.ShoppingListSerializer,
+        responses=serializers.ShoppingListItemSerializer(many=True),
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping-list',
+        permission_classes=(AllowAny,),
+        filter_backends=(),
+    )
+    def shopping_list(self, request, *args, **kwargs):
+        serializer = serializers.ShoppingListSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        items = units.shopping_list(serializer.get_servings())
+        return Response(serializers.ShoppingListItemSerializer(items, many=True).data)
+
+    @extend_schema(
+        description="Delete the recipes with their images, ingredients and steps "
+        "(admin only)",
+        request=serializers.BulkDeleteRecipesSerializer,
+        responses=serializers.BulkDeleteRecipesSerializer,
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-delete',
+        permission_classes=(IsAdminUser,),
+        filter_backends=(),
+    )
+    def bulk_delete(self, request, *args, **kwargs):
+        serializer = serializers.BulkDeleteRecipesSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        recipe_pks = {recipe.pk for recipe in serializer.validated_data['recipes']}
+        deleted = deletion.delete_recipes(recipe_pks)
+        return Response(
+            serializers.BulkDeleteRecipesSerializer({'deleted': deleted}).data
+        )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            self.claim_version(instance)
+            # Without collecting related rows and sending a signal for each of them
+            deletion.delete_recipes([instance.pk])
 
 
 @extend_schema(description="Get all images for the specific recipe", methods=['GET'])
 @extend_schema(description="Add new image to the recipe", methods=['POST'])
-@extend_schema(description="Update the image object", methods=['PUT', 'PATCH'])
-@extend_schema(description="Delete the image", methods=["DELETE"])
-class ImageViewSet(MultipleFieldQuerysetMixin, viewsets.ModelViewSet):
+@extend_schema(
+    description="Update the image object",
+    methods=['PUT', 'PATCH'],
+    parameters=[IF_MATCH],
+)
+@extend_schema(
+    description="Delete the image", methods=["DELETE"], parameters=[IF_MATCH]
+)
+class ImageViewSet(
+    OptimisticConcurrencyMixin, MultipleFieldQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = serializers.ImageSerializer
     queryset = models.Image.objects.all()
     queryset_fields = ('recipe__slug', 'recipe__id', 'pk')
@@ -92,11 +333,58 @@ class IngredientViewSet(MultipleFieldQuerysetMixin, viewsets.ModelViewSet):
     )
 
 
+@extend_schema(
+    description="Get all ingredients for the specific recipe", methods=["GET"]
+)
+@extend_schema(description="Add new ingredient to the recipe", methods=['POST'])
+class AsyncIngredientListView(
+    MultipleFieldQuerysetMixin,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+    AsyncGenericAPIView,
+):
+    """
+    Ingredient listing and creation for the async serving mode,
+    the vegan check doesn't block the event loop
+    """
+
+    serializer_class = serializers.IngredientSerializer
+    queryset = models.Ingredient.objects.all()
+    queryset_fields = IngredientViewSet.queryset_fields
+    permission_classes = IngredientViewSet.permission_classes
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(self.list)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        # Validated first, so invalid ingredients make no rows or API requests
+        context = {**self.get_serializer_context(), 'defer_vegan_check': True}
+        serializer = self.get_serializer(data=request.data, context=context)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        name = serializer.validated_data['name']
+        canonical = await sync_to_async(models.CanonicalIngredient.resolve)(name)
+        verdict = await is_vegan_async(name) if canonical.vegan is None else None
+        serializer.validated_data['canonical'] = await sync_to_async(
+            serializer.check_vegan
+        )(canonical, name, verdict)
+
+        await sync_to_async(self.perform_create)(serializer)
+        data = await sync_to_async(lambda: serializer.data)()
+        return Response(
+            data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data)
+        )
+
+
 @extend_schema(description="Get all steps for the specific recipe", methods=['GET'])
 @extend_schema(description="Add new step to the recipe", methods=['POST'])
-@extend_schema(description="Update the step", methods=['PUT', 'PATCH'])
-@extend_schema(description="Delete the step", methods=['DELETE'])
-class StepViewSet(MultipleFieldQuerysetMixin, viewsets.ModelViewSet):
+@extend_schema(
+    description="Update the step", methods=['PUT', 'PATCH'], parameters=[IF_MATCH]
+)
+@extend_schema(description="Delete the step", methods=['DELETE'], parameters=[IF_MATCH])
+class StepViewSet(
+    OptimisticConcurrencyMixin, MultipleFieldQuerysetMixin, viewsets.ModelViewSet
+):
     queryset = models.Step.objects.all()
     queryset_fields = ('recipe__slug', 'recipe__id', 'pk')
     permission_classes = (
@@ -111,6 +399,10 @@ class StepViewSet(MultipleFieldQuerysetMixin, viewsets.ModelViewSet):
         else:
             return serializers.StepSerializer
 
+    @extend_schema(
+        description="Move the step to the given order, shifting the steps in between",
+        parameters=[IF_MATCH],
+    )
     @action(detail=True, methods=['post'])
     def change_order(
         self,
@@ -120,15 +412,16 @@ class StepViewSet(MultipleFieldQuerysetMixin, viewsets.ModelViewSet):
         **kwargs,
     ):
         step = self.get_object()
-        new_order = request.data['order']
 
         serializer = serializers.StepOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         try:
-            step.change_order(new_order)
+            step.change_order(serializer.validated_data['order'])
         except ValidationError as e:
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
+        except models.VersionConflict:
+            raise PreconditionFailed()
 
         return Response(serializer.data)
 
@@ -147,4 +440,19 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAdminUser,)
     filter_backends = (filters.SearchFilter, filters.OrderingFilter)
     search_fields = ('name',)
-    ordering_fields = ('name',)
+    ordering_fields = ('name', 'recipe_count')
+
+
+@extend_schema(
+    description="Stream server-sent events when the recipe, its images, ingredients, "
+    "steps or tags change, or it's deleted. Event ids are numbers of changes, "
+    "missed changes are listed by the change feed since the last one",
+    responses={(200, 'text/event-stream'): OpenApiTypes.STR},
+)
+class RecipeEventsView(MultipleFieldLookupMixin, AsyncGenericAPIView):
+    queryset = models.Recipe.objects.all()
+    multiple_lookup_fields = ('slug', 'id')
+
+    async def get(self, request, *args, **kwargs):
+        recipe = await sync_to_async(self.get_object)()
+        return event_stream_response(request, [events.recipe_topic(recipe.pk)])
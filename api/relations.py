@@ -1,9 +1,63 @@
-from django.shortcuts import get_object_or_404
-from rest_framework.serializers import HyperlinkedRelatedField
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from urllib import parse
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.urls import Resolver404, get_script_prefix, resolve
+from django.utils.encoding import uri_to_iri
+from rest_framework.serializers import (
+    HyperlinkedRelatedField,
+    ManyRelatedField,
+    ValidationError,
+)
+from rest_framework.relations import MANY_RELATION_KWARGS
 from rest_framework.reverse import reverse
 from rest_framework.fields import get_attribute
 
 
+class BatchedManyRelatedField(ManyRelatedField):
+    """
+    ManyRelatedField resolving submitted items in bulk. The child relation
+    parses every item to the view it points to and lookup values with
+    resolve_lookup, then get_objects fetches objects of each view in one query
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        resolved = []
+        error = None
+        for item in data:
+            try:
+                resolved.append(child.resolve_lookup(item))
+            except ValidationError as exc:
+                # Items after an invalid one wouldn't be resolved anyway
+                error = exc
+                break
+
+        lookups_by_view = defaultdict(set)
+        for view_name, lookup in resolved:
+            lookups_by_view[view_name].add(lookup)
+        objects = {
+            view_name: child.get_objects(view_name, lookups)
+            for view_name, lookups in lookups_by_view.items()
+        }
+
+        # Raise the error which resolving items one by one would raise first
+        for view_name, lookup in resolved:
+            if lookup not in objects[view_name]:
+                child.fail('does_not_exist')
+        if error is not None:
+            raise error
+        return [objects[view_name][lookup] for view_name, lookup in resolved]
+
+
 class CustomMultiLookupHyperlink(HyperlinkedRelatedField):
     """
     HyperLinkedRelated field which accept multiple lookup arguments,
@@ -32,6 +86,17 @@ class CustomMultiLookupHyperlink(HyperlinkedRelatedField):
 
         super().__init__(view_name, **kwargs)
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """
+        Resolve lists of hyperlinks in bulk instead of a query per hyperlink
+        """
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
     def get_object(self, view_name, view_args, view_kwargs):
         """
         Get the related object based on multiple lookup fields
@@ -43,8 +108,100 @@ class CustomMultiLookupHyperlink(HyperlinkedRelatedField):
             lookup_value = view_kwargs[lookup_url_kwarg]
             lookup_kwargs[lookup_field] = lookup_value
 
+        # Missing objects raise ObjectDoesNotExist, which is reported
+        # as a validation error like in the batched resolution
         queryset = self.get_queryset()
-        return get_object_or_404(queryset, **lookup_kwargs)
+        return queryset.get(**lookup_kwargs)
+
+    def resolve_lookup(self, data):
+        """
+        Parse the hyperlink like to_internal_value does, and return
+        the name of the view and lookup values of the object it points to
+        """
+        if not isinstance(data, str):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        if data.startswith(('http:', 'https:')):
+            # Convert absolute URLs to relative paths
+            data = parse.urlparse(data).path
+            prefix = get_script_prefix()
+            if data.startswith(prefix):
+                data = '/' + data[len(prefix):]
+
+        data = uri_to_iri(parse.unquote(data))
+
+        try:
+            match = resolve(data)
+        except Resolver404:
+            self.fail('no_match')
+
+        request = self.context.get('request')
+        try:
+            expected_viewname = request.versioning_scheme.get_versioned_viewname(
+                self.view_name, request
+            )
+        except AttributeError:
+            expected_viewname = self.view_name
+
+        if match.view_name != expected_viewname:
+            self.fail('incorrect_match')
+
+        lookup = tuple(
+            str(match.kwargs[lookup_url_kwarg])
+            for lookup_url_kwarg in self.lookup_kwarg_fields
+        )
+        return match.view_name, lookup
+
+    def get_lookup(self, obj):
+        """
+        Lookup values of the object, comparable with ones of resolve_lookup
+        """
+        return tuple(
+            str(self.get_lookup_value(obj, lookup_field))
+            for lookup_field in self.lookup_kwarg_fields.values()
+        )
+
+    def get_unique_lookup_field(self, model):
+        """
+        Lookup field identifying objects on its own, if there's any
+        """
+        for lookup_field in self.lookup_kwarg_fields.values():
+            if lookup_field == 'pk':
+                return lookup_field
+            try:
+                field = model._meta.get_field(lookup_field)
+            except FieldDoesNotExist:
+                # Fields of related objects, as well as unknown ones
+                continue
+            if field.unique:
+                return lookup_field
+        return None
+
+    def get_objects(self, view_name, lookups):
+        """
+        Fetch objects with the given lookup values in one query,
+        keyed by their lookup values
+        """
+        queryset = self.get_queryset().order_by()
+        lookup_fields = list(self.lookup_kwarg_fields.values())
+
+        unique_field = self.get_unique_lookup_field(queryset.model)
+        if unique_field is not None:
+            # Other lookup values are compared with the fetched objects,
+            # so e.g. an URL with an outdated slug doesn't match
+            index = lookup_fields.index(unique_field)
+            values = {lookup[index] for lookup in lookups}
+            query = Q(**{f'{unique_field}__in': values})
+        else:
+            query = reduce(
+                or_, (Q(**dict(zip(lookup_fields, lookup))) for lookup in lookups)
+            )
+
+        try:
+            return {self.get_lookup(obj): obj for obj in queryset.filter(query)}
+        except (TypeError, ValueError, DjangoValidationError):
+            # Lookup values of a wrong type, get_object wouldn't find them either
+            return {}
 
     def get_attribute(self, instance):
         """
@@ -60,18 +217,20 @@ class CustomMultiLookupHyperlink(HyperlinkedRelatedField):
         url_kwargs = {}
 
         for lookup_url_kwarg, lookup_field in lookup_kwarg_fields.items():
-            # If it has related field(s), seperate them and get value from every of them
-            # untill you get the value of the last one
-            if '__' in lookup_field:
-                relational_fields = lookup_field.split('__')
-                related_obj_value = obj
-                for relational_field in relational_fields:
-                    if related_obj_value is None:
-                        break
-                    related_obj_value = getattr(related_obj_value, relational_field)
-                lookup_value = related_obj_value
-            else:
-                lookup_value = getattr(obj, lookup_field)
-            url_kwargs[lookup_url_kwarg] = lookup_value
+            url_kwargs[lookup_url_kwarg] = self.get_lookup_value(obj, lookup_field)
 
         return reverse(view_name, kwargs=url_kwargs, request=request, format=format)
+
+    @staticmethod
+    def get_lookup_value(obj, lookup_field):
+        # If it has related field(s), seperate them and get value from every of them
+        # untill you get the value of the last one
+        if '__' in lookup_field:
+            relational_fields = lookup_field.split('__')
+            related_obj_value = obj
+            for relational_field in relational_fields:
+                if related_obj_value is None:
+                    break
+                related_obj_value = getattr(related_obj_value, relational_field)
+            return related_obj_value
+        return getattr(obj, lookup_field)
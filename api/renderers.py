@@ -0,0 +1,70 @@
+"""
+Renderers faster or more compact than DRF's JSON renderer, using optional
+dependencies: orjson, falling back to DRF's encoder when it's missing,
+and msgpack, offered only when it's installed.
+"""
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Types neither encoder handles natively, e.g. decimals and lazy translations
+encode_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Compact JSON like DRF's renderer, encoded by orjson, which handles UUIDs,
+    datetimes and numpy arrays natively. Indented JSON, e.g. of the browsable
+    API, is still rendered by DRF's renderer
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        return orjson.dumps(
+            data,
+            default=encode_default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Binary MessagePack, selected with Accept: application/msgpack or
+    ?format=msgpack. UUIDs and datetimes are strings, like in JSON
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    available = msgpack is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default)
+
+
+class AvailableRenderersNegotiation(DefaultContentNegotiation):
+    """
+    Content negotiation skipping renderers whose optional dependency
+    isn't installed, so the schema lists the same formats everywhere
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderers = [renderer for renderer in renderers if getattr(renderer, "available", True)]
+        return super().select_renderer(request, renderers, format_suffix)
@@ -0,0 +1,57 @@
+import json
+import hashlib
+
+
+def generate_schema():
+    """
+    Generate the OpenAPI schema of the API as YAML, the same as
+    `spectacular` management command does
+    """
+    from drf_spectacular.drainage import GENERATOR_STATS
+    from drf_spectacular.renderers import OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    from . import schema_extensions  # noqa: F401 Registers OpenAPI extensions
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    with GENERATOR_STATS.silence():
+        schema = generator.get_schema(request=None, public=True)
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+class PrebuiltSchema:
+    """
+    Schema file built with `build_schema` command, read once per process
+    and reloaded when the file changes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.modified = None
+
+    def load(self):
+        """
+        Return False if there's no prebuilt schema file
+        """
+        try:
+            modified = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+        if modified != self.modified:
+            import yaml
+
+            yaml_content = self.path.read_bytes()
+            self.formats = {
+                "yaml": (yaml_content, "application/vnd.oai.openapi"),
+                "json": (
+                    json.dumps(yaml.safe_load(yaml_content)).encode(),
+                    "application/vnd.oai.openapi+json",
+                ),
+            }
+            self.etags = {
+                schema_format: '"%s"' % hashlib.sha256(content).hexdigest()
+                for schema_format, (content, _) in self.formats.items()
+            }
+            self.modified = modified
+        return True
@@ -0,0 +1,20 @@
+"""
+OpenAPI extensions, imported only where the schema is generated as they
+pull in the schema tooling
+"""
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.views import SpectacularAPIView
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """
+    Document ClaimsJWTAuthentication as the bearer scheme of Simple JWT
+    """
+
+    target_class = "api.authentication.ClaimsJWTAuthentication"
+
+
+class LiveSchemaView(SpectacularAPIView):
+    """
+    Schema generated on request, with the extensions registered
+    """
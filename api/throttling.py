@@ -0,0 +1,124 @@
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket holding `num_requests` tokens, refilled continuously
+    at `num_requests` per `duration`, shared by all worker processes
+    through the configured cache.
+
+    Taken tokens are counted per fixed window with atomic cache increments,
+    so concurrent requests can't overwrite each other's state. Tokens taken
+    in the previous window flow back into the bucket linearly during
+    the current one.
+
+    The rate is looked up by the `throttle_scope` of the view or the `scope`
+    of the throttle (and its `rate_suffix`) in `DEFAULT_THROTTLE_RATES`,
+    views without a configured rate aren't throttled.
+    """
+
+    cache_format = "throttle_bucket_%(scope)s_%(ident)s"
+    rate_suffix = ""
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request
+        pass
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope + self.rate_suffix)
+
+    def get_ident_key(self, request):
+        """
+        Return a value identifying the bucket of this request,
+        or None if the request shouldn't be throttled
+        """
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return None
+        return self.cache_format % {"scope": self.scope + self.rate_suffix, "ident": ident}
+
+    def allow_request(self, request, view):
+        # Throttles used by function based views may define the scope themselves
+        self.scope = getattr(view, "throttle_scope", None) or self.scope
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        # Part of the current window which has already passed
+        self.elapsed = self.now / self.duration - window
+
+        current_key = f"{self.key}_{window}"
+        self.taken = self.take_token(current_key)
+        self.previous = self.cache.get(f"{self.key}_{window - 1}", 0)
+
+        if self.previous * (1 - self.elapsed) + self.taken > self.num_requests:
+            # Rejected requests don't take tokens
+            self.cache.decr(current_key)
+            return False
+        return True
+
+    def take_token(self, key):
+        """
+        Atomically increment the number of tokens taken in the window
+        """
+        # Windows are needed only until the end of the next one
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # The key expired between add and incr
+            self.cache.add(key, 1, self.duration * 2)
+            return 1
+
+    def wait(self):
+        """
+        Seconds until the next token is available
+        """
+        remaining = 1 - self.elapsed
+        if self.taken > self.num_requests or not self.previous:
+            return remaining * self.duration
+
+        # Wait for enough tokens of the previous window to flow back
+        refill_at = 1 - (self.num_requests - self.taken) / self.previous
+        return max(refill_at - self.elapsed, 0) * self.duration
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Bucket per client IP address
+    """
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Bucket per authenticated user, its rate is configured
+    with `<throttle_scope>_user` key
+    """
+
+    rate_suffix = "_user"
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class ConfirmEmailMessageThrottle(UserTokenBucketThrottle):
+    scope = "confirm_email_message"
@@ -4,29 +4,41 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
 )
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
 from . import views
+from .users.serializers import (
+    ClaimsTokenObtainPairSerializer,
+    ClaimsTokenRefreshSerializer,
+)
 
 urlpatterns = [
     path("", views.redirect_to_schema),
     path("recipes/", include("api.recipes.urls")),
     path("users/", include("api.users.urls")),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "token/",
+        TokenObtainPairView.as_view(serializer_class=ClaimsTokenObtainPairSerializer),
+        name="token_obtain_pair",
+    ),
+    path(
+        "token/refresh/",
+        TokenRefreshView.as_view(serializer_class=ClaimsTokenRefreshSerializer),
+        name="token_refresh",
+    ),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
+    path("metrics/cache/", views.CacheMetricsView.as_view(), name="cache-metrics"),
+    path("schema/", views.PrebuiltSchemaView.as_view(), name="schema"),
+    # Schema tooling is imported on the first request to keep startup fast
     path(
         "schema/swagger-ui/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
+        views.lazy_view(
+            "drf_spectacular.views.SpectacularSwaggerView", url_name="schema"
+        ),
         name="swagger-ui",
     ),
     path(
         "schema/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
+        views.lazy_view("drf_spectacular.views.SpectacularRedocView", url_name="schema"),
         name="redoc",
     ),
 ]
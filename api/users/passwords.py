@@ -0,0 +1,178 @@
+"""
+Password strength evaluated in one pass over the password, without queries,
+as it is checked on every keystroke while typing a new password.
+
+Passwords found in the breached password list are weak whatever characters
+they have. The list is a sorted file of lowercased passwords, one per line,
+built by the build_breached_passwords command. It is memory-mapped, so worker
+processes share its pages, and searched with binary search.
+"""
+import functools
+import gzip
+import logging
+import math
+import mmap
+import os
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MIN_LENGTH = 8
+
+# Character classes as bit flags
+UPPERCASE, LOWERCASE, DIGIT, SPECIAL = 1, 2, 4, 8
+SPECIAL_CHARACTERS = "!@#$%^&*()_+-=[]{};':\"\\|,.<>/?"
+ALL_CLASSES = UPPERCASE | LOWERCASE | DIGIT | SPECIAL
+
+# Number of characters of each class, guessing a character of a password
+# means trying the characters of all its classes
+POOL_SIZES = {UPPERCASE: 26, LOWERCASE: 26, DIGIT: 10, SPECIAL: len(SPECIAL_CHARACTERS)}
+OTHER_POOL_SIZE = 100
+
+
+def build_class_table():
+    """
+    Table translating ASCII bytes to flags of their character class
+    """
+    table = bytearray(256)
+    ranges = (("A", "Z", UPPERCASE), ("a", "z", LOWERCASE), ("0", "9", DIGIT))
+    for first, last, flag in ranges:
+        for code in range(ord(first), ord(last) + 1):
+            table[code] = flag
+    for character in SPECIAL_CHARACTERS:
+        table[ord(character)] = SPECIAL
+    return bytes(table)
+
+
+CLASS_TABLE = build_class_table()
+# Bits of entropy per character of passwords with each combination of classes
+POOL_BITS = [
+    math.log2(sum(size for flag, size in POOL_SIZES.items() if flags & flag) or 1)
+    for flags in range(ALL_CLASSES + 1)
+]
+
+
+def character_classes(password):
+    """
+    Flags of character classes present in the password, ASCII characters
+    are translated to their flags at once, only distinct flags are combined
+    """
+    flags = 0
+    for flag in set(password.encode("ascii", "ignore").translate(CLASS_TABLE)):
+        flags |= flag
+    if not password.isascii() and any(map(str.isdecimal, password)):
+        # Digits of other scripts
+        flags |= DIGIT
+    return flags
+
+
+CHUNK_SIZE = 2**20
+
+
+class BreachedPasswords:
+    """
+    Sorted list of breached passwords in a memory-mapped file
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Counted in chunks, mmap.count is missing before Python 3.12
+        self.count = sum(
+            self.map[start : start + CHUNK_SIZE].count(b"\n")
+            for start in range(0, len(self.map), CHUNK_SIZE)
+        )
+
+    def __contains__(self, password):
+        key = password.lower().encode()
+        data = self.map
+        # Lines starting in the range are left to compare
+        low, high = 0, len(data)
+        while low < high:
+            middle = (low + high) // 2
+            start = data.rfind(b"\n", low, middle) + 1 or low
+            end = data.find(b"\n", middle)
+            if end == -1:
+                end = len(data)
+
+            line = data[start:end]
+            if line == key:
+                return True
+            if line < key:
+                low = end + 1
+            else:
+                high = start
+        return False
+
+
+def build_breached_passwords(sources, path):
+    """
+    Write the sorted list of distinct lowercased passwords of the source files,
+    one password per line, plain or gzipped. The list replaces the old one
+    at once, processes keep the old one mapped until they restart.
+    Return the number of passwords
+    """
+    passwords = set()
+    for source in sources:
+        opener = gzip.open if str(source).endswith(".gz") else open
+        with opener(source, "rb") as file:
+            for line in file:
+                password = line.decode(errors="ignore").strip().lower().encode()
+                if password:
+                    passwords.add(password)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        for password in sorted(passwords):
+            file.write(password + b"\n")
+    os.replace(temporary_path, path)
+    return len(passwords)
+
+
+@functools.cache
+def breached_passwords():
+    """
+    Breached password list opened once per process, None if it wasn't built
+    or is empty
+    """
+    path = settings.BREACHED_PASSWORDS_PATH
+    if not os.path.exists(path):
+        logger.warning("Breached password list %s doesn't exist", path)
+        return None
+    # Built from sources without passwords, empty files can't be mapped
+    if os.path.getsize(path) == 0:
+        logger.warning("Breached password list %s is empty", path)
+        return None
+    return BreachedPasswords(path)
+
+
+def evaluate_password(password):
+    """
+    Strength of the password, estimated bits of entropy,
+    and whether it's in the breached password list
+    """
+    flags = character_classes(password)
+    pool_bits = POOL_BITS[flags]
+    if not password.isascii():
+        pool_bits = math.log2(2**pool_bits + OTHER_POOL_SIZE)
+    entropy = len(password) * pool_bits
+
+    breached_list = breached_passwords()
+    breached = breached_list is not None and password in breached_list
+    if breached:
+        # Guessed by trying the list
+        entropy = min(entropy, math.log2(max(breached_list.count, 1)))
+
+    long_enough = len(password) >= MIN_LENGTH
+    mixed_case = flags & (UPPERCASE | LOWERCASE) == UPPERCASE | LOWERCASE
+    if breached:
+        strength = "Weak"
+    elif long_enough and flags == ALL_CLASSES:
+        strength = "Strong"
+    elif long_enough or mixed_case or flags & DIGIT:
+        strength = "Moderate"
+    else:
+        strength = "Weak"
+
+    return {"strength": strength, "entropy": round(entropy, 1), "breached": breached}
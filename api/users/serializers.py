@@ -1,10 +1,25 @@
 from rest_framework import serializers
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import User
+from drf_spectacular.utils import extend_schema_field
+from recipes.models import Recipe
 from users import models
+from api.authentication import add_user_claims
 from api.relations import CustomMultiLookupHyperlink
 from .validators import validate_email
 
 
+# Number of recipe hyperlinks per page of the user's details
+USER_RECIPES_PAGE_SIZE = 20
+
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(validators=[validate_email])
     password = serializers.CharField(write_only=True)
@@ -27,6 +42,35 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token pair with user claims, read by ClaimsJWTAuthentication
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refreshed access token with the current user claims instead of the ones
+    copied from the refresh token, which may have changed since the login
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data["access"])
+        user = (
+            User.objects.select_related("profile")
+            .filter(pk=access[api_settings.USER_ID_CLAIM])
+            .first()
+        )
+        if user is not None:
+            data["access"] = str(add_user_claims(access, user))
+        return data
+
+
 class LoginUserSerializer(serializers.Serializer):
     login_or_email = serializers.CharField()
     password = serializers.CharField()
@@ -68,31 +112,61 @@ class UserSerializer(serializers.ModelSerializer):
 
         # Check if the user making the request is the owner of the object
         user = self.context["request"].user
-        
-        print(representation)
-        if instance != user:
+
+        # Compare by primary key, as user may be a token user without a database row
+        if instance.pk != user.pk:
             representation.pop("email")
             representation.pop("favourite_recipes")
         return representation
 
 
+class RecipeLinksPagination(PageNumberPagination):
+    page_size = USER_RECIPES_PAGE_SIZE
+    page_query_param = "recipes_page"
+
+
+class RecipeLinksSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    next = serializers.URLField(allow_null=True)
+    previous = serializers.URLField(allow_null=True)
+    results = serializers.ListField(child=serializers.URLField())
+
+
 class UserDetailSerializer(UserSerializer):
     """
-    Serializer with a list of recipes to be loaded individually
+    Serializer with a page of recipes to be loaded individually
     """
 
     email = serializers.EmailField(validators=[validate_email])
-    recipes = CustomMultiLookupHyperlink(
-        view_name="recipe-detail",
-        lookup_kwarg_fields=("slug", "id"),
-        many=True,
-        read_only=True,
-    )
+    recipes = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ("url", "username", "email", "profile", "favourite_recipes", "recipes")
 
+    @extend_schema_field(RecipeLinksSerializer)
+    def get_recipes(self, user):
+        """
+        Hyperlinks of the page of user's recipes, latest first,
+        selected by the recipes_page query parameter
+        """
+        request = self.context["request"]
+        paginator = RecipeLinksPagination()
+        recipes = paginator.paginate_queryset(user.recipes.only("slug", "id"), request)
+        return {
+            "count": paginator.page.paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": [
+                reverse(
+                    "recipe-detail",
+                    kwargs={"slug": recipe.slug, "id": recipe.id},
+                    request=request,
+                )
+                for recipe in recipes
+            ],
+        }
+
     def update(self, instance, validated_data):
         profile_data = validated_data.pop("profile")
         profile = models.Profile.objects.get(user=instance)
@@ -108,6 +182,28 @@ class UserDetailSerializer(UserSerializer):
         return instance
 
 
+class RecentRecipeSerializer(serializers.ModelSerializer):
+    url = CustomMultiLookupHyperlink(
+        view_name="recipe-detail",
+        lookup_kwarg_fields=("slug", "id"),
+        source="*",
+        read_only=True,
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ("url", "title", "created", "views", "favourite_count")
+
+
+class AuthorStatsSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+    total_views = serializers.IntegerField()
+    total_favourites = serializers.IntegerField()
+    last_published = serializers.DateTimeField(allow_null=True)
+    recent_recipes = RecentRecipeSerializer(many=True)
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(write_only=True)
     new_password = serializers.CharField(write_only=True)
@@ -127,6 +223,37 @@ class PasswordSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
+class PasswordsSerializer(serializers.Serializer):
+    passwords = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=20, write_only=True
+    )
+
+
+class BulkDeleteUsersSerializer(serializers.Serializer):
+    usernames = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=1000, write_only=True
+    )
+    deleted = serializers.IntegerField(read_only=True)
+
+    def validate_usernames(self, usernames):
+        found = set(
+            User.objects.filter(username__in=usernames).values_list("username", flat=True)
+        )
+        missing = sorted(set(usernames) - found)
+        if missing:
+            raise serializers.ValidationError(
+                f"Users {', '.join(missing)} don't exist."
+            )
+        return usernames
+
+
+class PasswordStrengthSerializer(serializers.Serializer):
+    strength = serializers.ChoiceField(choices=("Strong", "Moderate", "Weak"))
+    # Estimated bits of entropy
+    entropy = serializers.FloatField()
+    breached = serializers.BooleanField()
+
+
 class FavouriteRecipesSerializer(serializers.ModelSerializer):
     owner = serializers.HyperlinkedRelatedField(
         view_name="user-detail", lookup_field="username", read_only=True
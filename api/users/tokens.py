@@ -0,0 +1,81 @@
+"""
+Signed tokens of the email confirmation and password reset links.
+
+Tokens carry the user's primary key and a fingerprint of the state the link
+changes, signed with the secret key and timestamped, so they are verified
+without storing them. Once the link is used, the fingerprint no longer
+matches and the token is rejected, like after it expires.
+"""
+from django.contrib.auth.models import User
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+class UserToken:
+    """
+    Expiring signed token of a user, valid while the fingerprint
+    of the user is the same as when the token was made
+    """
+
+    salt = None
+    # Seconds the token is valid for
+    max_age = 3600
+
+    def get_state(self, user):
+        """
+        Data of the user the link changes
+        """
+        raise NotImplementedError(".get_state() must be overridden")
+
+    def fingerprint(self, user):
+        # Hashed, as signed tokens aren't encrypted
+        return salted_hmac(self.salt, self.get_state(user)).hexdigest()[:20]
+
+    def make_token(self, user):
+        signer = signing.TimestampSigner(salt=self.salt)
+        return signer.sign_object([user.pk, self.fingerprint(user)])
+
+    def get_user(self, token):
+        """
+        Return the user of a valid token, or None
+        """
+        signer = signing.TimestampSigner(salt=self.salt)
+        try:
+            user_pk, fingerprint = signer.unsign_object(token, max_age=self.max_age)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+
+        user = User.objects.select_related("profile").filter(pk=user_pk).first()
+        if user is None or not constant_time_compare(
+            self.fingerprint(user), fingerprint
+        ):
+            return None
+        return user
+
+
+class ResetPasswordToken(UserToken):
+    """
+    Used once the password is changed
+    """
+
+    salt = "api.users.tokens.ResetPasswordToken"
+
+    def get_state(self, user):
+        return f"{user.password}:{user.email}"
+
+
+class ConfirmEmailToken(UserToken):
+    """
+    Used once the email is confirmed
+    """
+
+    salt = "api.users.tokens.ConfirmEmailToken"
+
+    def get_state(self, user):
+        # Users created outside of the registration (e.g. superusers) have no profile
+        profile = getattr(user, "profile", None)
+        return f"{bool(profile and profile.email_confirmed)}:{user.email}"
+
+
+reset_password_token = ResetPasswordToken()
+confirm_email_token = ConfirmEmailToken()
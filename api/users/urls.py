@@ -1,28 +1,44 @@
+from django.conf import settings
 from django.urls import path, include
 from . import views
 
+# Async serving mode routes I/O-bound endpoints to async views
+if settings.ASYNC_VIEWS:
+    register_view = views.AsyncCreateUserView.as_view()
+    reset_password_view = views.AsyncResetPasswordView.as_view()
+    send_msg_confirm_email_view = views.AsyncSendConfirmEmailView.as_view()
+else:
+    register_view = views.CreateUserView.as_view()
+    reset_password_view = views.ResetPasswordView.as_view()
+    send_msg_confirm_email_view = views.send_msg_confirm_email
+
 urlpatterns = [
-    path("register/", views.CreateUserView.as_view(), name="register-user"),
+    path("register/", register_view, name="register-user"),
     path("auth/", include("rest_framework.urls")),
     path(
         "change-password/",
         views.ChangePasswordView.as_view(),
         name="password-update",
     ),
-    path("reset-password/", views.ResetPasswordView.as_view(), name="reset-password"),
+    path("reset-password/", reset_password_view, name="reset-password"),
     path(
         "reset-password-complete/<token>/",
         views.ResetPasswordComplete.as_view(),
         name="reset-password-complete",
     ),
     path("check-password-strength/", views.CheckPasswordStrength.as_view()),
+    path(
+        "check-password-strength/batch/",
+        views.CheckPasswordsStrength.as_view(),
+        name="check-passwords-strength",
+    ),
     path(
         "send-mail-confirm-email/",
-        views.send_msg_confirm_email,
+        send_msg_confirm_email_view,
         name="send-mail-confirm-email",
     ),
     path(
-        "confirm-email/<uuid:token>/",
+        "confirm-email/<token>/",
         views.confirm_email,
         name="confirm-email",
     ),
@@ -31,15 +47,23 @@ urlpatterns = [
         view=views.check_if_user_is_authenticated,
         name="check-if-user-is-authenticated",
     ),
+    path("bulk-delete/", views.BulkDeleteUsersView.as_view(), name="user-bulk-delete"),
     path(
         "<username>/",
         views.RetrieveUpdateDestroyUserView.as_view(),
         name="user-detail",
     ),
+    path("<username>/stats/", views.AuthorStatsView.as_view(), name="author-stats"),
+    path("<username>/events/", views.AuthorEventsView.as_view(), name="author-events"),
     path(
         "<username>/favourite-recipes/",
         views.RetrieveUpdateFavouriteRecipes.as_view(),
         name="favourite-recipes",
     ),
+    path(
+        "<username>/favourite-recipes/<slug:slug>-<uuid:id>/",
+        views.FavouriteRecipeView.as_view(),
+        name="favourite-recipe",
+    ),
     path("", views.ListUserView.as_view(), name="user-list"),
 ]
@@ -1,31 +1,19 @@
+import hashlib
 import re
 
+from django.urls import reverse
 
-def check_password_strength(password):
-    # Criteria
-    length = len(password) >= 8
-    contains_uppercase = re.search(r"[A-Z]", password) is not None
-    contains_lowercase = re.search(r"[a-z]", password) is not None
-    contains_digit = re.search(r"\d", password) is not None
-    contains_special_char = (
-        re.search(r"[!@#$%^&*()_+\-=[\]{};':\"\\|,.<>/?]", password) is not None
-    )
+from jobs.queue import enqueue
+from users.tasks import send_email
+from .passwords import evaluate_password
+from .tokens import reset_password_token, confirm_email_token
 
-    # Evaluate password strength
-    if all(
-        (
-            length,
-            contains_uppercase,
-            contains_lowercase,
-            contains_digit,
-            contains_special_char,
-        )
-    ):
-        return "Strong"
-    elif any((length, (contains_uppercase and contains_lowercase), contains_digit)):
-        return "Moderate"
-    else:
-        return "Weak"
+
+def check_password_strength(password):
+    """
+    Strength of the password, "Strong", "Moderate" or "Weak"
+    """
+    return evaluate_password(password)["strength"]
 
 
 def is_valid_email(email):
@@ -34,3 +22,59 @@ def is_valid_email(email):
     """
     pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
     return re.match(pattern, email) is not None
+
+
+def build_absolute_url(request, url_path):
+    return request.scheme + "://" + request.get_host() + url_path
+
+
+def mail_job_key(purpose, user):
+    """
+    Idempotency key of a queued message to the user's current address,
+    hashed so that long addresses fit in the key
+    """
+    digest = hashlib.sha256(user.email.encode()).hexdigest()[:16]
+    return f"{purpose}-mail:{user.pk}:{digest}"
+
+
+def send_reset_password_mail(request, user):
+    """
+    Queue a message with a link to reset the password with a token valid for one hour,
+    not again while the previous one to the same address waits to be sent
+    """
+    # Token needed for password reseting process, used once the password changes
+    token = reset_password_token.make_token(user)
+
+    # Url from where user can complete reseting their password
+    full_url = build_absolute_url(
+        request, reverse("reset-password-complete", args=[token])
+    )
+
+    subject = "Reset your password on veganrecipes.com"
+    message = f"Click on this link to reset your password: {full_url}"
+
+    enqueue(
+        send_email,
+        args=(subject, message, [user.email]),
+        key=mail_job_key("reset-password", user),
+    )
+
+
+def send_confirm_email_mail(request, user):
+    """
+    Queue a message with a link to confirm the email with a token valid for one hour,
+    not again while the previous one to the same address waits to be sent
+    """
+    token = confirm_email_token.make_token(user)
+
+    # Url by which clicking user will confirm their email
+    full_url = build_absolute_url(request, reverse("confirm-email", args=[token]))
+
+    title = "Confirm your email"
+    subject = f"Confirm your email by clicking this link: {full_url}"
+
+    enqueue(
+        send_email,
+        args=(title, subject, [user.email]),
+        key=mail_job_key("confirm-email", user),
+    )
@@ -1,63 +1,60 @@
-import uuid
-import requests
+from asgiref.sync import sync_to_async
 
-from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 
 from rest_framework import generics, status
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.authentication import SessionAuthentication
 
 from . import serializers
-from .utils import check_password_strength
+from .utils import (
+    check_password_strength,
+    send_reset_password_mail,
+    send_confirm_email_mail,
+)
+from .passwords import evaluate_password
+from .tokens import reset_password_token, confirm_email_token
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 
-from api.permissions import IsAccountOwner, IsNotAuthenticated
+from api.authentication import AnyMethodClaimsJWTAuthentication
+from api.async_views import AsyncAPIView, AsyncGenericAPIView, event_stream_response
+from api.permissions import IsAccountOwner, IsNotAuthenticated, IsUsernameOwner
+from api.throttling import (
+    IPTokenBucketThrottle,
+    UserTokenBucketThrottle,
+    ConfirmEmailMessageThrottle,
+)
 from api.users.exceptions import PasswordsDoNotMatch, WrongToken, PasswordTooWeak
-from vegan_recipes.settings import EMAIL_HOST_USER
 from users import models
+from users.deletion import delete_users
+from users.stats import author_stats
+from recipes import events
+from recipes.models import Recipe
 
 
 @extend_schema(description="Register new user")
 class CreateUserView(generics.CreateAPIView):
     """
-    Registers user, logs them with session auth, and sends message with email confirmation link
+    Registers user, and queues message with email confirmation link
     """
 
     queryset = User.objects.all()
     serializer_class = serializers.UserRegisterSerializer
     permission_classes = [IsNotAuthenticated]
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = "register"
 
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-
-        token_url_path = reverse("token_obtain_pair")
-        full_token_url = request.scheme + "://" + request.get_host() + token_url_path
-
-        token_response = requests.post(
-            full_token_url,
-            data={
-                "username": request.data["username"],
-                "password": request.data["password"],
-            },
-        )
-        access_token = (
-            token_response.json()["access"] if token_response.status_code == 200 else None
-        )
-
-        # Url to send mail with email confirmation api
-        url_path = reverse("send-mail-confirm-email")
-        full_url = request.scheme + "://" + request.get_host() + url_path
-
-        requests.get(full_url, headers={"Authorization": f"Bearer {access_token}"})
-
-        return response
+    def perform_create(self, serializer):
+        user = serializer.save()
+        # Queued with the account instead of requesting the API for it
+        send_confirm_email_mail(self.request, user)
 
 
 @extend_schema("List all users")
@@ -87,6 +84,62 @@ class RetrieveUpdateDestroyUserView(generics.RetrieveUpdateDestroyAPIView):
             permission_classes = [IsAccountOwner]
         return [permission() for permission in permission_classes]
 
+    def perform_destroy(self, instance):
+        # Without collecting favourites and recipes and sending signals for them
+        delete_users([instance.pk])
+
+
+@extend_schema(
+    description="Delete the accounts, their recipes are kept without an author "
+    "(admin only)",
+    responses=serializers.BulkDeleteUsersSerializer,
+)
+class BulkDeleteUsersView(generics.GenericAPIView):
+    serializer_class = serializers.BulkDeleteUsersSerializer
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_pks = User.objects.filter(
+            username__in=serializer.validated_data["usernames"]
+        ).values_list("pk", flat=True)
+        deleted = delete_users(user_pks)
+        return Response(self.get_serializer({"deleted": deleted}).data)
+
+
+@extend_schema(
+    description="Get numbers of recipes of the author, their views and favourites, "
+    "and the latest recipes",
+    responses=serializers.AuthorStatsSerializer,
+)
+class AuthorStatsView(APIView):
+    """
+    Aggregates for the author's page, instead of loading every recipe
+    """
+
+    serializer_class = serializers.AuthorStatsSerializer
+
+    def get(self, request, username, format=None):
+        stats = author_stats(username)
+        if stats is None:
+            raise NotFound()
+        serializer = self.serializer_class(stats, context={"request": request})
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    description="Stream server-sent events when recipes of the author are published, "
+    "changed or deleted",
+    responses={(200, "text/event-stream"): OpenApiTypes.STR},
+)
+class AuthorEventsView(AsyncAPIView):
+    async def get(self, request, username, format=None):
+        user = await sync_to_async(get_object_or_404)(
+            User.objects.only("pk"), username=username
+        )
+        return event_stream_response(request, [events.author_topic(user.pk)])
+
 
 @extend_schema(description="Change your password, old password is required")
 class ChangePasswordView(APIView):
@@ -130,6 +183,8 @@ class ResetPasswordView(APIView):
     """
 
     serializer_class = serializers.EmailSerializer
+    throttle_classes = [IPTokenBucketThrottle, UserTokenBucketThrottle]
+    throttle_scope = "reset_password"
 
     def post(self, request, format=None):
         serializer = self.serializer_class(data=request.data)
@@ -147,20 +202,7 @@ class ResetPasswordView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Token needed for password reseting process
-        token = uuid.uuid4().__str__()
-
-        # Url from where user can complete reseting their password
-        url_path = reverse("reset-password-complete", args=[token])
-        full_url = request.scheme + "://" + request.get_host() + url_path
-
-        # Token expires after one hour
-        cache.set(token, user.pk, 3600)
-
-        subject = "Reset your password on veganrecipes.com"
-        message = f"Click on this link to reset your password: {full_url}"
-
-        send_mail(subject, message, EMAIL_HOST_USER, [user_email], fail_silently=False)
+        send_reset_password_mail(request, user)
 
         return Response(
             data={
@@ -183,15 +225,11 @@ class ResetPasswordComplete(APIView):
     serializer_class = serializers.NewPasswordSerializer
 
     def post(self, request, token, format=None):
-        user_pk = cache.get(token)
-
-        if not user_pk:
+        # The token is used once the password is changed
+        user = reset_password_token.get_user(token)
+        if user is None:
             raise WrongToken()
 
-        cache.delete(token)
-
-        user = get_object_or_404(User, pk=user_pk)
-
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -215,26 +253,47 @@ class ResetPasswordComplete(APIView):
 
 
 @extend_schema(
-    description="Check how strong the password is (created mainly for web pages checking the password strength before posting it)"
+    description="Check how strong the password is (created mainly for web pages checking the password strength before posting it)",
+    responses=serializers.PasswordStrengthSerializer,
 )
 class CheckPasswordStrength(APIView):
     """
     View constructed for checking password strength in real time,
-    e.g. while typing
+    e.g. while typing, so it makes no queries
     """
 
     serializer_class = serializers.PasswordSerializer
+    # Users are resolved from token claims, POST requests write nothing
+    authentication_classes = [AnyMethodClaimsJWTAuthentication, SessionAuthentication]
+    throttle_classes = [IPTokenBucketThrottle, UserTokenBucketThrottle]
+    throttle_scope = "password_strength"
 
     def post(self, request, format=None):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         password = serializer.validated_data["password"]
 
-        password_strength = check_password_strength(password)
-        return Response(
-            data={"strength": password_strength},
-            status=status.HTTP_200_OK,
+        strength = serializers.PasswordStrengthSerializer(evaluate_password(password))
+        return Response(data=strength.data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    description="Check how strong each of the passwords is, e.g. the password "
+    "and its suggested variants",
+    responses=serializers.PasswordStrengthSerializer(many=True),
+)
+class CheckPasswordsStrength(CheckPasswordStrength):
+    serializer_class = serializers.PasswordsSerializer
+
+    def post(self, request, format=None):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        passwords = serializer.validated_data["passwords"]
+
+        strengths = serializers.PasswordStrengthSerializer(
+            [evaluate_password(password) for password in passwords], many=True
         )
+        return Response(data=strengths.data, status=status.HTTP_200_OK)
 
 
 @extend_schema(description="Get the list of your favourite recipes", methods=["GET"])
@@ -243,11 +302,48 @@ class CheckPasswordStrength(APIView):
 )
 class RetrieveUpdateFavouriteRecipes(generics.RetrieveUpdateAPIView):
     serializer_class = serializers.FavouriteRecipesSerializer
-    queryset = models.FavouriteRecipes.objects.all()
+    queryset = models.FavouriteRecipes.objects.select_related("owner")
     lookup_field = "owner__username"
     lookup_url_kwarg = "username"
 
 
+@extend_schema(
+    description="Add the recipe to your favourite recipes",
+    methods=["POST"],
+    request=None,
+)
+@extend_schema(
+    description="Remove the recipe from your favourite recipes",
+    methods=["DELETE"],
+)
+class FavouriteRecipeView(APIView):
+    """
+    Add or remove a single recipe with a constant number of queries,
+    instead of submitting the whole list of favourite recipes
+    """
+
+    permission_classes = [IsAuthenticated, IsUsernameOwner]
+
+    def get_favourite_recipes(self):
+        # Only the primary key is needed to change the relation
+        return get_object_or_404(
+            models.FavouriteRecipes.objects.only("pk"), owner=self.request.user
+        )
+
+    def post(self, request, username, slug, id):
+        recipe = get_object_or_404(Recipe.objects.only("pk"), slug=slug, id=id)
+        self.get_favourite_recipes().recipes.add(recipe)
+        return Response(
+            {"detail": "Recipe was added to favourite recipes"},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request, username, slug, id):
+        # Removing a recipe which isn't in favourites is a no-op
+        self.get_favourite_recipes().recipes.remove(id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 @api_view(["GET"])
 def check_if_user_is_authenticated(request):
     """
@@ -267,11 +363,15 @@ def check_if_user_is_authenticated(request):
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([ConfirmEmailMessageThrottle])
 def send_msg_confirm_email(request):
     """
     Sends a link with the token to confirm user's password with the next view
     """
-    if request.user.profile.email_confirmed:
+    # Authentication may give a token user, the profile is needed from the database
+    user = get_object_or_404(User.objects.select_related("profile"), pk=request.user.pk)
+
+    if user.profile.email_confirmed:
         return Response(
             data={
                 "detail": "This email was already confirmed",
@@ -280,19 +380,7 @@ def send_msg_confirm_email(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    user_email = request.user.email
-
-    token = uuid.uuid4().__str__()
-    cache.set(token, request.user.pk, 3600)
-
-    # Url by which clicking user will confirm their email
-    url_path = reverse("confirm-email", args=[token])
-    full_url = request.scheme + "://" + request.get_host() + url_path
-
-    title = "Confirm your email"
-    subject = f"Confirm your email by clicking this link: {full_url}"
-
-    send_mail(title, subject, EMAIL_HOST_USER, [user_email])
+    send_confirm_email_mail(request, user)
 
     return Response(
         data={"detail": "Message with link for the email confirmation was sent"},
@@ -308,13 +396,11 @@ def confirm_email(request, token):
     """
     Confirm user's password by clicking the link sent with the previous view
     """
-    if not cache.get(token):
+    # The token is used once the email is confirmed
+    user = confirm_email_token.get_user(token)
+    if user is None:
         raise WrongToken()
 
-    user_pk = cache.get(token)
-    cache.delete(token)
-    user = get_object_or_404(User, pk=user_pk)
-
     user.profile.email_confirmed = True
     user.profile.save()
 
@@ -322,3 +408,110 @@ def confirm_email(request, token):
         data={"detail": "The email was confirmed!", "code": "email_confirmed"},
         status=status.HTTP_200_OK,
     )
+
+
+# Async serving mode, I/O-bound endpoints which don't block the event loop.
+# Database access, including queueing emails, runs in the thread of sync code
+
+send_confirm_email_mail_async = sync_to_async(send_confirm_email_mail)
+send_reset_password_mail_async = sync_to_async(send_reset_password_mail)
+
+
+@extend_schema(description="Register new user")
+class AsyncCreateUserView(AsyncGenericAPIView):
+    """
+    Registers user and sends message with email confirmation link
+    """
+
+    queryset = User.objects.all()
+    serializer_class = serializers.UserRegisterSerializer
+    permission_classes = [IsNotAuthenticated]
+    throttle_classes = CreateUserView.throttle_classes
+    throttle_scope = CreateUserView.throttle_scope
+
+    async def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        user, data = await sync_to_async(self.create_user)(serializer)
+
+        await send_confirm_email_mail_async(request, user)
+
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def create_user(self, serializer):
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        return user, serializer.data
+
+
+@extend_schema(description="Get link with token to reset the password in the next step")
+class AsyncResetPasswordView(AsyncAPIView):
+    """
+    Sends a message with a link with the valid token on the user's email
+    typed by them in the form
+    """
+
+    serializer_class = serializers.EmailSerializer
+    throttle_classes = ResetPasswordView.throttle_classes
+    throttle_scope = ResetPasswordView.throttle_scope
+
+    async def post(self, request, format=None):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user_email = serializer.validated_data["email"]
+        user = await User.objects.filter(email=user_email).afirst()
+        if user is None:
+            return Response(
+                data={
+                    "detail": "User with given email address does not exist!",
+                    "code": "user_with_email_doesnotexist",
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        await send_reset_password_mail_async(request, user)
+
+        return Response(
+            data={
+                "detail": "Email with further instructions was succesfully sent!",
+                "code": "email_sent",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    description="Send an email message with request of conforming it upon the registration"
+    " or if user lost it after registration or some bug occured"
+)
+class AsyncSendConfirmEmailView(AsyncAPIView):
+    """
+    Sends a link with the token to confirm user's password with the next view
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ConfirmEmailMessageThrottle]
+
+    async def get(self, request, format=None):
+        user = await User.objects.select_related("profile").filter(
+            pk=request.user.pk
+        ).afirst()
+        if user is None:
+            # Deleted since the token was issued
+            raise NotFound()
+
+        if user.profile.email_confirmed:
+            return Response(
+                data={
+                    "detail": "This email was already confirmed",
+                    "code": "email_already_confirmed",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        await send_confirm_email_mail_async(request, user)
+
+        return Response(
+            data={"detail": "Message with link for the email confirmation was sent"},
+            status=status.HTTP_200_OK,
+        )
@@ -1,5 +1,94 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import redirect
+from django.views import View
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+
+from drf_spectacular.utils import extend_schema
+
+from .profiling import histograms
+from .schema import PrebuiltSchema
 
 
 def redirect_to_schema(request):
     return redirect("redoc")
+
+
+def lazy_view(view_path, **initkwargs):
+    """
+    Import the class based view on its first request instead of on startup,
+    for views with heavy dependencies like schema generation
+    """
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@extend_schema(
+    description="Per view histograms of request timings collected by the profiling "
+    "middleware in this worker process (must be staff user)"
+)
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return Response(histograms.snapshot())
+
+
+@extend_schema(
+    description="Hit and miss counters of tiered caches in this worker process "
+    "(must be staff user)"
+)
+class CacheMetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return Response(
+            {
+                alias: caches[alias].stats()
+                for alias in settings.CACHES
+                if hasattr(caches[alias], "stats")
+            }
+        )
+
+
+class PrebuiltSchemaView(View):
+    """
+    Serve the schema prebuilt with `build_schema` command instead of
+    introspecting every view on each request, with hash based ETags.
+    Falls back to generating the schema if there's no prebuilt file
+    """
+
+    schema = PrebuiltSchema(settings.SCHEMA_FILE)
+    live_view = staticmethod(lazy_view("api.schema_extensions.LiveSchemaView"))
+
+    def get(self, request, *args, **kwargs):
+        if not self.schema.load():
+            return self.live_view(request, *args, **kwargs)
+
+        schema_format = "yaml"
+        if request.GET.get("format") == "json" or "json" in request.headers.get(
+            "Accept", ""
+        ):
+            schema_format = "json"
+
+        etag = self.schema.etags[schema_format]
+        # Clients revalidate, getting an empty response if the schema didn't change
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return HttpResponseNotModified(headers=headers)
+
+        content, content_type = self.schema.formats[schema_format]
+        return HttpResponse(content, content_type=content_type, headers=headers)
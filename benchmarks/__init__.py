@@ -0,0 +1,7 @@
+"""
+Benchmarks of the API hot paths.
+
+Run them with `python manage.py benchmark`, which seeds a throwaway test
+database with a synthetic dataset and reports latency percentiles,
+throughput and queries per request for every scenario.
+"""
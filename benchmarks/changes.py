@@ -0,0 +1,86 @@
+import time
+import threading
+
+from django.db import connection, transaction
+
+from recipes import changes, models
+from .report import percentile
+
+
+def write(recipe_pk, deadline, work, latencies):
+    """
+    Number changes of the recipe until the deadline, every transaction
+    keeps working for `work` seconds after numbering its change
+    """
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            with transaction.atomic():
+                changes.record_changes([recipe_pk])
+                # Rest of the request's transaction, e.g. writing child rows
+                time.sleep(work)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+def follow(stop, seen):
+    """
+    Follow the change feed like a client until stopped, then catch up,
+    keeping the last seen number of every recipe
+    """
+    cursor = 0
+    try:
+        while True:
+            # Changes committed before stopping are read by the last polls
+            stopped = stop.is_set()
+            changed, _, cursor, has_more = changes.changes_since(
+                models.Recipe.objects.only("pk", "sequence"), cursor, 100
+            )
+            seen.update((recipe.pk, recipe.sequence) for recipe in changed)
+            if has_more:
+                continue
+            if stopped:
+                break
+            time.sleep(0.01)
+    finally:
+        connection.close()
+
+
+def run(writers, duration, work):
+    """
+    Change recipes from concurrent writers, one recipe each, while a client
+    follows the change feed. Recipes whose last change the client missed
+    are counted as skipped
+    """
+    recipe_pks = list(models.Recipe.objects.values_list("pk", flat=True)[:writers])
+    deadline = time.perf_counter() + duration
+    latencies, seen, stop = [], {}, threading.Event()
+
+    threads = [
+        threading.Thread(target=write, args=(recipe_pk, deadline, work, latencies))
+        for recipe_pk in recipe_pks
+    ]
+    reader = threading.Thread(target=follow, args=(stop, seen))
+    started = time.perf_counter()
+    reader.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - started
+    stop.set()
+    reader.join()
+
+    current = dict(
+        models.Recipe.objects.filter(pk__in=recipe_pks).values_list("pk", "sequence")
+    )
+    latencies.sort()
+    return {
+        "writers": len(recipe_pks),
+        "changes": len(latencies),
+        "changes_per_second": len(latencies) / total,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+        "skipped": sum(seen.get(pk) != sequence for pk, sequence in current.items()),
+    }
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+from .report import percentile
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SlowVeganAPIHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the is-vegan API answering after a fixed delay
+    """
+
+    delay = 0.2
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = json.dumps({"isVeganSafe": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_vegan_api(delay):
+    handler = type("Handler", (SlowVeganAPIHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def manage(*args, env):
+    subprocess.run(
+        (sys.executable, str(settings.BASE_DIR / "manage.py"), *args),
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+
+def start_server(mode, port, env):
+    """
+    Start a single process serving the app, uvicorn with async views
+    or Django's threaded WSGI server
+    """
+    if mode == "asgi":
+        command = (
+            sys.executable, "-m", "uvicorn", "vegan_recipes.asgi:application",
+            "--port", str(port), "--log-level", "warning", "--no-access-log",
+        )
+        env = {**env, "ASYNC_VIEWS": "1"}
+    else:
+        command = (
+            sys.executable, str(settings.BASE_DIR / "manage.py"), "runserver",
+            f"127.0.0.1:{port}", "--noreload",
+        )
+    process = subprocess.Popen(
+        command,
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # Wait until the server accepts connections
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"The {mode} server didn't start")
+
+
+async def load(url, headers, payload, concurrency, duration):
+    """
+    Keep `concurrency` connections sending requests for `duration` seconds
+    """
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / total,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+    }
+
+
+def run(database, concurrency_levels, duration, vegan_api_delay):
+    """
+    Compare ingredient creation with a slow vegan API under uvicorn and WSGI
+    """
+    import httpx
+
+    vegan_api = start_vegan_api(vegan_api_delay)
+    env = {
+        **os.environ,
+        "SQLITE_PATH": str(database),
+        "VEGAN_API_URL": f"http://127.0.0.1:{vegan_api.server_port}/",
+    }
+    manage("migrate", env=env)
+    manage("generate_dataset", "--users", "1", "--recipes", "1", env=env)
+
+    results = {}
+    try:
+        for mode in ("wsgi", "asgi"):
+            port = free_port()
+            process = start_server(mode, port, env)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                token = httpx.post(
+                    f"{base_url}/api/token/",
+                    data={"username": "user0", "password": "Benchmark1!"},
+                ).json()["access"]
+                recipe = httpx.get(f"{base_url}/api/recipes/").json()[0]
+
+                results[mode] = [
+                    asyncio.run(
+                        load(
+                            recipe["ingredient_listing"],
+                            {"Authorization": f"Bearer {token}"},
+                            {"name": "soy milk", "quantity": 1, "unit": "cup"},
+                            concurrency,
+                            duration,
+                        )
+                    )
+                    for concurrency in concurrency_levels
+                ]
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        vegan_api.shutdown()
+    return results
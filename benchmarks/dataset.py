@@ -0,0 +1,130 @@
+import random
+import hashlib
+
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.utils.text import slugify
+
+from recipes import models
+from users.models import Profile, FavouriteRecipes
+
+
+INGREDIENT_NAMES = (
+    "soy milk", "oat milk", "tofu", "tempeh", "chickpeas", "lentils", "black beans",
+    "rice", "quinoa", "pasta", "flour", "sugar", "olive oil", "coconut oil",
+    "garlic", "onion", "tomato", "spinach", "kale", "carrot", "potato", "avocado",
+    "banana", "apple", "peanut butter", "almonds", "cashews", "maple syrup",
+    "nutritional yeast", "soy sauce", "ginger", "lemon", "lime", "basil", "cumin",
+)
+TAG_NAMES = (
+    "breakfast", "lunch", "dinner", "dessert", "snack", "quick", "gluten free",
+    "high protein", "raw", "soup", "salad", "baking", "budget", "spicy", "sweet",
+)
+WORDS = (
+    "creamy", "spicy", "easy", "smoky", "crispy", "fresh", "roasted", "sweet",
+    "hearty", "quick", "zesty", "golden", "rich", "light", "savory",
+)
+UNITS = [unit for unit, _ in models.Ingredient.UNIT_CHOICES]
+
+# Every generated user has this password
+PASSWORD = "Benchmark1!"
+
+
+def generate_dataset(
+    users=20,
+    recipes=200,
+    ingredients_per_recipe=8,
+    steps_per_recipe=6,
+    tags=len(TAG_NAMES),
+    tags_per_recipe=3,
+    images_per_recipe=1,
+    seed=0,
+):
+    """
+    Create a reproducible synthetic dataset with bulk inserts,
+    the same seed always produces the same rows
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+
+    user_objs = User.objects.bulk_create(
+        User(username=f"user{i}", email=f"user{i}@example.com", password=password)
+        for i in range(users)
+    )
+    Profile.objects.bulk_create(
+        Profile(user=user, email_confirmed=True) for user in user_objs
+    )
+    FavouriteRecipes.objects.bulk_create(
+        FavouriteRecipes(owner=user) for user in user_objs
+    )
+
+    # Tags beyond the predefined names get a number
+    tag_names = list(TAG_NAMES[:tags]) + [
+        f"tag {i}" for i in range(len(TAG_NAMES), tags)
+    ]
+    tag_objs = models.Tag.objects.bulk_create(
+        models.Tag(name=name, slug=slugify(name)) for name in tag_names
+    )
+
+    recipe_objs = []
+    for i in range(recipes):
+        title = f"{' '.join(rng.sample(WORDS, 2))} {rng.choice(INGREDIENT_NAMES)} {i}"
+        recipe_objs.append(
+            models.Recipe(
+                author=rng.choice(user_objs),
+                title=title,
+                slug=slugify(title),
+                body=" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 300))),
+                views=rng.randint(0, 10000),
+            )
+        )
+    recipe_objs = models.Recipe.objects.bulk_create(recipe_objs, batch_size=500)
+
+    # Bulk inserts don't link ingredients to canonical ones on save
+    canonical_pks = models.resolve_canonical_ingredients(INGREDIENT_NAMES)
+
+    ingredients, steps, images, tagged = [], [], [], []
+    for recipe in recipe_objs:
+        for name in rng.sample(
+            INGREDIENT_NAMES, min(ingredients_per_recipe, len(INGREDIENT_NAMES))
+        ):
+            ingredients.append(
+                models.Ingredient(
+                    recipe=recipe,
+                    name=name,
+                    canonical_id=canonical_pks[name],
+                    quantity=round(rng.uniform(0.25, 500), 2),
+                    unit=rng.choice(UNITS),
+                )
+            )
+        for order in range(1, steps_per_recipe + 1):
+            steps.append(
+                models.Step(
+                    recipe=recipe,
+                    order=order,
+                    instruction=f"Step {order}: "
+                    + " ".join(rng.choice(WORDS) for _ in range(20)),
+                )
+            )
+        for order in range(1, images_per_recipe + 1):
+            # Rows only, listing images never reads the files
+            path = f"recipes/benchmark/{recipe.id}/{order}.jpg"
+            images.append(
+                models.Image(
+                    recipe=recipe,
+                    order=order,
+                    url=path,
+                    unique_identifier=hashlib.md5(path.encode()).hexdigest(),
+                )
+            )
+        for tag in rng.sample(tag_objs, min(tags_per_recipe, len(tag_objs))):
+            tagged.append(models.Tag.recipes.through(tag=tag, recipe=recipe))
+
+    models.Ingredient.objects.bulk_create(ingredients, batch_size=1000)
+    models.Step.objects.bulk_create(steps, batch_size=1000)
+    models.Image.objects.bulk_create(images, batch_size=1000)
+    models.Tag.recipes.through.objects.bulk_create(tagged, batch_size=1000)
+    # Bulk inserts don't send signals updating denormalized counts
+    models.update_tag_recipe_counts([tag.pk for tag in tag_objs])
+
+    return {"users": user_objs, "recipes": recipe_objs, "tags": tag_objs}
@@ -0,0 +1,71 @@
+import re
+import random
+import string
+import timeit
+
+from api.users import passwords
+
+
+def regex_strength(password):
+    """
+    The former evaluation, one regular expression scan per criterion,
+    kept as the baseline
+    """
+    length = len(password) >= 8
+    contains_uppercase = re.search(r"[A-Z]", password) is not None
+    contains_lowercase = re.search(r"[a-z]", password) is not None
+    contains_digit = re.search(r"\d", password) is not None
+    contains_special_char = (
+        re.search(r"[!@#$%^&*()_+\-=[\]{};':\"\\|,.<>/?]", password) is not None
+    )
+    if all(
+        (
+            length,
+            contains_uppercase,
+            contains_lowercase,
+            contains_digit,
+            contains_special_char,
+        )
+    ):
+        return "Strong"
+    elif any((length, (contains_uppercase and contains_lowercase), contains_digit)):
+        return "Moderate"
+    else:
+        return "Weak"
+
+
+def typed_passwords(count, seed=0):
+    """
+    Prefixes of random passwords, as sent while they are typed
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + passwords.SPECIAL_CHARACTERS
+    result = []
+    while len(result) < count:
+        password = "".join(rng.choices(alphabet, k=rng.randint(8, 20)))
+        result.extend(password[:length] for length in range(1, len(password) + 1))
+    return result[:count]
+
+
+def time_per_call(func, values, repeat):
+    """
+    Best of the repeats of calling the function with every value,
+    in microseconds per call
+    """
+    timer = timeit.Timer(lambda: [func(value) for value in values])
+    return min(timer.repeat(repeat, number=1)) / len(values) * 1e6
+
+
+def run(count, repeat, breached_path=None, seed=0):
+    values = typed_passwords(count, seed)
+    results = {
+        "passwords": count,
+        "regex_us": time_per_call(regex_strength, values, repeat),
+        "scanner_us": time_per_call(passwords.character_classes, values, repeat),
+        "evaluate_us": time_per_call(passwords.evaluate_password, values, repeat),
+    }
+    if breached_path:
+        breached = passwords.BreachedPasswords(breached_path)
+        results["breached_passwords"] = breached.count
+        results["lookup_us"] = time_per_call(breached.__contains__, values, repeat)
+    return results
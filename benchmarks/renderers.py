@@ -0,0 +1,108 @@
+import gzip
+import uuid
+import random
+import string
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from api import compression
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+
+BASE_URL = "https://example.com/api"
+
+
+def synthetic_recipes(count, seed=0):
+    """
+    Pages of recipes shaped like the output of RecipeSerializer, with UUIDs
+    and datetimes left as objects, as in data not passed through serializer
+    fields (e.g. values() querysets or cached dicts)
+    """
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(500)]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    recipes = []
+    for _ in range(count):
+        recipe_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        title = " ".join(rng.choices(words, k=rng.randint(2, 6)))
+        slug = "-".join(title.split())
+        url = f"{BASE_URL}/recipes/{slug}-{recipe_id}/"
+        created = start + timedelta(seconds=rng.randint(0, 10**8))
+        recipes.append(
+            {
+                "url": url,
+                "author": f"{BASE_URL}/users/{rng.choice(words)}/",
+                "title": title,
+                "body": " ".join(rng.choices(words, k=rng.randint(50, 300))),
+                "servings": rng.randint(1, 8),
+                "views": rng.randint(0, 10**5),
+                "favourite_count": rng.randint(0, 10**3),
+                "image_listing": f"{url}images/",
+                "ingredient_listing": f"{url}ingredients/",
+                "step_listing": f"{url}steps/",
+                "tags": rng.sample(words, rng.randint(0, 5)),
+                "created": created,
+                "modified": created + timedelta(seconds=rng.randint(0, 10**6)),
+                "id": recipe_id,
+            }
+        )
+    return recipes
+
+
+def as_strings(recipes):
+    """
+    The recipes as serializer fields output them, UUIDs and datetimes as strings
+    """
+    return [
+        {
+            **recipe,
+            "id": str(recipe["id"]),
+            "created": recipe["created"].isoformat().replace("+00:00", "Z"),
+            "modified": recipe["modified"].isoformat().replace("+00:00", "Z"),
+        }
+        for recipe in recipes
+    ]
+
+
+def time_per_render(renderer, data, repeat):
+    """
+    Best of the repeats of rendering the data, in milliseconds
+    """
+    timer = timeit.Timer(lambda: renderer.render(data, renderer.media_type))
+    return min(timer.repeat(repeat, number=1)) * 1000
+
+
+def encoded_sizes(content):
+    sizes = {"raw": len(content), "gzip": len(gzip.compress(content, mtime=0))}
+    brotli = compression.brotli_module()
+    if brotli is not None:
+        sizes["br"] = len(brotli.compress(content, quality=5))
+    return sizes
+
+
+def run(recipes, repeat, seed=0):
+    """
+    Render time and bytes on the wire of a page of recipes by DRF's
+    JSON renderer and the compact renderers
+    """
+    objects = synthetic_recipes(recipes, seed)
+    strings = as_strings(objects)
+    page = {"count": recipes, "next": None, "previous": None, "results": strings}
+
+    renderers = {"drf_json": JSONRenderer(), "orjson": ORJSONRenderer()}
+    if MessagePackRenderer.available:
+        renderers["msgpack"] = MessagePackRenderer()
+
+    results = {"recipes": recipes, "renderers": {}}
+    for name, renderer in renderers.items():
+        results["renderers"][name] = {
+            "render_ms": time_per_render(renderer, page, repeat),
+            # UUIDs and datetimes encoded by the renderer itself
+            "render_objects_ms": time_per_render(
+                renderer, {**page, "results": objects}, repeat
+            ),
+            "bytes": encoded_sizes(renderer.render(page, renderer.media_type)),
+        }
+    return results
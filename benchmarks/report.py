@@ -0,0 +1,119 @@
+import json
+import time
+import math
+import platform
+import subprocess
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def run_scenario(func, context, iterations, warmup=10):
+    """
+    Run the scenario sequentially and summarize its latency and queries
+    """
+    for _ in range(warmup):
+        func(context)
+
+    latencies = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = func(context)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise BenchmarkError(
+                f"{func.__name__} failed with {response.status_code}: {response.content[:200]}"
+            )
+        queries.append(len(captured))
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / iterations * 1000,
+        "requests_per_second": iterations / total,
+        "queries_per_request": sum(queries) / iterations,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(results, dataset_options):
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "dataset": dataset_options,
+        "scenarios": results,
+    }
+
+
+def format_table(results):
+    header = f"{'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>10}"
+    lines = [header, "-" * len(header)]
+    for name, stats in results.items():
+        lines.append(
+            f"{name:<20}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['p99_ms']:>10.2f}{stats['requests_per_second']:>10.1f}"
+            f"{stats['queries_per_request']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(report, baseline, threshold=0.1):
+    """
+    Return descriptions of scenarios which got slower than the baseline's p95
+    by more than the threshold or make more queries
+    """
+    regressions = []
+    for name, stats in report["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if stats["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']:.2f} ms -> {stats['p95_ms']:.2f} ms"
+            )
+        if stats["queries_per_request"] > previous["queries_per_request"]:
+            regressions.append(
+                f"{name}: queries {previous['queries_per_request']:.1f} -> "
+                f"{stats['queries_per_request']:.1f}"
+            )
+    return regressions
+
+
+def write_report(report, path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+def read_report(path):
+    with open(path) as file:
+        return json.load(file)
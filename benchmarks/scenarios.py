@@ -0,0 +1,201 @@
+import json
+import random
+import itertools
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.users.serializers import ClaimsTokenObtainPairSerializer
+
+
+# Registered scenarios by name, in the order of definition
+SCENARIOS = {}
+
+
+def scenario(name):
+    """
+    Register a function taking the benchmark context and returning a response
+    """
+
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+
+    return decorator
+
+
+class StubResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class BenchmarkContext:
+    """
+    Clients and dataset rows shared by the scenarios
+    """
+
+    def __init__(self, dataset, seed=0):
+        self.rng = random.Random(seed)
+        self.recipes = dataset["recipes"]
+        self.tags = dataset["tags"]
+        self.anonymous = APIClient()
+        self.counter = itertools.count()
+
+        # The author of the first recipe can create its children
+        self.recipe = self.recipes[0]
+        self.author = APIClient()
+        token = ClaimsTokenObtainPairSerializer.get_token(self.recipe.author)
+        self.author.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+    def random_recipe(self):
+        return self.rng.choice(self.recipes)
+
+    def recipe_kwargs(self, recipe, prefix=""):
+        return {f"{prefix}slug": recipe.slug, f"{prefix}id": recipe.id}
+
+    @contextmanager
+    def stub_outbound_http(self):
+        """
+        Answer the vegan check with a fixed verdict and route loopback calls
+        made by views to the API through an in-process client
+        """
+
+        def request(method, url, data=None, headers=None, **kwargs):
+            parts = urlsplit(url)
+            if url.startswith(settings.VEGAN_API_URL):
+                return StubResponse(200, {"isVeganSafe": True})
+
+            client = APIClient()
+            if headers and "Authorization" in headers:
+                client.credentials(HTTP_AUTHORIZATION=headers["Authorization"])
+            response = getattr(client, method)(parts.path, data)
+            data = json.loads(response.content) if response.content else None
+            return StubResponse(response.status_code, data)
+
+        with mock.patch(
+            "requests.get", lambda url, **kwargs: request("get", url, **kwargs)
+        ), mock.patch(
+            "requests.post", lambda url, **kwargs: request("post", url, **kwargs)
+        ):
+            yield
+
+
+@scenario("recipe-list")
+def recipe_list(context):
+    return context.anonymous.get(reverse("recipe-list"))
+
+
+@scenario("recipe-search")
+def recipe_search(context):
+    word = context.rng.choice(context.random_recipe().title.split())
+    return context.anonymous.get(reverse("recipe-list"), {"search": word})
+
+
+@scenario("recipe-filter-tag")
+def recipe_filter_tag(context):
+    tag = context.rng.choice(context.tags)
+    return context.anonymous.get(reverse("recipe-list"), {"tags": tag.slug})
+
+
+@scenario("recipe-facets")
+def recipe_facets(context):
+    word = context.rng.choice(context.random_recipe().title.split())
+    return context.anonymous.get(reverse("recipe-facets"), {"search": word})
+
+
+@scenario("recipe-trending")
+def recipe_trending(context):
+    return context.anonymous.get(reverse("recipe-trending"))
+
+
+@scenario("shopping-list")
+def shopping_list(context):
+    # A week of meals for two
+    recipes = context.rng.sample(context.recipes, min(50, len(context.recipes)))
+    return context.anonymous.post(
+        reverse("recipe-shopping-list"),
+        {
+            "recipes": [
+                reverse("recipe-detail", kwargs=context.recipe_kwargs(recipe))
+                for recipe in recipes
+            ],
+            "servings": [2] * len(recipes),
+        },
+        format="json",
+    )
+
+
+@scenario("recipe-detail")
+def recipe_detail(context):
+    recipe = context.random_recipe()
+    return context.anonymous.get(
+        reverse("recipe-detail", kwargs=context.recipe_kwargs(recipe))
+    )
+
+
+@scenario("ingredient-list")
+def ingredient_list(context):
+    recipe = context.random_recipe()
+    return context.anonymous.get(
+        reverse("ingredient-list", kwargs=context.recipe_kwargs(recipe, "recipe__"))
+    )
+
+
+@scenario("step-list")
+def step_list(context):
+    recipe = context.random_recipe()
+    return context.anonymous.get(
+        reverse("step-list", kwargs=context.recipe_kwargs(recipe, "recipe__"))
+    )
+
+
+@scenario("image-list")
+def image_list(context):
+    recipe = context.random_recipe()
+    return context.anonymous.get(
+        reverse("image-list", kwargs=context.recipe_kwargs(recipe, "recipe__"))
+    )
+
+
+@scenario("ingredient-create")
+def ingredient_create(context):
+    url = reverse(
+        "ingredient-list", kwargs=context.recipe_kwargs(context.recipe, "recipe__")
+    )
+    return context.author.post(
+        url, {"name": "soy milk", "quantity": 2, "unit": "cup"}, format="json"
+    )
+
+
+@scenario("favourite-toggle")
+def favourite_toggle(context):
+    recipe = context.random_recipe()
+    kwargs = context.recipe_kwargs(recipe)
+    kwargs["username"] = context.recipe.author.username
+    url = reverse("favourite-recipe", kwargs=kwargs)
+    # Alternate adding and removing, so favourites don't only grow
+    if next(context.counter) % 2:
+        return context.author.delete(url)
+    return context.author.post(url)
+
+
+@scenario("register")
+def register(context):
+    number = next(context.counter)
+    return context.anonymous.post(
+        reverse("register-user"),
+        {
+            "username": f"registered{number}",
+            "email": f"registered{number}@example.com",
+            "password": "Benchmark1!",
+        },
+        format="json",
+    )
@@ -0,0 +1,49 @@
+import time
+import random
+import tracemalloc
+
+from recipes.similarity import compute_neighbours
+
+
+def synthetic_features(
+    recipes, ingredients, ingredients_per_recipe, tags, tags_per_recipe, seed=0
+):
+    """
+    Features of synthetic recipes, ingredient popularity follows
+    a Zipf-like distribution like in real recipes (salt, oil, onion...)
+    """
+    rng = random.Random(seed)
+    names = [f"i:ingredient {number}" for number in range(ingredients)]
+    weights = [1 / rank for rank in range(1, ingredients + 1)]
+    tag_names = [f"t:tag-{number}" for number in range(tags)]
+
+    features = {}
+    for recipe in range(recipes):
+        vector = set(rng.choices(names, weights, k=ingredients_per_recipe))
+        vector.update(rng.sample(tag_names, tags_per_recipe))
+        features[recipe] = vector
+    return features
+
+
+def run(recipes, neighbours, seed=0, **dataset):
+    """
+    Time and peak memory of computing the neighbour table of synthetic recipes,
+    without storing it in the database
+    """
+    features = synthetic_features(recipes, seed=seed, **dataset)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = compute_neighbours(features, neighbours)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "recipes": recipes,
+        "neighbours": neighbours,
+        "dataset": dataset,
+        "seconds": seconds,
+        "peak_memory_mb": peak / 2**20,
+        "rows": sum(len(similar) for similar in table.values()),
+    }
@@ -0,0 +1,82 @@
+import os
+import re
+import sys
+import time
+import statistics
+import subprocess
+from collections import defaultdict
+
+from django.conf import settings
+
+
+# Boot a worker like a WSGI server does and load the URLconf,
+# which the first request would otherwise do
+WORKER_BOOT = (
+    "import os;"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vegan_recipes.settings');"
+    "from django.core.wsgi import get_wsgi_application;"
+    "get_wsgi_application();"
+    "from django.urls import get_resolver;"
+    "get_resolver().url_patterns"
+)
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def boot_worker():
+    """
+    Boot a worker in a new interpreter, return wall time and -X importtime output
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        (sys.executable, "-X", "importtime", "-c", WORKER_BOOT),
+        cwd=settings.BASE_DIR,
+        env=os.environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, process.stderr
+
+
+def parse_import_times(output):
+    """
+    Cumulative import time in microseconds of every top level package,
+    counted where it was imported first
+    """
+    packages = defaultdict(int)
+    for line in output.splitlines():
+        match = IMPORT_TIME.match(line)
+        # Only modules imported directly, their children are included
+        if match and len(match.group(3)) == 1:
+            packages[match.group(4).split(".")[0]] += int(match.group(2))
+    return packages
+
+
+def run(repeat):
+    wall_times = []
+    packages = defaultdict(list)
+    for _ in range(repeat):
+        wall_time, output = boot_worker()
+        wall_times.append(wall_time)
+        for package, microseconds in parse_import_times(output).items():
+            packages[package].append(microseconds)
+
+    return {
+        "repeat": repeat,
+        "wall_ms": {
+            "median": statistics.median(wall_times) * 1000,
+            "min": min(wall_times) * 1000,
+            "max": max(wall_times) * 1000,
+        },
+        # Median of every package over the runs, slowest first
+        "imports_ms": dict(
+            sorted(
+                (
+                    (package, statistics.median(times) / 1000)
+                    for package, times in packages.items()
+                ),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+        ),
+    }
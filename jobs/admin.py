@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from . import models
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "run_at", "attempts", "finished")
+    list_filter = ("status", "name")
+    search_fields = ("name", "key")
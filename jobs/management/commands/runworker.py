@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs import worker
+
+
+def serve(burst):
+    """
+    Run a worker in this process until it's told to stop
+    """
+    job_worker = worker.Worker()
+    handlers = {
+        signum: signal.signal(signum, job_worker.stop)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    try:
+        return job_worker.run(burst)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs in a pool of worker processes, "
+        "finishing running jobs on SIGTERM or SIGINT"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=1, help="worker processes polling the queue"
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="exit once no jobs are due"
+        )
+
+    def handle(self, *args, **options):
+        for name in settings.JOBS["PERIODIC"]:
+            worker.schedule_periodic(name)
+
+        if options["processes"] == 1:
+            count = serve(options["burst"])
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs"))
+            return
+
+        # Forked processes open their own connections
+        connections.close_all()
+        caches.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=serve, args=(options["burst"],), daemon=True)
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS(f"{len(processes)} workers stopped"))
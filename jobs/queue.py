@@ -0,0 +1,77 @@
+"""
+Database-backed queue of background jobs, run by `python manage.py runworker`
+without an external broker.
+
+Tasks are functions registered with the task decorator in tasks modules of
+apps. Jobs are queued in the current transaction, so they run only if it
+commits and they see its changes. Arguments are stored as JSON.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: object
+    max_attempts: int
+    # Seconds before the first retry, doubled with every next one
+    retry_delay: float
+
+
+registry = {}
+
+
+def task(max_attempts=None, retry_delay=None):
+    """
+    Register the function as a task named by its module and name,
+    the function itself is returned unchanged
+    """
+    options = settings.JOBS
+
+    def register(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        registry[name] = Task(
+            name,
+            func,
+            max_attempts or options["MAX_ATTEMPTS"],
+            options["RETRY_DELAY"] if retry_delay is None else retry_delay,
+        )
+        func.task_name = name
+        return func
+
+    return register
+
+
+def task_name(task):
+    return task if isinstance(task, str) else task.task_name
+
+
+def enqueue(task, args=(), kwargs=None, key=None, run_at=None, delay=None):
+    """
+    Queue a call of the task, given as the function or its name, to run
+    at run_at, after delay seconds, or as soon as a worker is free.
+
+    A job with a key isn't queued while another one with the same key waits
+    to run, e.g. to make a burst of changes trigger a single refresh
+    """
+    name = task_name(task)
+    if run_at is None:
+        run_at = timezone.now()
+    if delay:
+        run_at += timedelta(seconds=delay)
+    job = Job(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        key=key,
+        run_at=run_at,
+        max_attempts=registry[name].max_attempts,
+    )
+    # One query, the queued duplicate wins the unique key
+    Job.objects.bulk_create([job], ignore_conflicts=key is not None)
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+
+
+@task()
+def prune_jobs():
+    """
+    Delete jobs finished more than JOBS["KEEP_DAYS"] days ago
+    """
+    finished_before = timezone.now() - timedelta(days=settings.JOBS["KEEP_DAYS"])
+    Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED), finished__lt=finished_before
+    ).delete()
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.tests import LOCMEM_CACHES
+from . import queue, worker
+from .models import Job
+
+calls = []
+
+
+@queue.task(max_attempts=3, retry_delay=60)
+def record_call(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError(value)
+
+
+@queue.task()
+def tick():
+    calls.append("tick")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_pending(self):
+        queue.enqueue(record_call, args=(1,))
+        queue.enqueue(record_call.task_name, kwargs={"value": 2})
+        queue.enqueue(record_call, args=(3,), delay=60)
+
+        self.assertEqual(worker.run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+        self.assertTrue(Job.objects.filter(status=Job.QUEUED, args=[3]).exists())
+
+    def test_retries_with_backoff(self):
+        queue.enqueue(record_call, args=("error",), kwargs={"fail": True})
+        self.assertEqual(worker.run_pending(), 1)
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("ValueError: error", job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+
+        for attempt in (2, 3):
+            Job.objects.update(run_at=timezone.now())
+            worker.run_pending()
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(calls, ["error"] * 3)
+
+    def test_idempotency_key(self):
+        for value in (1, 2):
+            queue.enqueue(record_call, args=(value,), key="refresh")
+        self.assertEqual(Job.objects.count(), 1)
+
+        worker.run_pending()
+        # Finished jobs don't hold the key
+        queue.enqueue(record_call, args=(3,), key="refresh")
+        worker.run_pending()
+        self.assertEqual(calls, [1, 3])
+
+    def test_expired_lease_is_claimed_again(self):
+        queue.enqueue(record_call, args=(1,))
+        job = worker.claim("stopped-worker")
+        self.assertIsNone(worker.claim("other-worker"))
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(worker.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+        # The stopped worker's late result is ignored
+        self.assertEqual(worker.finish(job, "stopped-worker", status=Job.FAILED), 0)
+
+    def test_unregistered_task_fails(self):
+        Job.objects.create(name="missing.task", max_attempts=3)
+        worker.run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("isn't registered", job.error)
+
+    def test_runworker_schedules_periodic_tasks(self):
+        periodic = {tick.task_name: 3600}
+        with override_settings(JOBS={**settings.JOBS, "PERIODIC": periodic}):
+            call_command("runworker", "--burst", stdout=mock.Mock())
+        self.assertEqual(calls, ["tick"])
+        job = Job.objects.get(status=Job.QUEUED)
+        self.assertEqual(job.key, f"periodic:{tick.task_name}")
+        self.assertGreater(job.run_at, timezone.now() + timedelta(minutes=59))
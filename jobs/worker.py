@@ -0,0 +1,148 @@
+"""
+Workers running queued jobs.
+
+Workers claim due jobs with a conditional update, so several processes can
+poll the same table on any database. A claimed job is leased to its worker
+for JOBS["LEASE"] seconds, jobs of workers which died are run again once
+their lease expires. Failed jobs are retried with exponential backoff until
+they run out of attempts.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Due jobs looked at per claim, others may be claimed by other workers meanwhile
+CLAIM_CANDIDATES = 10
+
+
+def claim(worker_id):
+    """
+    Lease the next due job to the worker, None if there's none
+    """
+    now = timezone.now()
+    claimable = Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lt=now
+    )
+    candidates = (
+        Job.objects.filter(claimable)
+        .order_by("run_at")
+        .values_list("pk", flat=True)[:CLAIM_CANDIDATES]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(claimable, pk=pk).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=settings.JOBS["LEASE"]),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def finish(job, worker_id, **fields):
+    """
+    Update the job unless its lease expired and another worker claimed it
+    """
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker_id).update(
+        locked_by="", locked_until=None, **fields
+    )
+
+
+def retry_or_fail(job, worker_id, error):
+    task = queue.registry.get(job.name)
+    now = timezone.now()
+    if task is not None and job.attempts < job.max_attempts:
+        delay = task.retry_delay * 2 ** (job.attempts - 1)
+        try:
+            with transaction.atomic():
+                finish(
+                    job,
+                    worker_id,
+                    status=Job.QUEUED,
+                    run_at=now + timedelta(seconds=delay),
+                    error=error,
+                )
+            return
+        except IntegrityError:
+            # Another job with the key was queued meanwhile and does the work
+            pass
+    finish(job, worker_id, status=Job.FAILED, error=error, finished=now)
+
+
+def execute(job, worker_id):
+    """
+    Run the claimed job, and record whether it succeeded
+    """
+    task = queue.registry.get(job.name)
+    try:
+        if task is None:
+            raise LookupError(f"Task {job.name} isn't registered")
+        if job.attempts > job.max_attempts:
+            # Its lease expired on every attempt, e.g. it kills workers
+            raise RuntimeError("Out of attempts")
+        task.func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Job %s %s failed", job.pk, job.name)
+        retry_or_fail(job, worker_id, traceback.format_exc())
+    else:
+        finish(job, worker_id, status=Job.DONE, error="", finished=timezone.now())
+    finally:
+        interval = settings.JOBS["PERIODIC"].get(job.name)
+        if interval:
+            schedule_periodic(job.name, delay=interval)
+
+
+def schedule_periodic(name, delay=0):
+    queue.enqueue(name, key=f"periodic:{name}", delay=delay)
+
+
+class Worker:
+    """
+    Loop running due jobs one by one, until stopped
+    """
+
+    def __init__(self):
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        # Usable as a signal handler, the running job finishes first
+        self.stopping.set()
+
+    def run(self, burst=False):
+        """
+        Run jobs as they become due, or with burst only the due ones,
+        and return the number of jobs run
+        """
+        count = 0
+        while not self.stopping.is_set():
+            job = claim(self.id)
+            if job is None:
+                if burst:
+                    break
+                self.stopping.wait(settings.JOBS["POLL_INTERVAL"])
+                continue
+            execute(job, self.id)
+            count += 1
+        return count
+
+
+def run_pending():
+    """
+    Run due jobs in this thread, e.g. in tests or from cron
+    """
+    return Worker().run(burst=True)
@@ -1,8 +1,19 @@
 from django.contrib import admin
-from . import models 
+from . import models
 
 admin.site.register(models.Recipe)
 admin.site.register(models.Image)
 admin.site.register(models.Ingredient)
 admin.site.register(models.Step)
-admin.site.register(models.Tag)
\ No newline at end of file
+admin.site.register(models.Tag)
+
+
+class IngredientAliasInline(admin.TabularInline):
+    model = models.IngredientAlias
+
+
+@admin.register(models.CanonicalIngredient)
+class CanonicalIngredientAdmin(admin.ModelAdmin):
+    list_display = ("name", "key", "vegan")
+    search_fields = ("name", "key", "aliases__key")
+    inlines = (IngredientAliasInline,)
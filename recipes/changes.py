@@ -0,0 +1,147 @@
+"""
+Change feed of recipes for incremental sync of offline clients.
+
+Every change of a recipe or its images, ingredients, steps and tags gives
+the recipe the next number of the change sequence, deleted recipes leave
+tombstones numbered the same way. Clients pass the number of the last change
+they have seen and get the changes after it in the order they were made,
+read by range scans of the unique sequence indexes.
+
+Numbers are allocated without locks, so concurrent transactions may commit
+them out of order. Changes are listed only up to the safe horizon, below
+which no transaction still in progress holds a number, so clients never
+skip a change committed after they've read past its number.
+
+Counters like views and favourites aren't changes, they change too often
+to make clients download recipes again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import events, models
+
+BATCH_SIZE = 500
+
+
+def record_changes(recipe_pks):
+    """
+    Number a change of the recipes, e.g. of their child rows
+    """
+    recipe_pks = sorted(set(recipe_pks))
+    if not recipe_pks:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        sequences = models.next_sequences(len(recipe_pks))
+        recipes = [
+            models.Recipe(pk=recipe_pk, sequence=sequence, modified=now)
+            for sequence, recipe_pk in zip(sequences, recipe_pks)
+        ]
+        # Numbers are new, so updating them all at once breaks no uniqueness
+        models.Recipe.objects.bulk_update(
+            recipes, ["sequence", "modified"], batch_size=BATCH_SIZE
+        )
+    events.publish_on_commit(
+        events.CHANGED, {recipe.pk: recipe.sequence for recipe in recipes}
+    )
+
+
+def record_deletions(recipe_pks, authors=None):
+    """
+    Leave tombstones of the deleted recipes, their authors can be given
+    as a mapping of recipes to them, for events of authors' recipes
+    """
+    recipe_pks = sorted(set(recipe_pks))
+    if not recipe_pks:
+        return
+    with transaction.atomic():
+        sequences = models.next_sequences(len(recipe_pks))
+        tombstones = [
+            models.DeletedRecipe(id=recipe_pk, sequence=sequence)
+            for sequence, recipe_pk in zip(sequences, recipe_pks)
+        ]
+        # Deleted again by a concurrent request
+        models.DeletedRecipe.objects.bulk_create(tombstones, ignore_conflicts=True)
+    events.publish_on_commit(
+        events.DELETED,
+        {tombstone.id: tombstone.sequence for tombstone in tombstones},
+        authors or {},
+    )
+
+
+def safe_horizon(since=0):
+    """
+    Highest change number up to which every number was committed or rolled
+    back. Allocations become visible when their transactions commit, so a
+    missing number is held by a transaction in progress, unless numbers after
+    it were allocated more than CHANGE_FEED["COMMIT_TIMEOUT"] seconds ago
+    and it was rolled back
+    """
+    settled_before = timezone.now() - timedelta(
+        seconds=settings.CHANGE_FEED["COMMIT_TIMEOUT"]
+    )
+    settled = models.ChangeSequence.objects.filter(
+        allocated__lt=settled_before
+    ).aggregate(Max("pk"))["pk__max"]
+    horizon = max(since, settled or 0)
+    # Only numbers allocated within the timeout are left to check
+    pending = (
+        models.ChangeSequence.objects.filter(pk__gt=horizon)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    for sequence in pending:
+        if sequence != horizon + 1:
+            break
+        horizon = sequence
+    return horizon
+
+
+def prune_allocations():
+    """
+    Delete settled allocations of change numbers but the latest one,
+    which safe_horizon starts from
+    """
+    settled_before = timezone.now() - timedelta(
+        seconds=settings.CHANGE_FEED["COMMIT_TIMEOUT"]
+    )
+    settled = models.ChangeSequence.objects.filter(allocated__lt=settled_before)
+    latest = settled.aggregate(Max("pk"))["pk__max"]
+    if latest is not None:
+        settled.filter(pk__lt=latest).delete()
+
+
+def changes_since(recipes, since, limit):
+    """
+    Recipes of the queryset changed and tombstones left after the given
+    change number, at most limit of them together, the number of the last
+    change listed, and whether there are more changes after it
+    """
+    horizon = safe_horizon(since)
+    if horizon <= since:
+        return [], [], since, False
+    sequences = list(
+        models.Recipe.objects.filter(sequence__gt=since, sequence__lte=horizon)
+        .order_by("sequence")
+        .values_list("sequence", flat=True)[: limit + 1]
+    )
+    deleted = list(
+        models.DeletedRecipe.objects.filter(
+            sequence__gt=since, sequence__lte=horizon
+        ).order_by("sequence")[: limit + 1]
+    )
+
+    listed = sorted(sequences + [tombstone.sequence for tombstone in deleted])
+    has_more = len(listed) > limit
+    listed = listed[:limit]
+    if not listed:
+        return [], [], since, False
+
+    cursor = listed[-1]
+    changed = list(recipes.filter(sequence__gt=since, sequence__lte=cursor).order_by("sequence"))
+    deleted = [tombstone for tombstone in deleted if tombstone.sequence <= cursor]
+    return changed, deleted, cursor, has_more
@@ -0,0 +1,101 @@
+"""
+Bulk deletion of recipes, in chunks with one transaction each.
+
+Related rows are deleted with one query per table and chunk, without loading
+them. The per row signals are skipped: tag counts are recounted once per chunk,
+files of images are deleted from the storage by a background job and stats
+of the authors are forgotten once the transaction commits.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from jobs.queue import enqueue
+from users.stats import forget_author_stats
+from . import changes, models, similarity, tasks
+
+CHUNK_SIZE = 500
+
+
+def delete_files_later(field, names):
+    """
+    Delete files of the file field by a background job, queued in the current
+    transaction, so they aren't lost if it's rolled back
+    """
+    names = [name for name in names if name]
+    if names:
+        enqueue(tasks.delete_files, args=(field.model._meta.label, field.name, names))
+
+
+def raw_delete(queryset):
+    """
+    Delete rows in one query, without collecting related objects or sending
+    signals, related rows must be deleted first
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_recipes(recipe_pks, chunk_size=CHUNK_SIZE):
+    """
+    Delete the recipes with their images, ingredients, steps and relations,
+    return the number of deleted recipes
+    """
+    recipe_pks = list(recipe_pks)
+    deleted = 0
+    for start in range(0, len(recipe_pks), chunk_size):
+        chunk = recipe_pks[start : start + chunk_size]
+        with transaction.atomic():
+            deleted += delete_recipes_chunk(chunk)
+    return deleted
+
+
+def delete_recipes_chunk(recipe_pks):
+    recipes = models.Recipe.objects.filter(pk__in=recipe_pks).values_list(
+        "pk", "author_id", "author__username"
+    )
+    authors = {}
+    usernames = set()
+    for recipe_pk, author_pk, username in recipes:
+        authors[recipe_pk] = author_pk
+        if username is not None:
+            usernames.add(username)
+    tagged = models.Tag.recipes.through.objects.filter(recipe_id__in=recipe_pks)
+    tag_pks = set(tagged.values_list("tag_id", flat=True))
+    images = models.Image.objects.filter(recipe_id__in=recipe_pks)
+    file_names = list(images.values_list("url", flat=True))
+    # Other recipes lose neighbours
+    neighbour_pks = set(
+        models.SimilarRecipe.objects.filter(similar_id__in=recipe_pks)
+        .exclude(recipe_id__in=recipe_pks)
+        .order_by()
+        .values_list("recipe_id", flat=True)
+    )
+
+    raw_delete(tagged)
+    # Favourite counts of the recipes are deleted with them
+    raw_delete(
+        models.Recipe.favouriterecipes_set.through.objects.filter(recipe_id__in=recipe_pks)
+    )
+    raw_delete(
+        models.SimilarRecipe.objects.filter(
+            Q(recipe_id__in=recipe_pks) | Q(similar_id__in=recipe_pks)
+        )
+    )
+    raw_delete(images)
+    # Marking deleted recipes stale isn't needed
+    raw_delete(models.Ingredient.objects.filter(recipe_id__in=recipe_pks))
+    raw_delete(models.Step.objects.filter(recipe_id__in=recipe_pks))
+    deleted = raw_delete(models.Recipe.objects.filter(pk__in=recipe_pks))
+    changes.record_deletions(authors.keys(), authors)
+
+    if tag_pks:
+        models.update_tag_recipe_counts(tag_pks)
+    if neighbour_pks:
+        similarity.mark_stale(neighbour_pks)
+    delete_files_later(models.Image._meta.get_field("url"), file_names)
+    transaction.on_commit(lambda: forget_authors_stats(usernames))
+    return deleted
+
+
+def forget_authors_stats(usernames):
+    for username in usernames:
+        forget_author_stats(username)
@@ -0,0 +1,222 @@
+"""
+In-process publish/subscribe of recipe changes, streamed to clients
+as server-sent events.
+
+Changes numbered by recipes.changes are published once their transaction
+commits, to the topics of the recipe and of its author. Subscribers are
+streams, each with a bounded queue, in its event loop under ASGI or read by
+a blocking worker thread under WSGI, events are published to them from
+the threads of sync code. Only subscribers in the
+process making the change are notified, with several worker processes
+a shared broker (e.g. Redis pub/sub) would have to publish to all of them.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import models
+
+CHANGED, DELETED = "changed", "deleted"
+# Put in place of events dropped from a full queue, the client
+# catches up with the change feed
+OVERFLOW = {"event": "overflow"}
+
+
+def recipe_topic(recipe_pk):
+    return f"recipe:{recipe_pk}"
+
+
+def author_topic(user_pk):
+    return f"author:{user_pk}"
+
+
+class Subscription:
+    """
+    Queue of events of the topics, read in the event loop it was made in
+    """
+
+    def __init__(self, topics, max_size):
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+
+    def put(self, event):
+        if self.queue.full():
+            # Slow clients get told to resync instead of holding memory
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = OVERFLOW
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        """
+        Put the event in the queue from any thread
+        """
+        self.loop.call_soon_threadsafe(self.put, event)
+
+    async def get(self, timeout):
+        """
+        Next event, or TimeoutError after the given seconds
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class BlockingSubscription(Subscription):
+    """
+    Queue of events of the topics, read by a blocking thread
+    """
+
+    def __init__(self, topics, max_size):
+        self.topics = topics
+        self.queue = queue.Queue(max_size)
+        # Publishing threads empty a full queue one at a time
+        self.lock = threading.Lock()
+
+    def deliver(self, event):
+        with self.lock:
+            self.put(event)
+
+    def get(self, timeout):
+        """
+        Next event, or queue.Empty after the given seconds
+        """
+        return self.queue.get(timeout=timeout)
+
+
+class Broker:
+    """
+    Subscriptions by topic, shared by the threads of the process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, topics, max_size=100, blocking=False):
+        """
+        Subscribe to the topics, must be called in the event loop reading them,
+        or with blocking in the thread reading them
+        """
+        if blocking:
+            subscription = BlockingSubscription(topics, max_size)
+        else:
+            subscription = Subscription(topics, max_size)
+        with self.lock:
+            for topic in topics:
+                self.subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for topic in subscription.topics:
+                self.subscriptions[topic].discard(subscription)
+                if not self.subscriptions[topic]:
+                    del self.subscriptions[topic]
+
+    def has_subscribers(self):
+        return bool(self.subscriptions)
+
+    def publish(self, topics, event):
+        """
+        Put the event in queues of subscribers of any of the topics,
+        once per subscriber, from any thread
+        """
+        with self.lock:
+            subscriptions = set().union(
+                *(self.subscriptions.get(topic, ()) for topic in topics)
+            )
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The loop was closed without unsubscribing
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def publish_recipe_events(kind, sequences, authors=None):
+    """
+    Publish events of the recipes, given as a mapping of recipes to their
+    change numbers, and optionally to their authors, looked up if not given
+    """
+    if authors is None:
+        authors = dict(
+            models.Recipe.objects.filter(pk__in=sequences).values_list("pk", "author_id")
+        )
+    for recipe_pk, sequence in sequences.items():
+        topics = [recipe_topic(recipe_pk)]
+        if authors.get(recipe_pk) is not None:
+            topics.append(author_topic(authors[recipe_pk]))
+        broker.publish(
+            topics, {"event": kind, "recipe": str(recipe_pk), "sequence": sequence}
+        )
+
+
+def publish_on_commit(kind, sequences, authors=None):
+    # Nothing is looked up while nobody listens in this process
+    if broker.has_subscribers():
+        transaction.on_commit(lambda: publish_recipe_events(kind, sequences, authors))
+
+
+def format_event(event):
+    data = {key: value for key, value in event.items() if key != "event"}
+    lines = [f"event: {event['event']}", f"data: {json.dumps(data)}"]
+    if "sequence" in event:
+        # Sent back on reconnect as Last-Event-ID, usable as since of the change feed
+        lines.insert(0, f"id: {event['sequence']}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(topics):
+    """
+    Server-sent events of the topics, with comments keeping the connection
+    open while nothing happens. Streams end after MAX_DURATION seconds,
+    clients reconnect by themselves, so streams of clients which left
+    without the server noticing don't stay subscribed
+    """
+    options = settings.RECIPE_EVENTS
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + options["MAX_DURATION"]
+    # Subscribed in the loop iterating the stream
+    subscription = broker.subscribe(topics, options["QUEUE_SIZE"])
+    try:
+        yield f"retry: {options['RETRY'] * 1000}\n\n"
+        while (remaining := ends_at - loop.time()) > 0:
+            try:
+                event = await subscription.get(min(options["KEEPALIVE"], remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def stream_blocking(topics):
+    """
+    Server-sent events of the topics like stream, for WSGI servers, which
+    would read an async stream to its end before sending anything. Each
+    stream holds a worker thread until it ends
+    """
+    options = settings.RECIPE_EVENTS
+    ends_at = time.monotonic() + options["MAX_DURATION"]
+    subscription = broker.subscribe(topics, options["QUEUE_SIZE"], blocking=True)
+    try:
+        yield f"retry: {options['RETRY'] * 1000}\n\n"
+        while (remaining := ends_at - time.monotonic()) > 0:
+            try:
+                event = subscription.get(min(options["KEEPALIVE"], remaining))
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from benchmarks import report
+from benchmarks.dataset import generate_dataset
+from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark API hot paths against a synthetic dataset in a throwaway "
+        "test database, optionally comparing with a previous JSON report"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--recipes", type=int, default=200)
+        parser.add_argument("--ingredients", type=int, default=8, help="per recipe")
+        parser.add_argument("--steps", type=int, default=6, help="per recipe")
+        parser.add_argument("--tags", type=int, default=15)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=list(SCENARIOS),
+            help="run only given scenarios (repeatable)",
+        )
+        parser.add_argument("--output", help="write the JSON report to this file")
+        parser.add_argument("--compare", help="JSON report of the baseline")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="allowed relative p95 slowdown against the baseline",
+        )
+        parser.add_argument(
+            "--locmem-cache",
+            action="store_true",
+            help="use a local memory cache instead of the configured one",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {
+            "EMAIL_BACKEND": "django.core.mail.backends.locmem.EmailBackend",
+            # Throttling would reject repeated requests from one client
+            "REST_FRAMEWORK": {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}},
+        }
+        if options["locmem_cache"]:
+            overrides["CACHES"] = {
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            }
+
+        dataset_options = {
+            "users": options["users"],
+            "recipes": options["recipes"],
+            "ingredients_per_recipe": options["ingredients"],
+            "steps_per_recipe": options["steps"],
+            "tags": options["tags"],
+            "seed": options["seed"],
+        }
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(**overrides):
+                results = self.run(dataset_options, options)
+        except report.BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(report.format_table(results))
+        benchmark_report = report.build_report(results, dataset_options)
+
+        if options["output"]:
+            report.write_report(benchmark_report, options["output"])
+
+        if options["compare"]:
+            regressions = report.compare(
+                benchmark_report,
+                report.read_report(options["compare"]),
+                options["threshold"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions against the baseline:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run(self, dataset_options, options):
+        dataset = generate_dataset(**dataset_options)
+        context = BenchmarkContext(dataset, seed=options["seed"])
+
+        results = {}
+        with context.stub_outbound_http():
+            for name in options["scenario"] or SCENARIOS:
+                results[name] = report.run_scenario(
+                    SCENARIOS[name],
+                    context,
+                    options["iterations"],
+                    options["warmup"],
+                )
+        return results
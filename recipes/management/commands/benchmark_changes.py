@@ -0,0 +1,66 @@
+import tempfile
+from pathlib import Path
+
+from django.db import connections
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from benchmarks import changes, report
+from benchmarks.dataset import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many changes of recipes concurrent writers number per second, "
+        "and whether a client following the change feed misses any of them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+        parser.add_argument(
+            "--duration", type=float, default=5, help="seconds per level"
+        )
+        parser.add_argument(
+            "--work",
+            type=float,
+            default=0.005,
+            help="seconds a transaction runs after numbering its change",
+        )
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            # Writers in threads need a database file, not a shared in-memory one
+            settings_dict = connections["default"].settings_dict
+            settings_dict["TEST"] = {
+                **settings_dict["TEST"],
+                "NAME": str(Path(directory) / "benchmark.sqlite3"),
+            }
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                generate_dataset(users=1, recipes=max(options["writers"]))
+                results = [
+                    changes.run(writers, options["duration"], options["work"])
+                    for writers in options["writers"]
+                ]
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        header = f"{'writers':>8}{'changes':>10}{'per s':>10}{'p50 ms':>10}{'p95 ms':>10}{'skipped':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for stats in results:
+            self.stdout.write(
+                f"{stats['writers']:>8}{stats['changes']:>10}{stats['changes_per_second']:>10.1f}"
+                f"{stats['p50_ms'] or 0:>10.1f}{stats['p95_ms'] or 0:>10.1f}{stats['skipped']:>9}"
+            )
+
+        if options["output"]:
+            report.write_report(
+                {
+                    "revision": report.git_revision(),
+                    "work": options["work"],
+                    "levels": results,
+                },
+                options["output"],
+            )
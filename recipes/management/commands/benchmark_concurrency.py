@@ -0,0 +1,53 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from benchmarks import concurrency, report
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent connections creating ingredients (with a slow "
+        "stubbed vegan API) uvicorn with async views and the WSGI server handle"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 10, 50, 100]
+        )
+        parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+        parser.add_argument(
+            "--vegan-api-delay", type=float, default=0.2, help="seconds per vegan check"
+        )
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            results = concurrency.run(
+                Path(directory) / "benchmark.sqlite3",
+                options["concurrency"],
+                options["duration"],
+                options["vegan_api_delay"],
+            )
+
+        header = f"{'server':<8}{'conns':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for mode, levels in results.items():
+            for stats in levels:
+                self.stdout.write(
+                    f"{mode:<8}{stats['concurrency']:>8}{stats['requests_per_second']:>10.1f}"
+                    f"{stats['p50_ms'] or 0:>10.1f}{stats['p95_ms'] or 0:>10.1f}"
+                    f"{stats['p99_ms'] or 0:>10.1f}{stats['errors']:>8}"
+                )
+
+        if options["output"]:
+            report.write_report(
+                {
+                    "revision": report.git_revision(),
+                    "vegan_api_delay": options["vegan_api_delay"],
+                    "servers": results,
+                },
+                options["output"],
+            )
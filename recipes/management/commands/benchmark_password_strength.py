@@ -0,0 +1,40 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmarks import passwords, report
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the password strength evaluation per keystroke, "
+        "against the former regular expression scans"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--passwords", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--breached-passwords",
+            default=settings.BREACHED_PASSWORDS_PATH,
+            help="list to time lookups in, BREACHED_PASSWORDS_PATH by default",
+        )
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        path = options["breached_passwords"]
+        results = passwords.run(
+            options["passwords"],
+            options["repeat"],
+            breached_path=path if os.path.exists(path) else None,
+            seed=options["seed"],
+        )
+        for name in ("regex", "scanner", "evaluate", "lookup"):
+            if f"{name}_us" in results:
+                self.stdout.write(f"{name:<10} {results[f'{name}_us']:8.2f} us per call")
+
+        if options["output"]:
+            results["revision"] = report.git_revision()
+            report.write_report(results, options["output"])
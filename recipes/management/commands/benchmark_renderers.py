@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks import renderers, report
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure render time and compressed sizes of a page of synthetic recipes "
+        "by DRF's JSON renderer and the compact renderers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100, help="recipes per page")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        results = renderers.run(options["recipes"], options["repeat"], options["seed"])
+        for name, result in results["renderers"].items():
+            sizes = ", ".join(
+                f"{encoding} {size} B" for encoding, size in result["bytes"].items()
+            )
+            self.stdout.write(
+                f"{name}: {result['render_ms']:.2f} ms, "
+                f"{result['render_objects_ms']:.2f} ms with UUID/datetime objects, {sizes}"
+            )
+
+        if options["output"]:
+            results["revision"] = report.git_revision()
+            report.write_report(results, options["output"])
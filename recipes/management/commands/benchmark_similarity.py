@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks import report, similarity
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure time and peak memory of the batch rebuild of similar recipes "
+        "on synthetic recipes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument("--neighbours", type=int, default=10)
+        parser.add_argument("--ingredients", type=int, default=2000, help="distinct names")
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        results = similarity.run(
+            options["recipes"],
+            options["neighbours"],
+            seed=options["seed"],
+            ingredients=options["ingredients"],
+            ingredients_per_recipe=options["ingredients_per_recipe"],
+            tags=options["tags"],
+            tags_per_recipe=options["tags_per_recipe"],
+        )
+        self.stdout.write(
+            f"Rebuilt {results['rows']} neighbours of {results['recipes']} recipes "
+            f"in {results['seconds']:.1f} s, peak memory {results['peak_memory_mb']:.0f} MB"
+        )
+
+        if options["output"]:
+            results["revision"] = report.git_revision()
+            report.write_report(results, options["output"])
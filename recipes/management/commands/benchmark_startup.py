@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks import report, startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker cold start in new interpreters with -X importtime, "
+        "reporting wall time and the slowest imported packages"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--output", help="write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        results = startup.run(options["repeat"])
+
+        wall = results["wall_ms"]
+        self.stdout.write(
+            f"Worker boot: median {wall['median']:.1f} ms "
+            f"(min {wall['min']:.1f} ms, max {wall['max']:.1f} ms)"
+        )
+        self.stdout.write(f"{'package':<30}{'import ms':>12}")
+        for package, milliseconds in list(results["imports_ms"].items())[: options["top"]]:
+            self.stdout.write(f"{package:<30}{milliseconds:>12.1f}")
+
+        if options["output"]:
+            results["revision"] = report.git_revision()
+            report.write_report(results, options["output"])
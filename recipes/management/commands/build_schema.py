@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema file served by /api/schema/"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="fail if the schema file differs from the generated schema",
+        )
+
+    def handle(self, *args, **options):
+        schema = generate_schema()
+        path = settings.SCHEMA_FILE
+
+        if options["check"]:
+            if not path.exists() or path.read_bytes() != schema:
+                raise CommandError(
+                    f"{path} is out of date, run `python manage.py build_schema`"
+                )
+            self.stdout.write(self.style.SUCCESS(f"{path} is up to date"))
+            return
+
+        path.write_bytes(schema)
+        self.stdout.write(self.style.SUCCESS(f"Schema written to {path}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop recipes whose trending score decayed below the minimum, "
+        "run hourly by job workers"
+    )
+
+    def handle(self, *args, **options):
+        dropped = trending.decay()
+        self.stdout.write(
+            self.style.SUCCESS(f"Dropped {dropped} recipes from trending recipes")
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from benchmarks.dataset import generate_dataset, PASSWORD
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a reproducible synthetic dataset for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--recipes", type=int, default=200)
+        parser.add_argument("--ingredients", type=int, default=8, help="per recipe")
+        parser.add_argument("--steps", type=int, default=6, help="per recipe")
+        parser.add_argument("--tags", type=int, default=15)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dataset = generate_dataset(
+                users=options["users"],
+                recipes=options["recipes"],
+                ingredients_per_recipe=options["ingredients"],
+                steps_per_recipe=options["steps"],
+                tags=options["tags"],
+                seed=options["seed"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(dataset['users'])} users (password {PASSWORD!r}), "
+                f"{len(dataset['recipes'])} recipes and {len(dataset['tags'])} tags"
+            )
+        )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute neighbours of all recipes, or with --stale only of recipes "
+        "whose ingredients or tags changed, refreshed by job workers as well"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale", action="store_true", help="refresh only recipes marked stale"
+        )
+        parser.add_argument("--limit", type=int, help="refresh at most this many recipes")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options["stale"]:
+            refreshed = similarity.refresh_stale(options["limit"])
+            message = f"Refreshed similar recipes of {refreshed} recipes"
+        else:
+            created = similarity.rebuild()
+            message = f"Stored {created} similar recipes"
+        self.stdout.write(
+            self.style.SUCCESS(f"{message} in {time.perf_counter() - start:.1f} s")
+        )
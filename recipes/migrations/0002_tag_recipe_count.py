@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:22
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_tag_recipes(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    through = Tag.recipes.through
+    counts = (
+        through.objects.filter(tag=models.OuterRef('pk'))
+        .values('tag')
+        .annotate(count=models.Count('pk'))
+        .values('count')
+    )
+    Tag.objects.update(recipe_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_tag_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:25
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_recipe_favourites(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavouriteRecipes = apps.get_model('users', 'FavouriteRecipes')
+    through = FavouriteRecipes.recipes.through
+    counts = (
+        through.objects.filter(recipe=models.OuterRef('pk'))
+        .values('recipe')
+        .annotate(count=models.Count('pk'))
+        .values('count')
+    )
+    Recipe.objects.update(favourite_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_tag_recipe_count'),
+        ('users', '0002_alter_favouriterecipes_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favourite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_recipe_favourites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_favourite_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(db_index=True, editable=False, null=True),
+        ),
+    ]
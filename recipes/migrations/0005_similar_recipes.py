@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='similar_recipes_stale',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_recipes', to='recipes.recipe')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ('-score',),
+                'unique_together': {('recipe', 'similar')},
+            },
+        ),
+    ]
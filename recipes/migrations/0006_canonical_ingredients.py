@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=50)),
+                ('vegan', models.BooleanField(editable=False, null=True)),
+            ],
+            options={
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('canonical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='recipes.canonicalingredient')),
+            ],
+            options={
+                'verbose_name_plural': 'Ingredient aliases',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ingredients', to='recipes.canonicalingredient'),
+        ),
+    ]
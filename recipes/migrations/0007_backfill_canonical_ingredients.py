@@ -0,0 +1,55 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def normalize_ingredient_name(name):
+    return "".join(character for character in name.lower() if character.isalnum())
+
+
+def link_canonical_ingredients(apps, schema_editor):
+    """
+    Link existing ingredients to canonical ones, a batch per transaction,
+    so large tables aren't locked for the whole backfill
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    CanonicalIngredient = apps.get_model('recipes', 'CanonicalIngredient')
+
+    while True:
+        with transaction.atomic():
+            ingredients = list(
+                Ingredient.objects.filter(canonical__isnull=True).order_by('pk')[
+                    :BATCH_SIZE
+                ]
+            )
+            if not ingredients:
+                break
+
+            names = {}
+            for ingredient in ingredients:
+                key = normalize_ingredient_name(ingredient.name)
+                names.setdefault(key, ingredient.name.strip())
+            CanonicalIngredient.objects.bulk_create(
+                [CanonicalIngredient(key=key, name=name) for key, name in names.items()],
+                ignore_conflicts=True,
+            )
+            canonical_pks = dict(
+                CanonicalIngredient.objects.filter(key__in=names).values_list('key', 'pk')
+            )
+
+            for ingredient in ingredients:
+                key = normalize_ingredient_name(ingredient.name)
+                ingredient.canonical_id = canonical_pks[key]
+            Ingredient.objects.bulk_update(ingredients, ['canonical'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0006_canonical_ingredients'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_canonical_ingredients, migrations.RunPython.noop),
+    ]
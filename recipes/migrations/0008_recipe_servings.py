@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:47
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_backfill_canonical_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)]),
+        ),
+    ]
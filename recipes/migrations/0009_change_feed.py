@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:04
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def number_existing_recipes(apps, schema_editor):
+    """
+    Number existing recipes in the order they were last modified,
+    so clients syncing from the start get all of them
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ChangeSequence = apps.get_model('recipes', 'ChangeSequence')
+
+    recipes = list(Recipe.objects.order_by('modified', 'pk').only('pk'))
+    for sequence, recipe in enumerate(recipes, 1):
+        recipe.sequence = sequence
+    Recipe.objects.bulk_update(recipes, ['sequence'], batch_size=BATCH_SIZE)
+    ChangeSequence.objects.create(pk=1, value=len(recipes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_servings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeletedRecipe',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('sequence', models.BigIntegerField(unique=True)),
+                ('deleted', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='sequence',
+            field=models.BigIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(number_existing_recipes, migrations.RunPython.noop),
+    ]
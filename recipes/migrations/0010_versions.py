@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+# Order.MAX_ORDER when the limit started to be enforced
+MAX_ORDER = 20
+
+
+def renumber_orders(apps, schema_editor):
+    """
+    Number steps and images of each recipe 1, 2, 3... in their current order,
+    as orders assigned before the limit was enforced may have gaps, duplicates
+    or exceed it. Rows past the limit share the last order
+    """
+    for model_name in ('Step', 'Image'):
+        model = apps.get_model('recipes', model_name)
+        changed = []
+        recipe_id, number = None, 0
+        for row in model.objects.order_by('recipe_id', 'order', 'pk').only(
+            'pk', 'recipe_id', 'order'
+        ):
+            if row.recipe_id != recipe_id:
+                recipe_id, number = row.recipe_id, 0
+            number += 1
+            order = min(number, MAX_ORDER)
+            if row.order != order:
+                row.order = order
+                changed.append(row)
+        model.objects.bulk_update(changed, ['order'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_orders, migrations.RunPython.noop),
+    ]
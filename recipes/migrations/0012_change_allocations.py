@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.color import no_style
+from django.db import migrations, models
+import django.utils.timezone
+
+# Allocated before any transaction still in progress
+SETTLED = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def reset_sequence(schema_editor, model):
+    connection = schema_editor.connection
+    for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+        schema_editor.execute(sql)
+
+
+def allocate_from_counter(apps, schema_editor):
+    """
+    Replace the counter row with a settled allocation of its last number,
+    so new numbers continue after it and the feed lists the numbers up to it
+    """
+    ChangeSequence = apps.get_model('recipes', 'ChangeSequence')
+    value = ChangeSequence.objects.filter(pk=1).values_list('value', flat=True).first()
+    ChangeSequence.objects.all().delete()
+    ChangeSequence.objects.create(pk=max(value or 0, 1), allocated=SETTLED)
+    reset_sequence(schema_editor, ChangeSequence)
+
+
+def count_allocations(apps, schema_editor):
+    ChangeSequence = apps.get_model('recipes', 'ChangeSequence')
+    value = ChangeSequence.objects.aggregate(models.Max('pk'))['pk__max'] or 0
+    ChangeSequence.objects.all().delete()
+    ChangeSequence.objects.create(pk=1, value=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_renumber_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='allocated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(allocate_from_counter, count_allocations),
+        migrations.RemoveField(
+            model_name='changesequence',
+            name='value',
+        ),
+    ]
@@ -1,6 +1,8 @@
 import uuid
+from django.db.models.functions import Coalesce
 from utils import generate_unique_identifier
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.contrib.auth.models import User
 from django.core.validators import (
     MinValueValidator,
@@ -9,9 +11,49 @@ from django.core.validators import (
 )
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
+from django.utils import timezone
 
 
-class Recipe(models.Model):
+class VersionConflict(Exception):
+    """
+    The row was changed or deleted since the version it was read at
+    """
+
+
+class Versioned(models.Model):
+    """
+    Abstract model with a version number incremented by every save, so writes
+    can check that the row didn't change since they read it without locking it
+    """
+
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        super().save(*args, **kwargs)
+
+    def claim_version(self):
+        """
+        Move the row to the next version if it's still at the loaded one,
+        raise VersionConflict otherwise. Meant to run in the transaction
+        saving the object, which writes the same next version
+        """
+        claimed = (
+            type(self)
+            .objects.filter(pk=self.pk, version=self.version)
+            .update(version=self.version + 1)
+        )
+        if not claimed:
+            raise VersionConflict()
+
+
+class Recipe(Versioned):
     author = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -21,9 +63,24 @@ class Recipe(models.Model):
     title = models.CharField(max_length=100)
     slug = models.SlugField(editable=False)
     body = models.TextField()
+    # Number of servings the quantities of ingredients are meant for
+    servings = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1), MaxValueValidator(100)]
+    )
     views = models.PositiveIntegerField(default=0, blank=True, editable=False)
+    # Number of users having the recipe in favourites, kept by signals
+    favourite_count = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed views and favourites, see recipes.trending
+    trending_score = models.FloatField(null=True, editable=False, db_index=True)
+    # Ingredients or tags changed since similar recipes were computed
+    similar_recipes_stale = models.BooleanField(
+        default=False, editable=False, db_index=True
+    )
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
+    # Number of the latest change of the recipe or its child rows,
+    # see recipes.changes
+    sequence = models.BigIntegerField(null=True, unique=True, editable=False)
     id = models.UUIDField(
         default=uuid.uuid4, editable=False, unique=True, primary_key=True
     )
@@ -38,25 +95,36 @@ class Recipe(models.Model):
         # Create slug
         if not self.slug:
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+        # Numbered in the transaction saving it, see next_sequences
+        with transaction.atomic():
+            [self.sequence] = next_sequences()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "sequence"}
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
 
-class Order(models.Model):
+class Order(Versioned):
     """
     Abstract model containing order field and methods returning new object's order
     and for changing its order respectively
     """
 
+    MAX_ORDER = 20
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.object_model = type(self)
 
     order = models.PositiveIntegerField(
         editable=False,
-        validators=[MinValueValidator(1), MaxValueValidator(20), StepValueValidator(1)],
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(MAX_ORDER),
+            StepValueValidator(1),
+        ],
         null=True,
     )
 
@@ -69,35 +137,72 @@ class Order(models.Model):
         """
         pass
 
+    def save(self, *args, **kwargs):
+        # Enforced here for new rows, as orders are assigned by the model, not by forms,
+        # existing ones are only moved within the recipe by change_order
+        if self._state.adding and self.order is not None:
+            self._meta.get_field("order").run_validators(self.order)
+        super().save(*args, **kwargs)
+
     def change_order(self, new_order):
         """
-        Changes the order of the object and adjusts the order of other steps accordingly
+        Changes the order of the object and adjusts the order of other steps accordingly.
+
+        Orders are read again and written with a single update of the moved
+        rows, conditional on their versions, so a concurrent change of any
+        of them raises VersionConflict instead of leaving duplicate orders
         """
 
         new_order = int(new_order)
-        queryset = self.object_model.objects.filter(recipe=self.recipe)
-
-        if new_order > queryset.count():
-            raise ValidationError(
-                "New order can't be greater than the sum of all steps related to the same recipe"
+        queryset = self.object_model.objects.filter(recipe_id=self.recipe_id)
+
+        with transaction.atomic():
+            rows = {
+                pk: (order, version)
+                for pk, order, version in queryset.values_list("pk", "order", "version")
+            }
+            if self.pk not in rows or rows[self.pk][1] != self.version:
+                raise VersionConflict()
+            if new_order > len(rows):
+                raise ValidationError(
+                    "New order can't be greater than the sum of all steps related to the same recipe"
+                )
+            if new_order < 1:
+                raise ValidationError("New order must be a positive integer")
+
+            old_order = rows[self.pk][0]
+            if new_order == old_order:
+                return
+
+            moved = {self.pk: new_order}
+            for pk, (order, _) in rows.items():
+                if old_order < order <= new_order:
+                    # Moving the step down, so the steps in between move up
+                    moved[pk] = order - 1
+                elif new_order <= order < old_order:
+                    # Moving the step up, so the steps in between move down
+                    moved[pk] = order + 1
+
+            unchanged = Q()
+            for pk in moved:
+                unchanged |= Q(pk=pk, version=rows[pk][1])
+            updated = queryset.filter(unchanged).update(
+                order=Case(
+                    *(When(pk=pk, then=Value(order)) for pk, order in moved.items())
+                ),
+                version=F("version") + 1,
             )
-        if new_order < 0:
-            raise ValidationError("New order must be a positive integer")
+            if updated != len(moved):
+                # Rolls back the rows which did update
+                raise VersionConflict()
 
-        old_order = self.order
-        self.order = new_order
-        self.save()
+            # Updated without the signals recording changes of saved rows
+            from . import changes
 
-        if old_order < new_order:
-            # Moving the step down, so adjust the order of steps in between
-            queryset.filter(order__gt=old_order, order__lte=new_order).exclude(
-                pk=self.pk
-            ).update(order=models.F("order") - 1)
-        elif old_order > new_order:
-            # Moving the step up, so adjust the order of steps in between
-            queryset.filter(order__gte=new_order, order__lt=old_order).exclude(
-                pk=self.pk
-            ).update(order=models.F("order") + 1)
+            changes.record_changes([self.recipe_id])
+
+        self.order = new_order
+        self.version += 1
 
 
 class Image(Order):
@@ -129,6 +234,100 @@ class Image(Order):
         return self.url.name
 
 
+def normalize_ingredient_name(name):
+    """
+    Key shared by spellings of the ingredient, e.g. "Soy Milk" and "soymilk"
+    """
+    return "".join(character for character in name.lower() if character.isalnum())
+
+
+class CanonicalIngredient(models.Model):
+    """
+    Ingredient shared by all recipes using it, whatever its spelling
+    """
+
+    key = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=50)
+    # Verdict of the is-vegan API, unknown until the ingredient is first checked
+    vegan = models.BooleanField(null=True, editable=False)
+
+    class Meta:
+        ordering = ("name",)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def resolve(cls, name):
+        """
+        Get the canonical ingredient of the name or one of its aliases,
+        creating it for new ingredients
+        """
+        key = normalize_ingredient_name(name)
+        canonical = cls.objects.filter(
+            models.Q(key=key) | models.Q(aliases__key=key)
+        ).first()
+        if canonical is None:
+            canonical, _ = cls.objects.get_or_create(
+                key=key, defaults={"name": name.strip()}
+            )
+        return canonical
+
+
+class IngredientAlias(models.Model):
+    """
+    Other name of the canonical ingredient, which can't be told apart
+    by normalization, e.g. "soya milk" of "soy milk"
+    """
+
+    key = models.CharField(max_length=50, unique=True)
+    canonical = models.ForeignKey(
+        CanonicalIngredient, on_delete=models.CASCADE, related_name="aliases"
+    )
+
+    class Meta:
+        verbose_name_plural = "Ingredient aliases"
+
+    def save(self, *args, **kwargs):
+        self.key = normalize_ingredient_name(self.key)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.key} -> {self.canonical}"
+
+
+def resolve_canonical_ingredients(names):
+    """
+    Map ingredient names to primary keys of their canonical ingredients,
+    creating the missing ones, with a constant number of queries
+    """
+    keys = {name: normalize_ingredient_name(name) for name in names}
+    found = dict(
+        IngredientAlias.objects.filter(key__in=keys.values()).values_list(
+            "key", "canonical_id"
+        )
+    )
+    found.update(
+        CanonicalIngredient.objects.filter(key__in=keys.values()).values_list(
+            "key", "pk"
+        )
+    )
+
+    missing = {}
+    for name, key in keys.items():
+        if key not in found:
+            missing.setdefault(key, name.strip())
+    if missing:
+        CanonicalIngredient.objects.bulk_create(
+            [CanonicalIngredient(key=key, name=name) for key, name in missing.items()],
+            ignore_conflicts=True,
+        )
+        found.update(
+            CanonicalIngredient.objects.filter(key__in=missing).values_list("key", "pk")
+        )
+    return {name: found[key] for name, key in keys.items()}
+
+
 class Ingredient(models.Model):
     UNIT_CHOICES = (
         ("g", "grams"),
@@ -154,6 +353,41 @@ class Ingredient(models.Model):
     id = models.UUIDField(
         default=uuid.uuid4, editable=False, unique=True, primary_key=True
     )
+    canonical = models.ForeignKey(
+        CanonicalIngredient,
+        on_delete=models.PROTECT,
+        related_name="ingredients",
+        null=True,
+        editable=False,
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Name and canonical ingredient as loaded, to resolve it again on save
+        # only after renaming, without loading the canonical ingredient
+        if "name" in instance.__dict__ and "canonical_id" in instance.__dict__:
+            instance._loaded_canonical = (instance.name, instance.canonical_id)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Link the ingredient to the canonical one of its current name
+        loaded = getattr(self, "_loaded_canonical", None)
+        if self.canonical_id is None:
+            resolve = True
+        elif loaded is not None:
+            # Renamed without being linked to another canonical ingredient
+            name, canonical_id = loaded
+            resolve = self.canonical_id == canonical_id and normalize_ingredient_name(
+                self.name
+            ) != normalize_ingredient_name(name)
+        else:
+            # New with a canonical ingredient given, or loaded without these fields
+            resolve = not self._state.adding
+        if resolve:
+            self.canonical = CanonicalIngredient.resolve(self.name)
+        super().save(*args, **kwargs)
+        self._loaded_canonical = (self.name, self.canonical_id)
 
     def __str__(self):
         return self.name
@@ -189,6 +423,8 @@ class Tag(models.Model):
     recipes = models.ManyToManyField(Recipe, related_name="tags", blank=True)
     name = models.CharField(max_length=75, unique=True)
     slug = models.SlugField(editable=False, unique=True, primary_key=True)
+    # Denormalized number of recipes, kept in sync by signals
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ("name",)
@@ -201,3 +437,73 @@ class Tag(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class SimilarRecipe(models.Model):
+    """
+    Precomputed nearest neighbours of recipes, see recipes.similarity
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similar_recipes"
+    )
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ("-score",)
+        unique_together = (("recipe", "similar"),)
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar} ({self.score:.2f})"
+
+
+def update_tag_recipe_counts(tag_pks):
+    """
+    Recount recipes of the given tags with a single update
+    """
+    through = Tag.recipes.through
+    counts = (
+        through.objects.filter(tag=models.OuterRef("pk"))
+        .values("tag")
+        .annotate(count=models.Count("pk"))
+        .values("count")
+    )
+    Tag.objects.filter(pk__in=tag_pks).update(
+        recipe_count=Coalesce(models.Subquery(counts), 0)
+    )
+
+
+class ChangeSequence(models.Model):
+    """
+    Allocation of a change number, its id, see next_sequences
+    """
+
+    allocated = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class DeletedRecipe(models.Model):
+    """
+    Tombstone of a deleted recipe, listed by the change feed
+    """
+
+    id = models.UUIDField(primary_key=True)
+    sequence = models.BigIntegerField(unique=True)
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.sequence})"
+
+
+def next_sequences(count=1):
+    """
+    Allocate the given number of change numbers, return them in order.
+    Must be called in the transaction writing them, so their allocations
+    become visible with them, see changes.safe_horizon. Numbers come from
+    the id sequence of allocations, no row is locked, so transactions
+    numbering changes don't wait for each other
+    """
+    allocations = ChangeSequence.objects.bulk_create(
+        [ChangeSequence() for _ in range(count)]
+    )
+    return sorted(allocation.pk for allocation in allocations)
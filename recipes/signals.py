@@ -0,0 +1,140 @@
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, post_save
+from django.dispatch import receiver
+
+from . import changes, deletion, events, models, similarity
+
+
+@receiver(m2m_changed, sender=models.Tag.recipes.through)
+def update_tag_recipe_counts_on_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Recount recipes of tags whose recipes changed from either side of the relation
+    """
+    if reverse:
+        # Recipe's tags changed, remember them before they are cleared
+        if action == "pre_clear":
+            instance._cleared_tag_pks = list(instance.tags.values_list("pk", flat=True))
+            return
+        if action == "post_clear":
+            tag_pks = instance._cleared_tag_pks
+        elif action in ("post_add", "post_remove"):
+            tag_pks = pk_set
+        else:
+            return
+    else:
+        # Tag's recipes changed
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        tag_pks = [instance.pk]
+
+    models.update_tag_recipe_counts(tag_pks)
+
+
+@receiver(pre_delete, sender=models.Recipe)
+def remember_deleted_recipe_tags(sender, instance, **kwargs):
+    # Relations are deleted with the recipe without m2m_changed signal
+    instance._deleted_tag_pks = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=models.Recipe)
+def update_tag_recipe_counts_on_delete(sender, instance, **kwargs):
+    if instance._deleted_tag_pks:
+        models.update_tag_recipe_counts(instance._deleted_tag_pks)
+
+
+@receiver(post_save, sender=models.Ingredient)
+@receiver(post_delete, sender=models.Ingredient)
+def mark_similar_recipes_stale_on_ingredient_change(
+    sender, instance, origin=None, **kwargs
+):
+    # Neighbours of deleted recipes are deleted with them
+    if isinstance(origin, models.Recipe):
+        return
+    similarity.mark_stale([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=models.Tag.recipes.through)
+def remember_cleared_tag_recipes(sender, instance, action, reverse, **kwargs):
+    # Tag's recipes are cleared with pk_set None, receivers below use them
+    if action == "pre_clear" and not reverse:
+        instance._cleared_recipe_pks = list(instance.recipes.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=models.Tag.recipes.through)
+def mark_similar_recipes_stale_on_tags_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if reverse:
+        # Recipe's tags changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            similarity.mark_stale([instance.pk])
+        return
+
+    # Tag's recipes changed
+    if action == "post_clear":
+        similarity.mark_stale(instance._cleared_recipe_pks)
+    elif action in ("post_add", "post_remove"):
+        similarity.mark_stale(pk_set)
+
+
+@receiver(post_delete, sender=models.Image)
+def delete_image_file(sender, instance, **kwargs):
+    """
+    Files of deleted images are deleted by a background job once committed
+    """
+    deletion.delete_files_later(instance.url.field, [instance.url.name])
+
+
+@receiver(post_save, sender=models.Image)
+@receiver(post_delete, sender=models.Image)
+@receiver(post_save, sender=models.Ingredient)
+@receiver(post_delete, sender=models.Ingredient)
+@receiver(post_save, sender=models.Step)
+@receiver(post_delete, sender=models.Step)
+def record_recipe_change_on_child_change(sender, instance, origin=None, **kwargs):
+    # Deleted recipes leave tombstones instead
+    if isinstance(origin, models.Recipe):
+        return
+    changes.record_changes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=models.Tag.recipes.through)
+def record_recipe_changes_on_tags_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if reverse:
+        # Recipe's tags changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            changes.record_changes([instance.pk])
+        return
+
+    # Tag's recipes changed
+    if action == "post_clear":
+        changes.record_changes(instance._cleared_recipe_pks)
+    elif action in ("post_add", "post_remove"):
+        changes.record_changes(pk_set)
+
+
+@receiver(pre_delete, sender=models.Tag)
+def remember_deleted_tag_recipes(sender, instance, **kwargs):
+    # Relations are deleted with the tag without m2m_changed signal
+    instance._deleted_recipe_pks = list(instance.recipes.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=models.Tag)
+def record_recipe_changes_on_tag_delete(sender, instance, **kwargs):
+    changes.record_changes(instance._deleted_recipe_pks)
+
+
+@receiver(post_delete, sender=models.Recipe)
+def record_recipe_deletion(sender, instance, **kwargs):
+    changes.record_deletions([instance.pk], {instance.pk: instance.author_id})
+
+
+@receiver(post_save, sender=models.Recipe)
+def publish_recipe_change(sender, instance, **kwargs):
+    # Numbered by the recipe's save
+    events.publish_on_commit(
+        events.CHANGED, {instance.pk: instance.sequence}, {instance.pk: instance.author_id}
+    )
@@ -0,0 +1,296 @@
+"""
+Similar recipes, ranked by cosine similarity of TF-IDF weighted vectors
+of their canonical ingredients and tags.
+
+The neighbour table is rebuilt in batch with sparse matrices. Recipes whose
+ingredients or tags change are marked stale, and refreshed one by one
+by a background job, comparing them only with recipes sharing any feature.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from jobs.queue import enqueue
+from . import models
+
+
+def load_features(recipe_pks=None):
+    """
+    Map primary keys of recipes to sets of their features,
+    keys of canonical ingredients and tags prefixed by their kind
+    """
+    ingredients = models.Ingredient.objects.filter(canonical__isnull=False).values_list(
+        "recipe_id", "canonical_id"
+    )
+    tags = models.Tag.recipes.through.objects.values_list("recipe_id", "tag_id")
+    if recipe_pks is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_pks)
+        tags = tags.filter(recipe_id__in=recipe_pks)
+
+    features = defaultdict(set)
+    for recipe_pk, canonical_pk in ingredients.iterator():
+        features[recipe_pk].add(f"i:{canonical_pk}")
+    for recipe_pk, tag_pk in tags.iterator():
+        features[recipe_pk].add("t:" + tag_pk)
+    return features
+
+
+def max_document_frequency(total):
+    """
+    Number of recipes above which their shared feature is ignored
+    """
+    config = settings.SIMILAR_RECIPES
+    return max(config["MAX_FREQUENCY"] * total, config["MIN_IGNORED_FREQUENCY"])
+
+
+def idf(document_frequency, total):
+    """
+    Smoothed inverse document frequency, rare features weigh more
+    and the too common ones are ignored
+    """
+    if document_frequency > max_document_frequency(total):
+        return 0
+    return math.log((1 + total) / (1 + document_frequency)) + 1
+
+
+def compute_neighbours(features, neighbours, total=None, chunk_size=256):
+    """
+    Map every recipe to its most similar recipes with their scores, comparing
+    all recipes at once with sparse matrix products, a chunk of rows at a time
+    to bound the memory of the product
+    """
+    import numpy as np
+    from scipy import sparse
+
+    recipe_pks = list(features)
+    if total is None:
+        total = len(recipe_pks)
+
+    vocabulary = {}
+    rows, columns = [], []
+    for row, recipe_pk in enumerate(recipe_pks):
+        for feature in features[recipe_pk]:
+            rows.append(row)
+            columns.append(vocabulary.setdefault(feature, len(vocabulary)))
+
+    shape = (len(recipe_pks), len(vocabulary))
+    document_frequencies = np.bincount(columns, minlength=len(vocabulary))
+    weights = np.log((1 + total) / (1 + document_frequencies)) + 1
+    weights[document_frequencies > max_document_frequency(total)] = 0
+    values = weights[columns].astype(np.float32)
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=shape)
+    # Ignored features would only make the products denser
+    matrix.eliminate_zeros()
+
+    # Normalized rows make their dot products cosine similarities
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    matrix = sparse.diags(1 / np.maximum(norms, 1e-12)).dot(matrix).tocsr()
+    transposed = matrix.T.tocsr()
+
+    result = {}
+    for start in range(0, shape[0], chunk_size):
+        block = matrix[start : start + chunk_size].dot(transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            similar = block.indices[begin:end]
+            scores = block.data[begin:end]
+
+            other = similar != row
+            similar, scores = similar[other], scores[other]
+            if len(scores) > neighbours:
+                top = np.argpartition(-scores, neighbours)[:neighbours]
+                similar, scores = similar[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+
+            result[recipe_pks[row]] = [
+                (recipe_pks[column], float(score))
+                for column, score in zip(similar[order], scores[order])
+            ]
+    return result
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute the whole neighbour table
+    """
+    # Recipes changed during the computation are marked again
+    models.Recipe.objects.filter(similar_recipes_stale=True).update(
+        similar_recipes_stale=False
+    )
+    neighbours = compute_neighbours(
+        load_features(),
+        settings.SIMILAR_RECIPES["NEIGHBOURS"],
+        total=models.Recipe.objects.count(),
+    )
+    with transaction.atomic():
+        # Skip recipes deleted during the computation
+        existing = set(models.Recipe.objects.values_list("pk", flat=True))
+        rows = (
+            models.SimilarRecipe(recipe_id=recipe_pk, similar_id=similar_pk, score=score)
+            for recipe_pk, similar in neighbours.items()
+            if recipe_pk in existing
+            for similar_pk, score in similar
+            if similar_pk in existing
+        )
+        models.SimilarRecipe.objects.all().delete()
+        created = models.SimilarRecipe.objects.bulk_create(rows, batch_size=batch_size)
+    return len(created)
+
+
+def split_features(features):
+    """
+    Primary keys of canonical ingredients and tags of the features
+    """
+    canonical_pks = [int(feature[2:]) for feature in features if feature.startswith("i:")]
+    tag_pks = [feature[2:] for feature in features if feature.startswith("t:")]
+    return canonical_pks, tag_pks
+
+
+def find_candidates(recipe_pk, features, limit):
+    """
+    Primary keys of recipes sharing any feature with the recipe
+    """
+    canonical_pks, tag_pks = split_features(features)
+
+    candidates = set()
+    if canonical_pks:
+        candidates.update(
+            models.Ingredient.objects.filter(canonical_id__in=canonical_pks)
+            .exclude(recipe_id=recipe_pk)
+            .values_list("recipe_id", flat=True)
+            .distinct()[:limit]
+        )
+    if tag_pks and len(candidates) < limit:
+        candidates.update(
+            models.Tag.recipes.through.objects.filter(tag_id__in=tag_pks)
+            .exclude(recipe_id=recipe_pk)
+            .values_list("recipe_id", flat=True)
+            .distinct()[: limit - len(candidates)]
+        )
+    return candidates
+
+
+def document_frequencies(features):
+    """
+    Number of recipes having each of the features
+    """
+    canonical_pks, tag_pks = split_features(features)
+
+    frequencies = {}
+    ingredients = (
+        models.Ingredient.objects.filter(canonical_id__in=canonical_pks)
+        .values("canonical_id")
+        .annotate(count=Count("recipe", distinct=True))
+        .values_list("canonical_id", "count")
+    )
+    for canonical_pk, count in ingredients:
+        frequencies[f"i:{canonical_pk}"] = count
+    tags = models.Tag.objects.filter(pk__in=tag_pks).values_list("pk", "recipe_count")
+    for tag_pk, count in tags:
+        frequencies["t:" + tag_pk] = count
+    return frequencies
+
+
+def refresh_recipe(recipe_pk):
+    """
+    Recompute neighbours of the recipe, and its place among neighbours of
+    recipes it was compared with. Lists of other recipes may get longer than
+    the configured number of neighbours until the next rebuild
+    """
+    config = settings.SIMILAR_RECIPES
+    features = load_features([recipe_pk]).get(recipe_pk, set())
+    if not features:
+        # Nothing to compare, e.g. the recipe was deleted
+        models.SimilarRecipe.objects.filter(
+            Q(recipe_id=recipe_pk) | Q(similar_id=recipe_pk)
+        ).delete()
+        return
+
+    total = models.Recipe.objects.count()
+    frequencies = document_frequencies(features)
+    # Recipes sharing only ignored features have nothing in common
+    candidates = find_candidates(
+        recipe_pk,
+        [feature for feature in features if idf(frequencies.get(feature, 1), total)],
+        config["CANDIDATES"],
+    )
+    candidate_features = load_features(candidates)
+
+    all_features = set(features).union(*candidate_features.values())
+    frequencies.update(document_frequencies(all_features - set(frequencies)))
+    weights = {
+        feature: idf(frequencies.get(feature, 1), total) for feature in all_features
+    }
+
+    def norm(vector):
+        return math.sqrt(sum(weights[feature] ** 2 for feature in vector))
+
+    recipe_norm = norm(features)
+    scores = []
+    for candidate_pk, vector in candidate_features.items():
+        dot = sum(weights[feature] ** 2 for feature in features & vector)
+        if dot:
+            scores.append((dot / (recipe_norm * norm(vector)), candidate_pk))
+    scores.sort(key=lambda item: item[0], reverse=True)
+
+    with transaction.atomic():
+        # Scores of the recipe in lists of other recipes are stale as well
+        models.SimilarRecipe.objects.filter(
+            Q(recipe_id=recipe_pk) | Q(similar_id=recipe_pk)
+        ).delete()
+        rows = [
+            models.SimilarRecipe(recipe_id=recipe_pk, similar_id=similar_pk, score=score)
+            for score, similar_pk in scores[: config["NEIGHBOURS"]]
+        ]
+
+        # Join lists of other recipes which aren't full or have a worse neighbour
+        lists = (
+            models.SimilarRecipe.objects.filter(recipe_id__in=candidate_features)
+            .values("recipe_id")
+            .annotate(count=Count("pk"), lowest=Min("score"))
+            .values_list("recipe_id", "count", "lowest")
+        )
+        lists = {recipe_id: (count, lowest) for recipe_id, count, lowest in lists}
+        for score, candidate_pk in scores:
+            count, lowest = lists.get(candidate_pk, (0, 0))
+            if count < config["NEIGHBOURS"] or score > lowest:
+                rows.append(
+                    models.SimilarRecipe(
+                        recipe_id=candidate_pk, similar_id=recipe_pk, score=score
+                    )
+                )
+        models.SimilarRecipe.objects.bulk_create(rows)
+
+
+def mark_stale(recipe_pks):
+    """
+    Mark the recipes stale, and queue a refresh unless one is waiting already
+    """
+    if not recipe_pks:
+        return
+    models.Recipe.objects.filter(pk__in=recipe_pks).update(similar_recipes_stale=True)
+    enqueue(
+        "recipes.tasks.refresh_similar_recipes",
+        key="refresh-similar-recipes",
+        delay=settings.SIMILAR_RECIPES["REFRESH_DELAY"],
+    )
+
+
+def refresh_stale(limit=None):
+    """
+    Refresh neighbours of recipes marked stale, return their number
+    """
+    recipe_pks = models.Recipe.objects.filter(similar_recipes_stale=True).values_list(
+        "pk", flat=True
+    )[:limit]
+    refreshed = 0
+    for recipe_pk in list(recipe_pks):
+        # Unmarked first, so changes made during the refresh mark it again
+        models.Recipe.objects.filter(pk=recipe_pk).update(similar_recipes_stale=False)
+        refresh_recipe(recipe_pk)
+        refreshed += 1
+    return refreshed
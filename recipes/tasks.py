@@ -0,0 +1,36 @@
+import logging
+
+from django.apps import apps
+
+from jobs.queue import task
+from . import changes, similarity, trending
+
+logger = logging.getLogger(__name__)
+
+
+@task()
+def delete_files(model, field, names):
+    """
+    Delete files of the model's file field from its storage
+    """
+    storage = apps.get_model(model)._meta.get_field(field).storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.exception("Couldn't delete %s", name)
+
+
+@task()
+def refresh_similar_recipes():
+    similarity.refresh_stale()
+
+
+@task()
+def decay_trending():
+    trending.decay()
+
+
+@task()
+def prune_change_allocations():
+    changes.prune_allocations()
@@ -1,11 +1,72 @@
-from django.test import TestCase
+from django.test import AsyncRequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Recipe, Image, Ingredient, Step, Tag
+from django.urls import reverse
+from unittest import mock
+import asyncio
+import threading
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from api.recipes.views import AsyncIngredientListView, RecipeEventsView
+from api.schema import generate_schema
+from django.conf import settings
+from users.models import Profile, FavouriteRecipes
+from users.stats import author_stats, author_stats_key
+from django.core.cache import cache
+from . import changes, deletion, events, models, similarity, trending, units
+from .models import (
+    Recipe,
+    Image,
+    Ingredient,
+    Step,
+    Tag,
+    SimilarRecipe,
+    CanonicalIngredient,
+    IngredientAlias,
+    resolve_canonical_ingredients,
+)
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 import os
+import tempfile
+import uuid
+import time
+from pathlib import Path
+from api.profiling import (
+    RequestTimings,
+    current_timings,
+    histograms,
+    install_instrumentation,
+)
+from api.cache import TieredCache
+from django.db import transaction
+from jobs.models import Job
+from jobs.worker import run_pending
+from api import compression
+from api.middleware import CompressionMiddleware
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from decimal import Decimal
+from datetime import timedelta
+import gzip
+import json
+import unittest
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
+
+# Tests shouldn't depend on a running memcached server
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class RecipeTestCase(TestCase):
     def setUp(self):
         self.user = User.objects.create(username="dawid")
@@ -90,3 +151,1114 @@ class RecipeTestCase(TestCase):
                     except OSError:
                         break  # Stop if the directory is not empty
                     directory = os.path.dirname(directory)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeRetrieveTestCase(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="dawid")
+        self.reader = User.objects.create(username="reader")
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            title="Creamy Vegan Pasta",
+            body="This creamy vegan pasta is my favorite recipe to make when!",
+        )
+        self.recipe.tags.add(Tag.objects.create(name="dinner"))
+        self.url = reverse(
+            "recipe-detail", kwargs={"slug": self.recipe.slug, "id": self.recipe.id}
+        )
+
+    def test_retrieve_queries(self):
+        # Recipe with author, views update and tags
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["views"], 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.views, 1)
+
+    def test_retrieve_by_author_does_not_count_view(self):
+        self.client.force_authenticate(self.author)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["views"], 0)
+
+    def test_retrieve_by_other_user_counts_view(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["views"], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfilingMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        histograms.reset()
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        self.recipe = Recipe.objects.create(
+            author=self.admin, title="Creamy Vegan Pasta", body="Pasta"
+        )
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_profiled_request(self):
+        profiling = {
+            "ENABLED": True,
+            "SAMPLE_RATE": 1,
+            "OUTPUT_DIR": self.output_dir.name,
+        }
+        with override_settings(PROFILING=profiling):
+            self.client.get(
+                reverse(
+                    "recipe-detail",
+                    kwargs={"slug": self.recipe.slug, "id": self.recipe.id},
+                )
+            )
+            self.client.force_authenticate(self.admin)
+            response = self.client.get(reverse("metrics"))
+
+        metrics = response.data["recipe-detail"]
+        self.assertEqual(metrics["count"], 1)
+        self.assertEqual(metrics["queries"], 3)
+        self.assertEqual(metrics["wall_ms"]["buckets"]["+Inf"], 1)
+        self.assertGreater(metrics["serializer_ms"]["sum"], 0)
+
+        suffixes = sorted(path.suffix for path in Path(self.output_dir.name).iterdir())
+        self.assertIn(".collapsed", suffixes)
+        self.assertIn(".prof", suffixes)
+
+    @unittest.skipIf(httpx is None, "httpx isn't installed")
+    def test_async_http_timed(self):
+        install_instrumentation()
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"isVeganSafe": True})
+        )
+
+        async def check():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("http://vegan.test/")
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            async_to_sync(check)()
+        finally:
+            current_timings.reset(token)
+        self.assertEqual(timings.http_requests, 1)
+        self.assertGreater(timings.http_ms, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncIngredientListViewTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        Profile.objects.create(user=self.user, email_confirmed=True)
+        self.recipe = Recipe.objects.create(
+            author=self.user, title="Creamy Vegan Pasta", body="Pasta"
+        )
+        self.kwargs = {"recipe__slug": self.recipe.slug, "recipe__id": self.recipe.id}
+        self.view = AsyncIngredientListView.as_view()
+
+    def post(self, name, unit="cup"):
+        request = APIRequestFactory().post(
+            reverse("ingredient-list", kwargs=self.kwargs),
+            {"name": name, "quantity": 2, "unit": unit},
+            format="json",
+        )
+        force_authenticate(request, self.user)
+        return async_to_sync(self.view)(request, **self.kwargs)
+
+    @mock.patch("api.recipes.views.is_vegan_async", return_value=True)
+    def test_create(self, is_vegan_async):
+        response = self.post(" soy milk ")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "soy milk")
+        is_vegan_async.assert_awaited_once()
+        self.assertTrue(self.recipe.ingredients.filter(name="soy milk").exists())
+
+    @mock.patch("api.recipes.views.is_vegan_async", return_value=False)
+    def test_not_vegan(self, is_vegan_async):
+        response = self.post("honey")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["name"][0].code, "not_vegan_ingredient")
+
+    @mock.patch("api.recipes.views.is_vegan_async", return_value=True)
+    def test_invalid_without_vegan_check(self, is_vegan_async):
+        response = self.post("soy milk", unit="bucket")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("unit", response.data)
+        response = self.post("x" * 51)
+        self.assertEqual(response.status_code, 400)
+        # Invalid ingredients make no canonical rows or API requests
+        self.assertFalse(CanonicalIngredient.objects.exists())
+        is_vegan_async.assert_not_awaited()
+
+    def test_sync_handlers(self):
+        url = reverse("ingredient-list", kwargs=self.kwargs)
+        response = async_to_sync(self.view)(APIRequestFactory().options(url), **self.kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["name"], "Async Ingredient List")
+
+        request = APIRequestFactory().delete(url)
+        force_authenticate(request, self.user)
+        response = async_to_sync(self.view)(request, **self.kwargs)
+        self.assertEqual(response.status_code, 405)
+
+
+class SchemaTestCase(TestCase):
+    def test_schema_file_up_to_date(self):
+        self.assertEqual(
+            settings.SCHEMA_FILE.read_bytes().decode(),
+            generate_schema().decode(),
+            "The schema is out of date, run `python manage.py build_schema`",
+        )
+
+    def test_etag(self):
+        response = self.client.get(reverse("schema"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, settings.SCHEMA_FILE.read_bytes())
+
+        response = self.client.get(
+            reverse("schema"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse("schema"), {"format": "json"})
+        self.assertEqual(response.json()["info"]["title"], "Vegan Recipe API")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TagFacetsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.dinner = Tag.objects.create(name="dinner")
+        self.quick = Tag.objects.create(name="quick")
+        self.pasta = Recipe.objects.create(author=self.user, title="Pasta", body="-")
+        self.soup = Recipe.objects.create(author=self.user, title="Soup", body="-")
+        self.pasta.tags.add(self.dinner, self.quick)
+        self.dinner.recipes.add(self.soup)
+
+    def counts(self):
+        return dict(Tag.objects.values_list("slug", "recipe_count"))
+
+    def test_recipe_counts(self):
+        self.assertEqual(self.counts(), {"dinner": 2, "quick": 1})
+
+        self.pasta.tags.remove(self.quick)
+        self.assertEqual(self.counts(), {"dinner": 2, "quick": 0})
+
+        self.dinner.recipes.clear()
+        self.assertEqual(self.counts(), {"dinner": 0, "quick": 0})
+
+        self.soup.tags.set([self.dinner, self.quick])
+        self.soup.delete()
+        self.assertEqual(self.counts(), {"dinner": 0, "quick": 0})
+
+    def test_facets(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("recipe-facets"))
+        self.assertEqual(
+            response.data,
+            [
+                {"slug": "dinner", "name": "dinner", "count": 2},
+                {"slug": "quick", "name": "quick", "count": 1},
+            ],
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("recipe-facets"), {"search": "soup"})
+        self.assertEqual(response.data, [{"slug": "dinner", "name": "dinner", "count": 1}])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TrendingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.old = Recipe.objects.create(author=self.user, title="Old", body="-")
+        self.new = Recipe.objects.create(author=self.user, title="New", body="-")
+        self.quiet = Recipe.objects.create(author=self.user, title="Quiet", body="-")
+
+    def test_scores(self):
+        self.assertAlmostEqual(trending.current_score(trending.log_score(4)), 4)
+        # One view a half-life ago counts half
+        two_views = trending.log_score(2, time.time() - 24 * 3600)
+        self.assertAlmostEqual(trending.current_score(two_views), 1)
+
+    def test_events_update_ranking(self):
+        # Many views of the old recipe have decayed over two days
+        Recipe.objects.filter(pk=self.old.pk).update(
+            trending_score=trending.log_score(10, time.time() - 48 * 3600)
+        )
+        for _ in range(3):
+            self.client.get(
+                reverse("recipe-detail", kwargs={"slug": "new", "id": self.new.id})
+            )
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("recipe-trending"))
+        self.assertEqual([recipe["title"] for recipe in response.data], ["New", "Old"])
+        self.assertAlmostEqual(response.data[0]["trending_score"], 3, places=2)
+        self.assertAlmostEqual(response.data[1]["trending_score"], 2.5, places=2)
+
+        # A favourite outweighs the views
+        favourites = FavouriteRecipes.objects.create(owner=self.user)
+        favourites.recipes.add(self.old)
+        response = self.client.get(reverse("recipe-trending"), {"limit": 1})
+        self.assertEqual([recipe["title"] for recipe in response.data], ["Old"])
+
+    def test_decay(self):
+        Recipe.objects.filter(pk=self.old.pk).update(
+            trending_score=trending.log_score(1, time.time() - 48 * 3600)
+        )
+        Recipe.objects.filter(pk=self.new.pk).update(
+            trending_score=trending.log_score(1)
+        )
+        self.assertEqual(trending.decay(), 1)
+        self.assertEqual(
+            list(Recipe.objects.filter(trending_score__isnull=False)), [self.new]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SimilarRecipesTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.dinner = Tag.objects.create(name="dinner")
+        self.recipes = {}
+        for title, ingredients in (
+            ("Tofu Pasta", ["pasta", "tofu", "basil", "salt"]),
+            ("Basil Pasta", ["Pasta ", "basil", "salt"]),
+            ("Lentil Soup", ["lentils", "carrot", "salt"]),
+            ("Carrot Soup", ["carrot", "ginger", "salt"]),
+        ):
+            recipe = Recipe.objects.create(author=self.user, title=title, body="-")
+            for name in ingredients:
+                Ingredient.objects.create(recipe=recipe, name=name, quantity=1, unit="cup")
+            self.recipes[title] = recipe
+        self.dinner.recipes.add(self.recipes["Tofu Pasta"], self.recipes["Lentil Soup"])
+
+    def neighbours(self, title):
+        return [
+            (similar.similar.title, similar.score)
+            for similar in SimilarRecipe.objects.filter(recipe=self.recipes[title])
+        ]
+
+    def test_rebuild(self):
+        self.assertEqual(similarity.rebuild(), 12)
+        titles = [title for title, _ in self.neighbours("Basil Pasta")]
+        self.assertEqual(titles[0], "Tofu Pasta")
+
+        recipe = self.recipes["Tofu Pasta"]
+        url = reverse("recipe-similar", kwargs={"slug": recipe.slug, "id": recipe.id})
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(
+            [similar["recipe"]["title"] for similar in response.data],
+            ["Basil Pasta", "Lentil Soup", "Carrot Soup"],
+        )
+
+    def test_refresh_matches_rebuild(self):
+        similarity.rebuild()
+        rebuilt = self.neighbours("Lentil Soup")
+
+        SimilarRecipe.objects.all().delete()
+        similarity.refresh_recipe(self.recipes["Lentil Soup"].pk)
+        refreshed = self.neighbours("Lentil Soup")
+        self.assertEqual([title for title, _ in refreshed], [title for title, _ in rebuilt])
+        for (_, refreshed_score), (_, rebuilt_score) in zip(refreshed, rebuilt):
+            self.assertAlmostEqual(refreshed_score, rebuilt_score, places=5)
+
+        # The recipe joined neighbours of the recipes it was compared with
+        self.assertIn("Lentil Soup", dict(self.neighbours("Carrot Soup")))
+
+    def test_refreshed_after_ingredient_change(self):
+        similarity.rebuild()
+        Ingredient.objects.create(
+            recipe=self.recipes["Carrot Soup"], name="lentils", quantity=1, unit="cup"
+        )
+        self.assertEqual(similarity.refresh_stale(), 1)
+        self.assertEqual(self.neighbours("Carrot Soup")[0][0], "Lentil Soup")
+        self.assertEqual(
+            dict(self.neighbours("Lentil Soup"))["Carrot Soup"],
+            dict(self.neighbours("Carrot Soup"))["Lentil Soup"],
+        )
+
+    def test_stale_after_tag_cleared(self):
+        similarity.rebuild()
+        self.dinner.recipes.clear()
+        stale = Recipe.objects.filter(similar_recipes_stale=True)
+        self.assertEqual(
+            set(stale.values_list("title", flat=True)), {"Tofu Pasta", "Lentil Soup"}
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CanonicalIngredientTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        Profile.objects.create(user=self.user, email_confirmed=True)
+        self.recipe = Recipe.objects.create(author=self.user, title="Latte", body="-")
+        self.url = reverse(
+            "ingredient-list",
+            kwargs={"recipe__slug": self.recipe.slug, "recipe__id": self.recipe.id},
+        )
+
+    def test_spellings_share_canonical_ingredient(self):
+        ingredients = [
+            Ingredient.objects.create(recipe=self.recipe, name=name)
+            for name in ("soy milk", "Soy Milk", "soymilk", "soy-milk ")
+        ]
+        self.assertEqual(len({ingredient.canonical_id for ingredient in ingredients}), 1)
+        self.assertEqual(ingredients[0].canonical.name, "soy milk")
+
+        IngredientAlias.objects.create(key="Soya Milk", canonical=ingredients[0].canonical)
+        soya = Ingredient.objects.create(recipe=self.recipe, name="soya milk")
+        self.assertEqual(soya.canonical_id, ingredients[0].canonical_id)
+
+        self.assertEqual(
+            resolve_canonical_ingredients(["SOY MILK", "soya milk", "oat milk"]),
+            {
+                "SOY MILK": soya.canonical_id,
+                "soya milk": soya.canonical_id,
+                "oat milk": CanonicalIngredient.objects.get(key="oatmilk").pk,
+            },
+        )
+
+    def test_filter_by_any_spelling(self):
+        Ingredient.objects.create(recipe=self.recipe, name="Soy Milk")
+        Ingredient.objects.create(recipe=self.recipe, name="soymilk")
+        other = Recipe.objects.create(author=self.user, title="Tea", body="-")
+        Ingredient.objects.create(recipe=other, name="oat milk")
+
+        response = self.client.get(reverse("recipe-list"), {"ingredients__name": "soy milk"})
+        self.assertEqual([recipe["title"] for recipe in response.data], ["Latte"])
+
+    def test_resolved_after_renaming(self):
+        created = Ingredient.objects.create(recipe=self.recipe, name="soya milk")
+        IngredientAlias.objects.create(key="soymilk", canonical=created.canonical)
+        ingredient = Ingredient.objects.get(pk=created.pk)
+        ingredient.name = "Soya Milk"
+        ingredient.quantity = 2
+        # Same key, the canonical ingredient is neither loaded nor resolved
+        with self.assertNumQueries(7):
+            ingredient.save()
+        self.assertEqual(ingredient.canonical_id, created.canonical_id)
+
+        # Names of aliases resolve to the same canonical ingredient
+        ingredient.name = "soy milk"
+        ingredient.save()
+        self.assertEqual(ingredient.canonical_id, created.canonical_id)
+        ingredient.name = "oat milk"
+        ingredient.save()
+        self.assertEqual(ingredient.canonical.key, "oatmilk")
+
+    @mock.patch("api.recipes.serializers.is_vegan", return_value=True)
+    def test_vegan_verdict_cached(self, is_vegan):
+        self.client.force_authenticate(self.user)
+        for name in ("soy milk", "Soy Milk"):
+            response = self.client.post(self.url, {"name": name}, format="json")
+            self.assertEqual(response.status_code, 201)
+        is_vegan.assert_called_once_with("soy milk")
+        self.assertTrue(CanonicalIngredient.objects.get(key="soymilk").vegan)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UnitsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.pancakes = Recipe.objects.create(
+            author=self.user, title="Pancakes", body="-", servings=4
+        )
+        self.porridge = Recipe.objects.create(
+            author=self.user, title="Porridge", body="-", servings=1
+        )
+        for recipe, name, quantity, unit in (
+            (self.pancakes, "flour", 0.5, "kg"),
+            (self.pancakes, "soy milk", 2, "cup"),
+            (self.pancakes, "salt", None, None),
+            (self.porridge, "oats", 50, "g"),
+            (self.porridge, "Soy Milk", 250, "ml"),
+        ):
+            Ingredient.objects.create(recipe=recipe, name=name, quantity=quantity, unit=unit)
+
+    def test_conversion(self):
+        quantities, dimensions = units.to_base([1, 2, 1, None], ["kg", "tbsp", "lb", "g"])
+        self.assertEqual(quantities[0], 1000)
+        self.assertAlmostEqual(quantities[1], 29.5735, places=4)
+        self.assertAlmostEqual(quantities[2], 453.59237)
+        self.assertEqual(units.as_list(quantities[3:]), [None])
+        self.assertEqual(dimensions.tolist(), [units.MASS, units.VOLUME, units.MASS, units.MASS])
+
+        # Masses and volumes are summed apart, larger units are readable
+        keys, totals, total_units = units.aggregate(
+            [1, 1, 1, 2], [600, 0.5, 1, 3], ["g", "kg", "cup", None], [1, 1, 1, 2]
+        )
+        self.assertEqual(keys.tolist(), [1, 1, 2])
+        self.assertEqual(units.as_list(totals), [1.1, 236.588, 6])
+        self.assertEqual(total_units.tolist(), ["kg", "ml", None])
+
+    def test_scaled(self):
+        url = reverse(
+            "recipe-scaled",
+            kwargs={"slug": self.pancakes.slug, "id": self.pancakes.id},
+        )
+        response = self.client.get(url, {"servings": 2})
+        self.assertEqual(response.data["servings"], 2)
+        self.assertEqual(
+            sorted((item["name"], item["quantity"], item["unit"]) for item in response.data["ingredients"]),
+            [("flour", 0.25, "kg"), ("salt", None, None), ("soy milk", 1, "cup")],
+        )
+        self.assertEqual(self.client.get(url, {"servings": 0}).status_code, 400)
+
+    def test_shopping_list(self):
+        recipes = [
+            reverse("recipe-detail", kwargs={"slug": recipe.slug, "id": recipe.id})
+            for recipe in (self.pancakes, self.porridge, self.porridge)
+        ]
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("recipe-shopping-list"),
+                {"recipes": recipes, "servings": [8, 1, 1]},
+                format="json",
+            )
+        self.assertEqual(
+            response.data,
+            [
+                {"name": "flour", "quantity": 1, "unit": "kg"},
+                {"name": "oats", "quantity": 100, "unit": "g"},
+                {"name": "salt", "quantity": None, "unit": None},
+                {"name": "soy milk", "quantity": 1.45, "unit": "l"},
+            ],
+        )
+
+        response = self.client.post(
+            reverse("recipe-shopping-list"),
+            {"recipes": recipes, "servings": [1]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkDeleteTestCase(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create(username="dawid")
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        self.tag = Tag.objects.create(name="dinner")
+        self.recipes = []
+        for i in range(4):
+            recipe = Recipe.objects.create(author=self.user, title=f"Recipe {i}", body="-")
+            Image.objects.create(
+                recipe=recipe,
+                url=SimpleUploadedFile(f"image{i}.jpg", b"image", content_type="image/jpeg"),
+            )
+            Ingredient.objects.create(recipe=recipe, name="salt", quantity=1, unit="g")
+            Step.objects.create(recipe=recipe, instruction="Mix.")
+            self.recipes.append(recipe)
+        self.tag.recipes.add(*self.recipes)
+        SimilarRecipe.objects.create(recipe=self.recipes[3], similar=self.recipes[0], score=1)
+        self.favourites = FavouriteRecipes.objects.create(owner=self.user)
+        self.favourites.recipes.add(*self.recipes)
+        Recipe.objects.update(similar_recipes_stale=False)
+
+    def file_paths(self, recipes):
+        return [
+            image.url.path for image in Image.objects.filter(recipe__in=recipes)
+        ]
+
+    def wait_for_cleanup(self):
+        run_pending()
+
+    def test_delete_recipes(self):
+        paths = self.file_paths(self.recipes[:3])
+        with self.captureOnCommitCallbacks(execute=True):
+            # Queries depend on the number of chunks, not of recipes or related rows
+            with self.assertNumQueries(40):
+                deleted = deletion.delete_recipes(
+                    [recipe.pk for recipe in self.recipes[:3]], chunk_size=2
+                )
+        self.wait_for_cleanup()
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(list(Recipe.objects.all()), [self.recipes[3]])
+        self.assertEqual(Image.objects.count(), 1)
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(Step.objects.count(), 1)
+        self.assertFalse(SimilarRecipe.objects.exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertTrue(all(os.path.exists(path) for path in self.file_paths(self.recipes)))
+
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 1)
+        self.assertEqual(list(self.favourites.recipes.all()), [self.recipes[3]])
+        # The recipe lost its neighbour
+        self.recipes[3].refresh_from_db()
+        self.assertTrue(self.recipes[3].similar_recipes_stale)
+
+    def test_files_kept_on_rollback(self):
+        paths = self.file_paths(self.recipes)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                deletion.delete_recipes([recipe.pk for recipe in self.recipes])
+                raise RuntimeError()
+        # The job was rolled back with the deletion
+        self.assertFalse(Job.objects.filter(name="recipes.tasks.delete_files").exists())
+        self.wait_for_cleanup()
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+    def test_image_file_deleted_with_image(self):
+        image = Image.objects.get(recipe=self.recipes[0])
+        path = image.url.path
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.wait_for_cleanup()
+        self.assertFalse(os.path.exists(path))
+
+    def test_bulk_delete_endpoint(self):
+        url = reverse("recipe-bulk-delete")
+        data = {
+            "recipes": [
+                reverse("recipe-detail", kwargs={"slug": recipe.slug, "id": recipe.id})
+                for recipe in self.recipes[:2]
+            ]
+        }
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(url, data).status_code, 403)
+
+        author_stats(self.user.username)
+        self.assertIsNotNone(cache.get(author_stats_key(self.user.username)))
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.wait_for_cleanup()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"deleted": 2})
+        self.assertEqual(Recipe.objects.count(), 2)
+        # Stats of the author are forgotten without the post_delete signal
+        self.assertIsNone(cache.get(author_stats_key(self.user.username)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ChangeFeedTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.tag = Tag.objects.create(name="dinner")
+        self.recipes = []
+        for title in ("Tofu Pasta", "Lentil Soup", "Carrot Soup"):
+            recipe = Recipe.objects.create(author=self.user, title=title, body="-")
+            Ingredient.objects.create(recipe=recipe, name="salt", quantity=1, unit="g")
+            Step.objects.create(recipe=recipe, instruction="Mix.")
+            self.recipes.append(recipe)
+        self.tag.recipes.add(self.recipes[0])
+        self.url = reverse("recipe-changes")
+
+    def feed(self, since, **params):
+        return self.client.get(self.url, {"since": since, **params}).data
+
+    def test_sync_from_start(self):
+        # Queries don't depend on the number of changes
+        with self.assertNumQueries(9):
+            feed = self.feed(0)
+        self.assertEqual(
+            [recipe["title"] for recipe in feed["changed"]],
+            ["Lentil Soup", "Carrot Soup", "Tofu Pasta"],
+        )
+        self.assertEqual(feed["changed"][2]["tags"], ["dinner"])
+        self.assertEqual(feed["changed"][2]["ingredients"][0]["name"], "salt")
+        self.assertEqual(feed["changed"][2]["steps"][0]["instruction"], "Mix.")
+        self.assertIsNone(feed["next"])
+
+        # Nothing changed since
+        feed = self.feed(feed["cursor"])
+        self.assertEqual(feed["changed"], [])
+        self.assertEqual(feed["deleted"], [])
+
+    def test_deltas(self):
+        cursor = self.feed(0)["cursor"]
+
+        Ingredient.objects.filter(recipe=self.recipes[1]).get().delete()
+        deletion.delete_recipes([self.recipes[2].pk])
+        self.tag.recipes.clear()
+
+        feed = self.feed(cursor)
+        self.assertEqual(
+            [recipe["title"] for recipe in feed["changed"]], ["Lentil Soup", "Tofu Pasta"]
+        )
+        self.assertEqual(feed["changed"][0]["ingredients"], [])
+        self.assertEqual(feed["changed"][1]["tags"], [])
+        self.assertEqual([str(recipe["id"]) for recipe in feed["deleted"]], [str(self.recipes[2].pk)])
+
+        # Deleted through the ORM too
+        cursor = feed["cursor"]
+        self.recipes[0].delete()
+        feed = self.feed(cursor)
+        self.assertEqual(feed["changed"], [])
+        self.assertEqual(len(feed["deleted"]), 1)
+
+    def test_pages(self):
+        changes.record_deletions([uuid.uuid4()])
+        seen = []
+        feed = self.feed(0, limit=2)
+        while True:
+            seen += [recipe["sequence"] for recipe in feed["changed"]]
+            seen += [recipe["sequence"] for recipe in feed["deleted"]]
+            if feed["next"] is None:
+                break
+            self.assertLessEqual(len(feed["changed"]) + len(feed["deleted"]), 2)
+            feed = self.client.get(feed["next"]).data
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_uncommitted_numbers(self):
+        cursor = self.feed(0)["cursor"]
+        # Allocated by a transaction in progress, not visible yet
+        [pending] = models.next_sequences()
+        models.ChangeSequence.objects.filter(pk=pending).delete()
+        Ingredient.objects.filter(recipe=self.recipes[1]).get().delete()
+
+        feed = self.feed(cursor)
+        self.assertEqual(feed["changed"], [])
+        self.assertEqual(feed["cursor"], cursor)
+
+        # Rolled back once the numbers after it are settled
+        timeout = settings.CHANGE_FEED["COMMIT_TIMEOUT"]
+        models.ChangeSequence.objects.update(
+            allocated=timezone.now() - timedelta(seconds=timeout + 1)
+        )
+        changes.prune_allocations()
+        self.assertEqual(models.ChangeSequence.objects.count(), 1)
+        feed = self.feed(cursor)
+        self.assertEqual(
+            [recipe["title"] for recipe in feed["changed"]], ["Lentil Soup"]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeEventsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.recipe = Recipe.objects.create(author=self.user, title="Tofu Pasta", body="-")
+        self.other = Recipe.objects.create(author=self.user, title="Lentil Soup", body="-")
+        # Streams of other tests don't leak into this one
+        self.broker = events.Broker()
+        patcher = mock.patch.object(events, "broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broker(self):
+        async def receive():
+            subscription = self.broker.subscribe(["recipe:1", "author:1"], max_size=2)
+            # Published from another thread, once for both topics
+            thread = threading.Thread(
+                target=self.broker.publish, args=(["recipe:1", "author:1"], {"event": "a"})
+            )
+            thread.start()
+            thread.join()
+            received = [await subscription.get(1)]
+
+            for name in "bcd":
+                self.broker.publish(["author:1"], {"event": name})
+            await asyncio.sleep(0)
+            received.append(await subscription.get(1))
+            self.broker.unsubscribe(subscription)
+            return received
+
+        received = async_to_sync(receive)()
+        self.assertEqual(received, [{"event": "a"}, events.OVERFLOW])
+        self.assertFalse(self.broker.has_subscribers())
+
+    def test_recipe_stream(self):
+        kwargs = {"slug": self.recipe.slug, "id": self.recipe.id}
+        request = AsyncRequestFactory().get(reverse("recipe-events", kwargs=kwargs))
+
+        def change_recipes():
+            with self.captureOnCommitCallbacks(execute=True):
+                Ingredient.objects.create(
+                    recipe=self.other, name="salt", quantity=1, unit="g"
+                )
+                Step.objects.create(recipe=self.recipe, instruction="Mix.")
+
+        async def read():
+            response = await RecipeEventsView.as_view()(request, **kwargs)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            await sync_to_async(change_recipes)()
+            chunk = await asyncio.wait_for(anext(chunks), 1)
+            await chunks.aclose()
+            return response, first, chunk
+
+        response, first, chunk = async_to_sync(read)()
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue(first.startswith(b"retry:"))
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            chunk.decode(),
+            f"id: {self.recipe.sequence}\nevent: changed\n"
+            f'data: {{"recipe": "{self.recipe.pk}", "sequence": {self.recipe.sequence}}}\n\n',
+        )
+        # Closed streams unsubscribe
+        self.assertFalse(self.broker.has_subscribers())
+
+    def test_blocking_stream_under_wsgi(self):
+        kwargs = {"slug": self.recipe.slug, "id": self.recipe.id}
+        request = APIRequestFactory().get(reverse("recipe-events", kwargs=kwargs))
+        response = async_to_sync(RecipeEventsView.as_view())(request, **kwargs)
+        self.assertFalse(response.is_async)
+
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b"retry:"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Step.objects.create(recipe=self.recipe, instruction="Mix.")
+        # Sent as it's published, not when the stream ends
+        self.assertIn(b"event: changed\n", next(chunks))
+        response.close()
+        self.assertFalse(self.broker.has_subscribers())
+
+    def test_nothing_published_without_subscribers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Step.objects.create(recipe=self.recipe, instruction="Mix.")
+        self.assertEqual(callbacks, [])
+
+
+def tiered_cache(**options):
+    """
+    Tiered cache in front of a local memory cache shared by all of them,
+    like memcached is shared by processes
+    """
+    options = {
+        "REMOTE_BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "VERSION_CHECK_INTERVAL": 0,
+        **options,
+    }
+    return TieredCache("tiered-cache-tests", {"OPTIONS": options})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTestCase(APITestCase):
+    def setUp(self):
+        self.cache = tiered_cache()
+        self.other = tiered_cache()
+        self.cache.clear()
+
+    def test_local_hits(self):
+        self.cache.set("key", {"value": 1})
+        self.assertEqual(self.other.get("key"), {"value": 1})
+        self.assertEqual(self.other.get("key"), {"value": 1})
+        self.assertIsNone(self.other.get("missing"))
+        self.assertIsNone(self.other.get("missing"))
+        stats = self.other.stats()
+        self.assertEqual(
+            (stats["remote_hits"], stats["local_hits"], stats["misses"]), (1, 1, 2)
+        )
+        self.assertEqual(self.cache.stats()["invalidations"], 0)
+
+    def test_version_invalidates_other_processes(self):
+        self.assertIsNone(self.other.get("key"))
+        self.cache.set("key", 1)
+        self.assertEqual(self.other.get("key"), 1)
+        self.cache.set("key", 2)
+        self.assertEqual(self.other.get("key"), 2)
+        self.cache.delete("key")
+        self.assertIsNone(self.other.get("key"))
+        self.assertEqual(self.other.stats()["invalidations"], 3)
+
+        # Atomic operations run in the shared cache
+        self.assertTrue(self.cache.add("counter", 0))
+        self.assertFalse(self.other.add("counter", 0))
+        self.assertEqual(self.other.incr("counter"), 1)
+        self.assertEqual(self.cache.incr("counter"), 2)
+
+    def test_add_keeps_other_local_tiers(self):
+        self.cache.set("key", 1)
+        self.assertEqual(self.cache.get("key"), 1)
+        self.assertEqual(self.other.get("key"), 1)
+        # Cache fills are served locally without invalidating other processes
+        self.assertTrue(self.cache.add("fill", 2))
+        self.assertEqual(self.cache.get("fill"), 2)
+        self.assertEqual(self.other.get("key"), 1)
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+        self.assertEqual(self.other.stats()["local_hits"], 1)
+
+    def test_bounded_local_tier(self):
+        cache = tiered_cache(LOCAL_MAX_ENTRIES=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        self.assertEqual(list(cache.local.entries), [":1:b", ":1:c"])
+        # Evicted values are still in the shared cache
+        self.assertEqual(cache.get("a"), "a")
+
+        cache = tiered_cache(LOCAL_MAX_BYTES=100)
+        cache.set("large", "x" * 200)
+        self.assertEqual(cache.stats()["local_bytes"], 0)
+        self.assertEqual(cache.get("large"), "x" * 200)
+
+    def test_local_tier_serves_while_shared_cache_unavailable(self):
+        cache = TieredCache(
+            "127.0.0.1:1",
+            {"OPTIONS": {"REMOTE_OPTIONS": {"connect_timeout": 0.1}}},
+        )
+        cache.set("key", "value", 60)
+        self.assertEqual(cache.get("key"), "value")
+        self.assertTrue(cache.add("counter", 0))
+        self.assertFalse(cache.add("counter", 0))
+        self.assertEqual(cache.incr("counter"), 1)
+        with self.assertRaises(ValueError):
+            cache.incr("missing")
+
+        stats = cache.stats()
+        self.assertEqual(stats["remote_errors"], 1)
+        self.assertFalse(stats["remote_available"])
+
+    def test_metrics(self):
+        caches = {
+            "default": {
+                "BACKEND": "api.cache.TieredCache",
+                "LOCATION": "tiered-cache-tests",
+                "OPTIONS": {"REMOTE_BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            }
+        }
+        admin = User.objects.create(username="admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        with self.settings(CACHES=caches):
+            response = self.client.get(reverse("cache-metrics"))
+        self.assertEqual(set(response.data), {"default"})
+        self.assertIn("local_hits", response.data["default"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseFormatTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        for number in range(5):
+            Recipe.objects.create(
+                author=self.user,
+                title=f"Creamy Vegan Pasta {number}",
+                body="This creamy vegan pasta is my favorite recipe to make. " * 10,
+            )
+        self.url = reverse("recipe-list")
+
+    def test_orjson_renders_like_drf(self):
+        data = {
+            "id": uuid.uuid4(),
+            "created": timezone.now(),
+            "price": Decimal("1.50"),
+            "nested": [{"title": "Pasta", "servings": 2}],
+        }
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            json.loads(response.content), json.loads(JSONRenderer().render(response.data))
+        )
+
+    def test_unavailable_renderer_not_offered(self):
+        with mock.patch.object(MessagePackRenderer, "available", False):
+            response = self.client.get(self.url, {"format": "msgpack"})
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+            self.assertEqual(response.status_code, 406)
+
+    @unittest.skipUnless(MessagePackRenderer.available, "msgpack isn't installed")
+    def test_msgpack(self):
+        import msgpack
+
+        response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            json.loads(JSONRenderer().render(response.data)),
+        )
+
+    def test_compression(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", response)
+
+        with self.settings(COMPRESSION={**settings.COMPRESSION, "MIN_SIZE": 10**6}):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_streaming_responses_not_compressed(self):
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(
+                iter(["data\n\n"] * 1000), content_type="text/event-stream"
+            )
+        )
+        request = APIRequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = middleware(request)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(b"".join(response), b"data\n\n" * 1000)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            compression.accepted_encodings("gzip;q=0.5, br , *;q=0"),
+            {"gzip": 0.5, "br": 1.0, "*": 0.0},
+        )
+        self.assertEqual(compression.choose_encoding("*"), compression.available_encodings()[0])
+        self.assertIsNone(compression.choose_encoding("identity"))
+        self.assertIsNone(compression.choose_encoding(""))
+        self.assertEqual(compression.choose_encoding("br, gzip", ("gzip",)), "gzip")
+
+    def test_compressed_length_varies(self):
+        # Random bytes in gzip headers hide the length of secrets from BREACH attacks
+        content = b"csrfmiddlewaretoken" * 100
+        compressed = [compression.compress(content, "gzip") for _ in range(5)]
+        self.assertGreater(len({len(data) for data in compressed}), 1)
+        self.assertTrue(all(gzip.decompress(data) == content for data in compressed))
+
+    def test_secrets_compressed_with_gzip(self):
+        response = HttpResponse("form " * 1000, content_type="text/html")
+        middleware = CompressionMiddleware(lambda request: response)
+        request = APIRequestFactory().get("/", HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertFalse(middleware.may_contain_secrets(request, response))
+
+        get_token(request)
+        self.assertTrue(middleware.may_contain_secrets(request, response))
+        with mock.patch.object(compression, "available_encodings", return_value=("br", "gzip")):
+            response = middleware(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OptimisticConcurrencyTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        Profile.objects.create(user=self.user, email_confirmed=True)
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            author=self.user, title="Creamy Vegan Pasta", body="Pasta"
+        )
+        self.url = reverse(
+            "recipe-detail", kwargs={"slug": self.recipe.slug, "id": self.recipe.id}
+        )
+        self.steps = [
+            Step.objects.create(recipe=self.recipe, instruction=f"Step {number}")
+            for number in range(1, 5)
+        ]
+
+    def step_url(self, step, name="step-detail"):
+        return reverse(
+            name,
+            kwargs={
+                "recipe__slug": self.recipe.slug,
+                "recipe__id": self.recipe.id,
+                "pk": step.pk,
+            },
+        )
+
+    def orders(self):
+        return list(
+            Step.objects.filter(recipe=self.recipe).values_list("instruction", "order")
+        )
+
+    def patch(self, body, version):
+        data = {"title": self.recipe.title, "body": body}
+        return self.client.patch(self.url, data, HTTP_IF_MATCH=version)
+
+    def test_if_match(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["ETag"], '"1"')
+
+        response = self.patch("Changed", '"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"2"')
+        self.assertEqual(response.data["version"], 2)
+
+        # Based on the version before the change
+        response = self.patch("Lost", '"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH='"1"').status_code, 412)
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.body, self.recipe.version), ("Changed", 2))
+
+        # Weak ETags of compressed responses and any version match as well
+        response = self.patch("Again", 'W/"2"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH="*").status_code, 204)
+
+    def test_write_of_stale_object_conflicts(self):
+        first = Recipe.objects.get(pk=self.recipe.pk)
+        second = Recipe.objects.get(pk=self.recipe.pk)
+        with transaction.atomic():
+            first.claim_version()
+            first.body = "First"
+            first.save()
+        with self.assertRaises(models.VersionConflict):
+            second.claim_version()
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).version, 2)
+
+    def test_change_order(self):
+        step = self.steps[3]
+        step.change_order(2)
+        self.assertEqual(
+            self.orders(), [("Step 1", 1), ("Step 4", 2), ("Step 2", 3), ("Step 3", 4)]
+        )
+        self.assertEqual((step.order, step.version), (2, 2))
+        # Shifted steps changed as well
+        self.assertEqual(Step.objects.get(pk=self.steps[1].pk).version, 2)
+        self.assertEqual(Step.objects.get(pk=self.steps[0].pk).version, 1)
+
+        # Orders read before the move are stale
+        with self.assertRaises(models.VersionConflict):
+            self.steps[2].change_order(1)
+        stale = Step.objects.get(pk=self.steps[0].pk)
+        Step.objects.get(pk=self.steps[1].pk).change_order(1)
+        with self.assertRaises(models.VersionConflict):
+            stale.change_order(4)
+        self.assertEqual(
+            self.orders(), [("Step 2", 1), ("Step 1", 2), ("Step 4", 3), ("Step 3", 4)]
+        )
+
+    def test_change_order_endpoint(self):
+        url = self.step_url(self.steps[0], "step-change-order")
+        response = self.client.post(url, {"order": 3}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"2"')
+
+        response = self.client.post(url, {"order": 1}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.post(url, {"order": 21}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"order": 5}).status_code, 400)
+        self.assertEqual(
+            self.orders(), [("Step 2", 1), ("Step 3", 2), ("Step 1", 3), ("Step 4", 4)]
+        )
+
+        response = self.client.patch(
+            self.step_url(self.steps[1]), {"instruction": "Boil"}, HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(response.status_code, 412)
+
+    def test_max_order(self):
+        for number in range(5, Step.MAX_ORDER + 1):
+            Step.objects.create(recipe=self.recipe, instruction=f"Step {number}")
+        url = reverse(
+            "step-list",
+            kwargs={"recipe__slug": self.recipe.slug, "recipe__id": self.recipe.id},
+        )
+        response = self.client.post(url, {"instruction": "One too many"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("order", response.data)
+        self.assertEqual(Step.objects.filter(recipe=self.recipe).count(), Step.MAX_ORDER)
+
+        # Orders past the limit saved before it was enforced don't block edits
+        legacy = Step.objects.filter(recipe=self.recipe).last()
+        Step.objects.filter(pk=legacy.pk).update(order=Step.MAX_ORDER + 5)
+        response = self.client.patch(self.step_url(legacy), {"instruction": "Boil"})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,66 @@
+"""
+Trending score of recipes, the sum of weights of their views and favourites,
+each decaying exponentially with the time passed since the event.
+
+Scores are stored as the logarithm of the sum scaled to the Unix epoch,
+log(sum(weight * exp(rate * event_time))). Scores scaled to the same moment
+rank recipes the same at any later time, so old scores never have to be
+rewritten to stay comparable, an event only adds its term atomically in the
+database, and the indexed column serves the top recipes without sorting.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from . import models
+
+
+def decay_rate():
+    return math.log(2) / (settings.TRENDING["HALF_LIFE_HOURS"] * 3600)
+
+
+def log_score(weight, timestamp=None):
+    """
+    Stored score of a single event with the given weight
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return decay_rate() * timestamp + math.log(weight)
+
+
+def current_score(stored_score, timestamp=None):
+    """
+    Decayed score at the given time, for display and thresholds
+    """
+    if stored_score is None:
+        return 0
+    if timestamp is None:
+        timestamp = time.time()
+    return math.exp(stored_score - decay_rate() * timestamp)
+
+
+def add_event_expression(weight):
+    """
+    Expression adding an event to the stored score,
+    log(exp(a) + exp(b)) computed without overflowing
+    """
+    event = Value(log_score(weight))
+    score = F("trending_score")
+    return Case(
+        When(trending_score__isnull=True, then=event),
+        default=Greatest(score, event) + Ln(1 + Exp(-Abs(score - event))),
+    )
+
+
+def decay(timestamp=None):
+    """
+    Drop recipes whose score decayed below the minimum from the ranking,
+    so the trending feed and its index only hold recently active recipes
+    """
+    threshold = log_score(settings.TRENDING["MIN_SCORE"], timestamp)
+    return models.Recipe.objects.filter(trending_score__lt=threshold).update(
+        trending_score=None
+    )
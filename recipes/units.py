@@ -0,0 +1,166 @@
+"""
+Conversion of ingredient quantities between units, computed over arrays
+of quantities at once.
+
+Quantities are normalized to a base unit of their dimension, grams for
+masses, milliliters for volumes and pieces for counts. Masses and volumes
+aren't converted into each other, that would need densities of ingredients.
+"""
+from collections import namedtuple
+
+from . import models
+
+
+Unit = namedtuple("Unit", ("dimension", "factor"))
+
+# Dimensions of quantities, ingredients without a unit have their own
+NO_DIMENSION, MASS, VOLUME, COUNT = range(4)
+BASE_UNITS = {NO_DIMENSION: None, MASS: "g", VOLUME: "ml", COUNT: "piece"}
+
+# Factors converting quantities to the base unit, volumes are US customary
+UNITS = {
+    "": Unit(NO_DIMENSION, 1),
+    "g": Unit(MASS, 1),
+    "kg": Unit(MASS, 1000),
+    "mg": Unit(MASS, 0.001),
+    "oz": Unit(MASS, 28.349523125),
+    "lb": Unit(MASS, 453.59237),
+    "ml": Unit(VOLUME, 1),
+    "l": Unit(VOLUME, 1000),
+    "cup": Unit(VOLUME, 236.5882365),
+    "tsp": Unit(VOLUME, 4.92892159375),
+    "tbsp": Unit(VOLUME, 14.78676478125),
+    "piece": Unit(COUNT, 1),
+}
+
+# Larger units base quantities are shown in, from this many base units
+READABLE_UNITS = {MASS: ("kg", 1000), VOLUME: ("l", 1000)}
+
+
+def unit_table(units):
+    """
+    Dimensions and factors of the units, as arrays aligned with them.
+    Only distinct units are looked up, missing units have no dimension
+    """
+    import numpy as np
+
+    units = np.asarray([unit or "" for unit in units], dtype=object)
+    distinct, inverse = np.unique(units, return_inverse=True)
+    known = [UNITS.get(unit, UNITS[""]) for unit in distinct]
+    dimensions = np.array([unit.dimension for unit in known], dtype=np.int64)
+    factors = np.array([unit.factor for unit in known], dtype=np.float64)
+    return dimensions[inverse], factors[inverse]
+
+
+def to_base(quantities, units):
+    """
+    Quantities in base units and their dimensions,
+    unknown quantities are NaN
+    """
+    import numpy as np
+
+    dimensions, factors = unit_table(units)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    return quantities * factors, dimensions
+
+
+def readable(quantities, dimensions):
+    """
+    Quantities in base units converted to larger units when they reach them,
+    and the names of their units
+    """
+    import numpy as np
+
+    quantities = np.asarray(quantities, dtype=np.float64)
+    dimensions = np.asarray(dimensions)
+    units = np.array([BASE_UNITS[dimension] for dimension in range(4)], dtype=object)
+    units = units[dimensions]
+    for dimension, (unit, factor) in READABLE_UNITS.items():
+        larger = (dimensions == dimension) & (quantities >= factor)
+        quantities = np.where(larger, quantities / factor, quantities)
+        units[larger] = unit
+    return quantities, units
+
+
+def aggregate(keys, quantities, units, factors=1):
+    """
+    Sum quantities of the same key and dimension, after multiplying them
+    by their factors, e.g. of scaling recipes to the needed servings.
+
+    Return arrays of keys, readable quantities, their units, one row per
+    key and dimension, ordered by them. Quantities of groups where none
+    of them is known are NaN
+    """
+    import numpy as np
+
+    keys = np.asarray(keys, dtype=np.int64)
+    base, dimensions = to_base(quantities, units)
+    base = base * factors
+
+    groups, inverse = np.unique(keys * len(BASE_UNITS) + dimensions, return_inverse=True)
+    known = ~np.isnan(base)
+    totals = np.bincount(inverse, weights=np.where(known, base, 0), minlength=len(groups))
+    counts = np.bincount(inverse, weights=known, minlength=len(groups))
+    totals[counts == 0] = np.nan
+
+    group_dimensions = groups % len(BASE_UNITS)
+    totals, group_units = readable(totals, group_dimensions)
+    return groups // len(BASE_UNITS), totals, group_units
+
+
+def as_list(quantities, digits=3):
+    """
+    Rounded quantities as floats, unknown ones as None
+    """
+    import numpy as np
+
+    quantities = np.round(np.asarray(quantities, dtype=np.float64), digits)
+    return [None if quantity != quantity else quantity for quantity in quantities.tolist()]
+
+
+def scale(quantities, factor):
+    """
+    Quantities in their own units multiplied by the factor,
+    e.g. of scaling a recipe to other servings
+    """
+    import numpy as np
+
+    return as_list(np.asarray(quantities, dtype=np.float64) * factor)
+
+
+def shopping_list(servings):
+    """
+    Quantities of canonical ingredients needed to cook the recipes,
+    given as a mapping of recipes to their needed servings,
+    in two queries whatever the number of recipes
+    """
+    import numpy as np
+
+    rows = list(
+        models.Ingredient.objects.filter(recipe__in=servings)
+        .order_by()
+        .values_list("recipe_id", "canonical_id", "quantity", "unit")
+    )
+    if not rows:
+        return []
+    recipe_pks, canonical_pks, quantities, units = zip(*rows)
+
+    # Factors are looked up once per recipe, not per ingredient
+    factors = {recipe.pk: needed / recipe.servings for recipe, needed in servings.items()}
+    distinct, inverse = np.unique(np.asarray(recipe_pks, dtype=object), return_inverse=True)
+    recipe_factors = np.array([factors[recipe_pk] for recipe_pk in distinct])[inverse]
+
+    canonical_pks, totals, total_units = aggregate(
+        canonical_pks, quantities, units, recipe_factors
+    )
+    names = dict(
+        models.CanonicalIngredient.objects.filter(pk__in=set(canonical_pks.tolist()))
+        .values_list("pk", "name")
+    )
+    items = [
+        {"name": names[canonical_pk], "quantity": quantity, "unit": unit}
+        for canonical_pk, quantity, unit in zip(
+            canonical_pks.tolist(), as_list(totals, 2), total_units.tolist()
+        )
+    ]
+    return sorted(items, key=lambda item: item["name"].lower())
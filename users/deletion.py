@@ -0,0 +1,63 @@
+"""
+Bulk deletion of users, in chunks with one transaction each.
+
+Recipes of deleted users are kept without an author. Favourites and profiles
+are deleted with one query per table and chunk, favourite counts are recounted
+once per chunk and avatars are deleted from the storage by a background job.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from api.authentication import revoke_user_claims
+from recipes import changes
+from recipes.deletion import CHUNK_SIZE, delete_files_later, raw_delete
+from recipes.models import Recipe
+from . import models
+
+
+def delete_users(user_pks, chunk_size=CHUNK_SIZE):
+    """
+    Delete the users with their profiles and favourites,
+    return the number of deleted users
+    """
+    user_pks = list(user_pks)
+    deleted = 0
+    for start in range(0, len(user_pks), chunk_size):
+        chunk = user_pks[start : start + chunk_size]
+        with transaction.atomic():
+            deleted += delete_users_chunk(chunk)
+    return deleted
+
+
+def delete_users_chunk(user_pks):
+    authored = Recipe.objects.filter(author_id__in=user_pks)
+    authored_pks = list(authored.order_by().values_list("pk", flat=True))
+    authored.update(author=None)
+    changes.record_changes(authored_pks)
+
+    favourites = models.FavouriteRecipes.objects.filter(owner_id__in=user_pks)
+    favourited = models.FavouriteRecipes.recipes.through.objects.filter(
+        favouriterecipes__in=favourites
+    )
+    recipe_pks = set(favourited.values_list("recipe_id", flat=True))
+    raw_delete(favourited)
+    raw_delete(favourites)
+    if recipe_pks:
+        models.update_recipe_favourite_counts(recipe_pks)
+
+    profiles = models.Profile.objects.filter(user_id__in=user_pks)
+    avatars = list(profiles.values_list("avatar", flat=True))
+    raw_delete(profiles)
+
+    # Remaining relations (admin log entries, groups, permissions) are small,
+    # the collector finds the ones deleted above empty
+    _, counts = User.objects.filter(pk__in=user_pks).delete()
+    delete_files_later(models.Profile._meta.get_field("avatar"), avatars)
+    # Claims of their tokens would keep authenticating safe requests
+    transaction.on_commit(lambda: revoke_claims(user_pks))
+    return counts.get(User._meta.label, 0)
+
+
+def revoke_claims(user_pks):
+    for user_pk in user_pks:
+        revoke_user_claims(user_pk)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.management.base import BaseCommand
+
+from api.users.passwords import build_breached_passwords
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the sorted list of breached passwords checked by the password "
+        "strength endpoints, from Django's common passwords by default"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sources",
+            nargs="*",
+            help="files with one password per line, plain or gzipped",
+        )
+        parser.add_argument(
+            "--output",
+            default=settings.BREACHED_PASSWORDS_PATH,
+            help="path of the list, BREACHED_PASSWORDS_PATH by default",
+        )
+
+    def handle(self, *args, **options):
+        sources = options["sources"] or [
+            CommonPasswordValidator().DEFAULT_PASSWORD_LIST_PATH
+        ]
+        count = build_breached_passwords(sources, options["output"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {count} passwords to {options['output']}")
+        )
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from recipes.models import Recipe
 
@@ -31,3 +32,20 @@ class FavouriteRecipes(models.Model):
 
     def __str__(self):
         return self.owner.username
+
+
+def update_recipe_favourite_counts(recipe_pks, **updates):
+    """
+    Recount users having the given recipes in favourites with a single update,
+    which also sets other given fields
+    """
+    through = FavouriteRecipes.recipes.through
+    counts = (
+        through.objects.filter(recipe=models.OuterRef("pk"))
+        .values("recipe")
+        .annotate(count=models.Count("pk"))
+        .values("count")
+    )
+    Recipe.objects.filter(pk__in=recipe_pks).update(
+        favourite_count=Coalesce(models.Subquery(counts), 0), **updates
+    )
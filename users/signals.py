@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, m2m_changed, pre_delete, post_delete
+from django.dispatch import receiver
+
+from api.authentication import revoke_user_claims
+from recipes import trending
+from recipes.models import Recipe
+from . import models
+from .stats import forget_author_stats
+
+
+@receiver(post_save, sender=User)
+def revoke_claims_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Username or staff status embedded in tokens could have changed
+    """
+    # Logging in only updates last login, which isn't a claim
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    revoke_user_claims(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_claims_on_user_delete(sender, instance, **kwargs):
+    """
+    Tokens of deleted users mustn't authenticate from their claims,
+    whichever way the user was deleted
+    """
+    revoke_user_claims(instance.pk)
+
+
+@receiver(post_save, sender=models.Profile)
+def revoke_claims_on_profile_change(sender, instance, **kwargs):
+    """
+    Email confirmation embedded in tokens could have changed
+    """
+    revoke_user_claims(instance.user_id)
+
+
+@receiver(m2m_changed, sender=models.FavouriteRecipes.recipes.through)
+def update_recipe_favourite_counts_on_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Recount favourites of recipes which were added to or removed from favourites
+    """
+    if reverse:
+        # Recipe's favourites changed
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        recipe_pks = [instance.pk]
+    else:
+        # User's favourites changed, remember them before they are cleared
+        if action == "pre_clear":
+            instance._cleared_recipe_pks = list(
+                instance.recipes.values_list("pk", flat=True)
+            )
+            return
+        if action == "post_clear":
+            recipe_pks = instance._cleared_recipe_pks
+        elif action in ("post_add", "post_remove"):
+            recipe_pks = pk_set
+        else:
+            return
+
+    if not recipe_pks:
+        return
+    updates = {}
+    if action == "post_add":
+        # Being added to favourites makes recipes trend
+        updates["trending_score"] = trending.add_event_expression(
+            settings.TRENDING["FAVOURITE_WEIGHT"]
+        )
+    models.update_recipe_favourite_counts(recipe_pks, **updates)
+
+
+@receiver(pre_delete, sender=models.FavouriteRecipes)
+def remember_deleted_favourite_recipes(sender, instance, **kwargs):
+    # Relations are deleted with the favourites (and their owner) without m2m_changed
+    instance._deleted_recipe_pks = list(instance.recipes.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=models.FavouriteRecipes)
+def update_recipe_favourite_counts_on_delete(sender, instance, **kwargs):
+    if instance._deleted_recipe_pks:
+        models.update_recipe_favourite_counts(instance._deleted_recipe_pks)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def forget_author_stats_on_recipe_change(sender, instance, **kwargs):
+    """
+    New, renamed or deleted recipes change the author's stats at once
+    """
+    if instance.author_id is not None:
+        forget_author_stats(instance.author.username)
@@ -0,0 +1,75 @@
+"""
+Aggregates of authors' recipes shown on their pages.
+
+Counts and sums are computed in one grouped query and the latest recipes
+in another. Results are cached for AUTHOR_STATS["TIMEOUT"] seconds and
+forgotten when the author's recipes are saved or deleted. Views counted
+in the meantime show up once they expire.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe
+
+
+def author_stats_key(username):
+    # Usernames may have characters memcached keys can't
+    return f"author-stats-{quote(username)}"
+
+
+def compute_author_stats(username):
+    stats = (
+        User.objects.filter(username=username)
+        .annotate(
+            recipe_count=Count("recipes"),
+            total_views=Coalesce(Sum("recipes__views"), 0),
+            total_favourites=Coalesce(Sum("recipes__favourite_count"), 0),
+            last_published=Max("recipes__created"),
+        )
+        .values(
+            "pk",
+            "username",
+            "recipe_count",
+            "total_views",
+            "total_favourites",
+            "last_published",
+        )
+        .first()
+    )
+    if stats is None:
+        return None
+
+    user_pk = stats.pop("pk")
+    recent_recipes = []
+    if stats["recipe_count"]:
+        recent_recipes = list(
+            Recipe.objects.filter(author_id=user_pk)
+            .only("slug", "id", "title", "created", "views", "favourite_count")
+            .order_by("-created")[: settings.AUTHOR_STATS["RECENT_RECIPES"]]
+        )
+    stats["recent_recipes"] = recent_recipes
+    return stats
+
+
+def author_stats(username):
+    """
+    Numbers of recipes of the author, their views and favourites,
+    and the latest recipes, None if the author doesn't exist
+    """
+    key = author_stats_key(username)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_author_stats(username)
+        if stats is not None:
+            # Filling the cache doesn't invalidate local tiers of other processes
+            cache.add(key, stats, settings.AUTHOR_STATS["TIMEOUT"])
+    return stats
+
+
+def forget_author_stats(username):
+    cache.delete(author_stats_key(username))
@@ -1 +1,612 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import uuid
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncRequestFactory, override_settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from api.authentication import ClaimsTokenUser, current_claims_digest, user_claims_key
+from api.users import passwords
+from api.users.tokens import confirm_email_token, reset_password_token
+from api.users.views import AsyncSendConfirmEmailView, AuthorEventsView
+from api.users.serializers import (
+    ClaimsTokenObtainPairSerializer,
+    FavouriteRecipesSerializer,
+)
+from jobs.worker import run_pending
+from recipes import events
+from recipes.deletion import delete_recipes
+from recipes.models import Recipe
+from recipes.tests import LOCMEM_CACHES
+from .deletion import delete_users
+from .models import Profile, FavouriteRecipes
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClaimsJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="dawid", email="dawid@example.com")
+        self.profile = Profile.objects.create(user=self.user)
+        FavouriteRecipes.objects.create(owner=self.user)
+        self.url = reverse("check-if-user-is-authenticated")
+
+    def authenticate(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return token
+
+    def test_claims(self):
+        token = self.authenticate()
+        self.assertEqual(token["username"], "dawid")
+        self.assertFalse(token["email_confirmed"])
+
+    def test_safe_method_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["detail"], "is_logged_in")
+        self.assertIsInstance(response.wsgi_request.user, ClaimsTokenUser)
+
+    def test_profile_change_revokes_claims(self):
+        self.authenticate()
+        self.profile.email_confirmed = True
+        self.profile.save()
+
+        # Stale claims, so the user is loaded from the database
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertIsInstance(response.wsgi_request.user, User)
+
+        # New token has fresh claims again
+        token = self.authenticate()
+        self.assertTrue(token["email_confirmed"])
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_claims_checked_without_cache(self):
+        self.authenticate()
+        # Changed without signals, and the cached claims were lost
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_has_current_claims(self):
+        refresh = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        self.profile.email_confirmed = True
+        self.profile.save()
+
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+        token = response.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsTokenUser)
+        self.assertTrue(response.wsgi_request.user.email_confirmed)
+
+    def test_user_delete_revokes_claims(self):
+        self.authenticate()
+        self.user.delete()
+
+        # Stale claims, so the deleted user isn't authenticated
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_owner_sees_private_fields(self):
+        self.authenticate()
+        response = self.client.get(
+            reverse("user-detail", kwargs={"username": self.user.username})
+        )
+        self.assertEqual(response.data["email"], "dawid@example.com")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenBucketThrottleTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = "/api/users/check-password-strength/"
+
+    @override_settings(
+        REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {"password_strength": "2/min"}}
+    )
+    def test_throttled_per_ip(self):
+        for _ in range(2):
+            with self.assertNumQueries(0):
+                response = self.client.post(self.url, {"password": "Passw0rd!"})
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(self.url, {"password": "Passw0rd!"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+        # Other clients have their own buckets
+        response = self.client.post(
+            self.url, {"password": "Passw0rd!"}, REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {}})
+    def test_not_throttled_without_rate(self):
+        for _ in range(5):
+            response = self.client.post(self.url, {"password": "Passw0rd!"})
+            self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PasswordStrengthTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        source = os.path.join(self.directory.name, "source.txt")
+        with open(source, "w") as file:
+            file.write("Password1!\nqwerty\n\nletmein\nzaq12wsx\n")
+
+        path = os.path.join(self.directory.name, "breached.txt")
+        self.assertEqual(passwords.build_breached_passwords([source], path), 4)
+        settings = override_settings(BREACHED_PASSWORDS_PATH=path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        passwords.breached_passwords.cache_clear()
+        self.addCleanup(passwords.breached_passwords.cache_clear)
+
+    def test_strength(self):
+        for password, strength in (
+            ("Tr0ub4dor&3", "Strong"),
+            ("Tr0ub4dor3", "Moderate"),
+            ("abcdefgh", "Moderate"),
+            ("aB", "Moderate"),
+            ("ab1", "Moderate"),
+            ("ab!", "Weak"),
+            ("ab١", "Moderate"),
+            # Breached passwords are weak whatever characters they have
+            ("password1!", "Weak"),
+            ("PASSWORD1!", "Weak"),
+        ):
+            with self.subTest(password=password):
+                self.assertEqual(passwords.evaluate_password(password)["strength"], strength)
+
+        self.assertGreater(
+            passwords.evaluate_password("Tr0ub4dor&3")["entropy"],
+            passwords.evaluate_password("Tr0ub4dor")["entropy"],
+        )
+
+    def test_breached_lookup(self):
+        breached = passwords.breached_passwords()
+        self.assertEqual(breached.count, 4)
+        for password in ("password1!", "qwerty", "letmein", "zaq12wsx"):
+            self.assertIn(password, breached)
+        for password in ("", "a", "password1", "qwertyu", "zzz", "letmei"):
+            self.assertNotIn(password, breached)
+
+    def test_empty_breached_list(self):
+        source = os.path.join(self.directory.name, "empty.txt")
+        with open(source, "w") as file:
+            file.write("\n")
+        path = os.path.join(self.directory.name, "empty-breached.txt")
+        self.assertEqual(passwords.build_breached_passwords([source], path), 0)
+
+        with self.settings(BREACHED_PASSWORDS_PATH=path):
+            passwords.breached_passwords.cache_clear()
+            self.assertIsNone(passwords.breached_passwords())
+            response = self.client.post(
+                "/api/users/check-password-strength/", {"password": "qwerty"}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_endpoints_without_queries(self):
+        user = User.objects.create(username="dawid")
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                "/api/users/check-password-strength/", {"password": "qwerty"}
+            )
+        self.assertEqual(
+            response.data, {"strength": "Weak", "entropy": 2.0, "breached": True}
+        )
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                reverse("check-passwords-strength"),
+                {"passwords": ["Tr0ub4dor&3", "letmein"]},
+                format="json",
+            )
+        self.assertEqual(
+            [strength["strength"] for strength in response.data], ["Strong", "Weak"]
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {}},
+)
+class SignedTokensTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="dawid", email="dawid@example.com", password="Old-passw0rd"
+        )
+        self.profile = Profile.objects.create(user=self.user)
+
+    def link_path(self):
+        # Messages are sent by a background job
+        run_pending()
+        return mail.outbox[-1].body.split("testserver")[-1]
+
+    def test_reset_password(self):
+        response = self.client.post(reverse("reset-password"), {"email": "dawid@example.com"})
+        self.assertEqual(response.status_code, 200)
+        path = self.link_path()
+
+        # Tokens are verified without the cache
+        cache.clear()
+        data = {"new_password": "New-passw0rd!", "repeat_new_password": "New-passw0rd!"}
+        response = self.client.post(path, data)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("New-passw0rd!"))
+
+        # The changed password used the token
+        response = self.client.post(path, data)
+        self.assertEqual(response.status_code, 404)
+
+    def test_confirm_email(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("send-mail-confirm-email"))
+        self.assertEqual(response.status_code, 200)
+        path = self.link_path()
+
+        cache.clear()
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.email_confirmed)
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_confirm_email_after_email_change(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse("send-mail-confirm-email"))
+        # Queued again only for another address
+        self.client.get(reverse("send-mail-confirm-email"))
+        self.user.email = "other@example.com"
+        self.user.save()
+        self.client.get(reverse("send-mail-confirm-email"))
+
+        run_pending()
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["dawid@example.com"], ["other@example.com"]],
+        )
+        # The link sent to the current address is valid
+        cache.clear()
+        response = self.client.get(mail.outbox[-1].body.split("testserver")[-1])
+        self.assertEqual(response.status_code, 200)
+
+    def test_confirm_email_deleted_user(self):
+        request = APIRequestFactory().get(reverse("send-mail-confirm-email"))
+        force_authenticate(request, self.user)
+        self.user.delete()
+        response = async_to_sync(AsyncSendConfirmEmailView.as_view())(request)
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_tokens(self):
+        token = confirm_email_token.make_token(self.user)
+        self.assertEqual(confirm_email_token.get_user(token), self.user)
+        # Tokens are valid only for their own link
+        self.assertIsNone(reset_password_token.get_user(token))
+        self.assertIsNone(confirm_email_token.get_user(token[:-1] + "x"))
+        self.assertIsNone(confirm_email_token.get_user("not-a-token"))
+
+        with mock.patch.object(confirm_email_token, "max_age", -1):
+            self.assertIsNone(confirm_email_token.get_user(token))
+
+        # Changing the email invalidates links sent to the old one
+        self.user.email = "other@example.com"
+        self.user.save()
+        self.assertIsNone(confirm_email_token.get_user(token))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FavouriteRecipesTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="dawid", email="dawid@example.com")
+        Profile.objects.create(user=self.user)
+        self.favourites = FavouriteRecipes.objects.create(owner=self.user)
+        self.recipes = [
+            Recipe.objects.create(author=self.user, title=f"Recipe {i}", body="Body")
+            for i in range(5)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def recipe_url(self, recipe):
+        return reverse(
+            "recipe-detail", kwargs={"slug": recipe.slug, "id": recipe.id}
+        )
+
+    def favourite_url(self, recipe, username="dawid"):
+        return reverse(
+            "favourite-recipe",
+            kwargs={"username": username, "slug": recipe.slug, "id": recipe.id},
+        )
+
+    def test_add_and_remove(self):
+        recipe = self.recipes[0]
+        with self.assertNumQueries(5):
+            response = self.client.post(self.favourite_url(recipe))
+        self.assertEqual(response.status_code, 201)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourite_count, 1)
+
+        # Adding it again doesn't count it twice
+        self.client.post(self.favourite_url(recipe))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourite_count, 1)
+
+        with self.assertNumQueries(3):
+            response = self.client.delete(self.favourite_url(recipe))
+        self.assertEqual(response.status_code, 204)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourite_count, 0)
+
+    def test_only_owner(self):
+        other = User.objects.create(username="other")
+        FavouriteRecipes.objects.create(owner=other)
+        response = self.client.post(self.favourite_url(self.recipes[0], "other"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_update_list_resolved_in_bulk(self):
+        url = reverse("favourite-recipes", kwargs={"username": "dawid"})
+        self.client.put(url, {"recipes": [self.recipe_url(self.recipes[0])]})
+
+        # Queries don't depend on the number of submitted recipes
+        with self.assertNumQueries(8):
+            response = self.client.put(
+                url, {"recipes": [self.recipe_url(recipe) for recipe in self.recipes]}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["recipes"]), 5)
+        counts = Recipe.objects.values_list("favourite_count", flat=True)
+        self.assertEqual(list(counts), [1] * 5)
+
+        missing = Recipe(slug="missing", id=uuid.uuid4())
+        response = self.client.put(url, {"recipes": [self.recipe_url(missing)]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["recipes"], ["Invalid hyperlink - Object does not exist."]
+        )
+
+    def test_bulk_resolution(self):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=self.user, title=f"Bulk {i}", slug=f"bulk-{i}", body="Body")
+            for i in range(200)
+        )
+        field = FavouriteRecipesSerializer(context={"request": None}).fields["recipes"]
+
+        urls = [self.recipe_url(recipe) for recipe in recipes]
+        with self.assertNumQueries(1):
+            resolved = field.to_internal_value(urls)
+        self.assertEqual(resolved, recipes)
+
+    def test_bulk_resolution_errors(self):
+        field = FavouriteRecipesSerializer(context={"request": None}).fields["recipes"]
+        valid = self.recipe_url(self.recipes[0])
+        outdated_slug = self.recipe_url(Recipe(slug="outdated", id=self.recipes[1].id))
+        missing = self.recipe_url(Recipe(slug="missing", id=uuid.uuid4()))
+        other_view = reverse("user-detail", kwargs={"username": "dawid"})
+
+        # The first error in the list is raised, as when resolving one by one
+        cases = [
+            ([valid, outdated_slug], "Invalid hyperlink - Object does not exist."),
+            ([valid, missing, other_view], "Invalid hyperlink - Object does not exist."),
+            ([valid, other_view, missing], "Invalid hyperlink - Incorrect URL match."),
+            ([valid, "/not-found/"], "Invalid hyperlink - No URL match."),
+            ([valid, 1], "Incorrect type. Expected URL string, received int."),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data):
+                with self.assertRaises(ValidationError) as context:
+                    field.to_internal_value(data)
+                self.assertEqual(context.exception.detail, [message])
+
+    def test_counts_follow_deleted_user(self):
+        other = User.objects.create(username="other")
+        favourites = FavouriteRecipes.objects.create(owner=other)
+        favourites.recipes.set(self.recipes[:2])
+        self.favourites.recipes.add(self.recipes[0])
+
+        other.delete()
+        counts = dict(Recipe.objects.values_list("title", "favourite_count"))
+        self.assertEqual(counts["Recipe 0"], 1)
+        self.assertEqual(counts["Recipe 1"], 0)
+
+        response = self.client.get(reverse("recipe-list"), {"ordering": "-favourite_count"})
+        self.assertEqual(response.data[0]["title"], "Recipe 0")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserDeletionTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        self.recipe = Recipe.objects.create(author=self.admin, title="Recipe", body="Body")
+        self.users = []
+        for username in ("dawid", "other", "third"):
+            user = User.objects.create(username=username)
+            Profile.objects.create(
+                user=user,
+                avatar=SimpleUploadedFile(f"{username}.jpg", b"image", content_type="image/jpeg"),
+            )
+            Recipe.objects.create(author=user, title=f"{username} recipe", body="Body")
+            FavouriteRecipes.objects.create(owner=user).recipes.add(self.recipe)
+            self.users.append(user)
+
+    def test_delete_users(self):
+        paths = [user.profile.avatar.path for user in self.users[:2]]
+        current_claims_digest(self.users[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Queries don't depend on the number of users or their favourites
+            with self.assertNumQueries(23):
+                deleted = delete_users([user.pk for user in self.users[:2]])
+        run_pending()
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            list(User.objects.values_list("username", flat=True)), ["admin", "third"]
+        )
+        # Recipes are kept without an author
+        self.assertEqual(Recipe.objects.filter(author=None).count(), 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favourite_count, 1)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertTrue(os.path.exists(self.users[2].profile.avatar.path))
+        self.assertIsNone(cache.get(user_claims_key(self.users[0].pk)))
+
+    def test_delete_account(self):
+        user = self.users[0]
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("user-detail", kwargs={"username": "dawid"}))
+        run_pending()
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(User.objects.filter(username="dawid").exists())
+        self.assertFalse(Profile.objects.filter(user_id=user.pk).exists())
+
+    def test_bulk_delete_endpoint(self):
+        url = reverse("user-bulk-delete")
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.post(url, {"usernames": ["other"]}).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(url, {"usernames": ["other", "missing"]})
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"usernames": ["other", "third"]})
+        run_pending()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"deleted": 2})
+        self.assertEqual(User.objects.count(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AuthorStatsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="dawid")
+        Profile.objects.create(user=self.user)
+        self.recipes = [
+            Recipe.objects.create(author=self.user, title=f"Recipe {i}", body="Body")
+            for i in range(25)
+        ]
+        Recipe.objects.filter(author=self.user).update(views=3, favourite_count=2)
+        self.url = reverse("author-stats", kwargs={"username": "dawid"})
+
+    def test_stats(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["recipe_count"], 25)
+        self.assertEqual(response.data["total_views"], 75)
+        self.assertEqual(response.data["total_favourites"], 50)
+        self.assertEqual(
+            [recipe["title"] for recipe in response.data["recent_recipes"]],
+            ["Recipe 24", "Recipe 23", "Recipe 22", "Recipe 21", "Recipe 20"],
+        )
+
+        # Cached
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data, response.data)
+
+        # Forgotten once a recipe is published
+        Recipe.objects.create(author=self.user, title="Recipe 25", body="Body")
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["recipe_count"], 26)
+
+    def test_without_recipes(self):
+        User.objects.create(username="other")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("author-stats", kwargs={"username": "other"}))
+        self.assertEqual(response.data["recipe_count"], 0)
+        self.assertEqual(response.data["total_views"], 0)
+        self.assertIsNone(response.data["last_published"])
+        self.assertEqual(response.data["recent_recipes"], [])
+
+    def test_options(self):
+        request = APIRequestFactory().options(reverse("author-events", kwargs={"username": "dawid"}))
+        response = async_to_sync(AuthorEventsView.as_view())(request, username="dawid")
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_author(self):
+        response = self.client.get(reverse("author-stats", kwargs={"username": "missing"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_user_recipes_paginated(self):
+        url = reverse("user-detail", kwargs={"username": "dawid"})
+        response = self.client.get(url)
+        recipes = response.data["recipes"]
+        self.assertEqual(recipes["count"], 25)
+        self.assertEqual(len(recipes["results"]), 20)
+        self.assertIsNone(recipes["previous"])
+        self.assertIn("recipes_page=2", recipes["next"])
+
+        response = self.client.get(recipes["next"])
+        recipes = response.data["recipes"]
+        self.assertEqual(len(recipes["results"]), 5)
+        self.assertIsNone(recipes["next"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AuthorEventsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="dawid")
+        self.recipe = Recipe.objects.create(author=self.user, title="Recipe", body="Body")
+        self.broker = events.Broker()
+        patcher = mock.patch.object(events, "broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_deleted_recipe(self):
+        request = AsyncRequestFactory().get(reverse("author-events", kwargs={"username": "dawid"}))
+        recipe_pk = self.recipe.pk
+
+        def delete_recipe():
+            with self.captureOnCommitCallbacks(execute=True):
+                delete_recipes([recipe_pk])
+
+        async def read():
+            response = await AuthorEventsView.as_view()(request, username="dawid")
+            chunks = aiter(response.streaming_content)
+            await anext(chunks)
+            await sync_to_async(delete_recipe)()
+            chunk = await asyncio.wait_for(anext(chunks), 1)
+            await chunks.aclose()
+            return chunk
+
+        chunk = async_to_sync(read)().decode()
+        self.assertIn("event: deleted\n", chunk)
+        self.assertIn(str(recipe_pk), chunk)
+
+    def test_missing_author(self):
+        request = APIRequestFactory().get(reverse("author-events", kwargs={"username": "missing"}))
+        response = async_to_sync(AuthorEventsView.as_view())(request, username="missing")
+        self.assertEqual(response.status_code, 404)
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vegan_recipes.settings')
+# Serve I/O-bound endpoints with async views, e.g.
+# uvicorn vegan_recipes.asgi:application
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
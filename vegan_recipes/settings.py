@@ -12,16 +12,18 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
-from dotenv import load_dotenv
 from datetime import timedelta
-from . import settings
-
-# Load environment variables
-load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables once per process, importing dotenv
+# only when there's a file to load
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / ".env")
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -49,9 +51,14 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "recipes",
     "users",
+    "jobs",
 ]
 
 MIDDLEWARE = [
+    # First, so the timings include the rest of the middleware
+    "api.middleware.ProfilingMiddleware",
+    # Compresses responses of all the middleware below
+    "api.middleware.CompressionMiddleware",
     "api.middleware.DRFTokenCookieMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -89,16 +96,28 @@ WSGI_APPLICATION = "vegan_recipes.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
 
 # Cache
 
+# Values are kept in a local tier of every process in front of memcached,
+# which serves alone while memcached is unavailable, see api.cache
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+        "BACKEND": "api.cache.TieredCache",
         "LOCATION": "127.0.0.1:11211",
+        "OPTIONS": {
+            "REMOTE_BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            # Fail fast, so requests don't wait for an unavailable memcached
+            "REMOTE_OPTIONS": {"connect_timeout": 0.1, "timeout": 0.5},
+            "LOCAL_MAX_ENTRIES": 10_000,
+            "LOCAL_MAX_BYTES": 16 * 2**20,
+            "LOCAL_TIMEOUT": 10,
+            "VERSION_CHECK_INTERVAL": 1,
+            "RETRY_INTERVAL": 5,
+        },
     }
 }
 
@@ -160,10 +179,27 @@ EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Resolves users of read-only requests from token claims without queries
+        "api.authentication.ClaimsJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        # Only offered when msgpack is installed
+        "api.renderers.MessagePackRenderer",
+    ),
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": "api.renderers.AvailableRenderersNegotiation",
+    # Token bucket rates by view throttle_scope, "_user" suffix for per user buckets
+    "DEFAULT_THROTTLE_RATES": {
+        "register": "10/hour",
+        "reset_password": "5/hour",
+        "reset_password_user": "5/hour",
+        "password_strength": "120/min",
+        "password_strength_user": "120/min",
+        "confirm_email_message_user": "5/hour",
+    },
 }
 
 LOGIN_REDIRECT_URL = "/api/users"
@@ -178,7 +214,7 @@ SIMPLE_JWT_TOKEN = {
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
-    "SIGNING_KEY": settings.SECRET_KEY,
+    "SIGNING_KEY": SECRET_KEY,
     "AUDIENCE": None,
     "ISSUER": None,
     "JSON_ENCODER": None,
@@ -194,6 +230,123 @@ SIMPLE_JWT_TOKEN = {
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
 }
 
+# VEGAN INGREDIENTS API
+
+VEGAN_API_URL = os.environ.get(
+    "VEGAN_API_URL", "https://is-vegan.netlify.app/.netlify/functions/api"
+)
+
+# ASYNC VIEWS
+
+# Route I/O-bound endpoints to async views, asgi.py sets ASYNC_VIEWS=1 by default
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS") == "1"
+
+# PROFILING
+
+PROFILING = {
+    "ENABLED": os.environ.get("PROFILING_ENABLED") == "1",
+    # Fraction of requests profiled with cProfile and the stack sampler
+    "SAMPLE_RATE": float(os.environ.get("PROFILING_SAMPLE_RATE", 0.01)),
+    "OUTPUT_DIR": BASE_DIR / "profiles",
+    # Seconds between stack samples of a profiled request
+    "STACK_SAMPLE_INTERVAL": 0.001,
+}
+
+# TRENDING RECIPES
+
+TRENDING = {
+    # Hours after which the weight of a view or a favourite halves
+    "HALF_LIFE_HOURS": float(os.environ.get("TRENDING_HALF_LIFE_HOURS", 24)),
+    "VIEW_WEIGHT": 1,
+    "FAVOURITE_WEIGHT": 5,
+    # Recipes whose decayed score falls below it are dropped by the decay pass
+    "MIN_SCORE": 0.5,
+}
+
+# SIMILAR RECIPES
+
+SIMILAR_RECIPES = {
+    # Neighbours stored and listed per recipe
+    "NEIGHBOURS": 10,
+    # Recipes sharing ingredients or tags compared when a single recipe changes
+    "CANDIDATES": 2000,
+    # Ingredients or tags of more than this fraction of recipes, like salt,
+    # tell little about similarity and are ignored, unless they are
+    # in less than MIN_IGNORED_FREQUENCY recipes
+    "MAX_FREQUENCY": 0.1,
+    "MIN_IGNORED_FREQUENCY": 100,
+    # Seconds a refresh of stale recipes waits, collecting changes made meanwhile
+    "REFRESH_DELAY": 10,
+}
+
+# RECIPE EVENTS
+
+RECIPE_EVENTS = {
+    # Seconds between comments keeping idle streams open through proxies
+    "KEEPALIVE": 15,
+    # Seconds after which streams end and clients reconnect
+    "MAX_DURATION": 300,
+    # Seconds clients wait before reconnecting
+    "RETRY": 1,
+    # Events queued for a slow client before it's told to resync
+    "QUEUE_SIZE": 100,
+}
+
+# CHANGE FEED
+
+CHANGE_FEED = {
+    # Seconds after which a change number missing from the feed is taken for
+    # rolled back, longer than any transaction numbering changes may take
+    "COMMIT_TIMEOUT": 300,
+}
+
+# BACKGROUND JOBS
+
+JOBS = {
+    # Seconds an idle worker waits before polling the queue again
+    "POLL_INTERVAL": 1,
+    # Seconds after which jobs of a worker which stopped are run by another one
+    "LEASE": 600,
+    "MAX_ATTEMPTS": 5,
+    # Seconds before the first retry of a failed job, doubled with every next one
+    "RETRY_DELAY": 10,
+    # Seconds between runs of tasks queued by workers themselves, by task name
+    "PERIODIC": {
+        "recipes.tasks.decay_trending": 3600,
+        "jobs.tasks.prune_jobs": 24 * 3600,
+        "recipes.tasks.prune_change_allocations": 600,
+    },
+    # Days finished jobs are kept for
+    "KEEP_DAYS": 7,
+}
+
+# RESPONSE COMPRESSION
+
+COMPRESSION = {
+    # Bytes below which responses are sent as they are, headers outweigh the savings
+    "MIN_SIZE": 1024,
+    # Up to this many random bytes are added to gzip headers, against BREACH attacks
+    "GZIP_MAX_RANDOM_BYTES": 100,
+    # Brotli is used when the brotli package is installed, 11 is too slow per request
+    "BROTLI_QUALITY": 5,
+}
+
+# AUTHOR STATS
+
+AUTHOR_STATS = {
+    # Seconds aggregates of an author's recipes are cached for
+    "TIMEOUT": 60,
+    # Latest recipes listed with them
+    "RECENT_RECIPES": 5,
+}
+
+# PASSWORD STRENGTH
+
+# Sorted list of breached passwords, built by the build_breached_passwords command
+BREACHED_PASSWORDS_PATH = os.environ.get(
+    "BREACHED_PASSWORDS_PATH", BASE_DIR / "breached-passwords.txt"
+)
+
 # CORS
 
 CORS_ALLOWED_ORIGINS = [
@@ -211,3 +364,6 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+# Schema built with `python manage.py build_schema`, served by /api/schema/
+SCHEMA_FILE = BASE_DIR / "schema.yml"
@@ -19,12 +19,9 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 import os
-from dotenv import load_dotenv
 
 
-# Environment variables
-
-load_dotenv()
+# Environment variables are loaded from .env by settings
 
 admin_path = os.environ.get('DJANGO_ADMIN_PATH')
 